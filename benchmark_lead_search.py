@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+线索检索性能对比脚本
+在临时数据库中生成测试线索，对比 LIKE '%x%' 与 FTS5 trigram 两种检索方式的耗时
+
+用法：
+    python benchmark_lead_search.py            # 默认 100000 条线索
+    python benchmark_lead_search.py 20000      # 指定线索数
+"""
+
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+
+from utils.lead_search import FTS_DDL, FTS_REBUILD_SQL, LEAD_SEARCH_COLUMNS
+
+SURNAMES = '张王李赵刘陈杨黄周吴徐孙马朱胡郭何林罗高'
+GIVEN_NAMES = '小明红华伟芳娜敏静丽强磊军洋勇艳杰娟涛超'
+
+QUERIES = ['张小明', '13912', '8765', 'wx_00123', '李妈妈']
+REPEAT = 5
+
+
+def generate_leads(conn, count):
+    """生成测试线索"""
+    conn.execute("""
+        CREATE TABLE leads (
+            id INTEGER PRIMARY KEY,
+            student_name VARCHAR(50),
+            parent_wechat_display_name VARCHAR(50),
+            parent_wechat_name VARCHAR(50),
+            contact_info VARCHAR(100)
+        )
+    """)
+    random.seed(42)
+    rows = []
+    for i in range(count):
+        surname = random.choice(SURNAMES)
+        name = surname + ''.join(random.choices(GIVEN_NAMES, k=2))
+        rows.append((
+            name,
+            surname + random.choice(['妈妈', '爸爸']),
+            f'wx_{i:07d}',
+            '1' + random.choice('3456789') + ''.join(random.choices('0123456789', k=9))
+        ))
+    conn.executemany(
+        "INSERT INTO leads (student_name, parent_wechat_display_name, parent_wechat_name, contact_info) VALUES (?, ?, ?, ?)",
+        rows
+    )
+    conn.commit()
+
+
+def time_query(conn, sql, params):
+    """多次执行取平均耗时（毫秒）和结果数"""
+    start = time.perf_counter()
+    for _ in range(REPEAT):
+        rows = conn.execute(sql, params).fetchall()
+    return (time.perf_counter() - start) * 1000 / REPEAT, len(rows)
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        conn = sqlite3.connect(os.path.join(tmp_dir, 'bench.db'))
+
+        print(f"生成 {count} 条测试线索...")
+        generate_leads(conn, count)
+
+        start = time.perf_counter()
+        try:
+            for statement in FTS_DDL:
+                conn.execute(statement)
+            conn.execute(FTS_REBUILD_SQL)
+            conn.commit()
+        except sqlite3.OperationalError as e:
+            print(f"当前 SQLite ({sqlite3.sqlite_version}) 不支持 FTS5 trigram: {e}")
+            return 1
+        print(f"建立全文索引耗时: {(time.perf_counter() - start) * 1000:.0f} ms\n")
+
+        like_sql = "SELECT id FROM leads WHERE " + ' OR '.join(
+            f"{name} LIKE :pattern" for name in LEAD_SEARCH_COLUMNS
+        )
+        fts_sql = "SELECT id FROM leads WHERE id IN (SELECT rowid FROM leads_fts WHERE leads_fts MATCH :phrase)"
+
+        print(f"{'检索词':<12}{'LIKE(ms)':>10}{'FTS5(ms)':>10}{'加速比':>8}{'结果数':>8}")
+        print('-' * 48)
+        for keyword in QUERIES:
+            like_ms, like_rows = time_query(conn, like_sql, {'pattern': f'%{keyword}%'})
+            fts_ms, fts_rows = time_query(conn, fts_sql, {'phrase': f'"{keyword}"'})
+            mark = '' if like_rows == fts_rows else ' (结果不一致)'
+            print(f"{keyword:<12}{like_ms:>10.2f}{fts_ms:>10.2f}{like_ms / fts_ms:>7.1f}x{fts_rows:>8}{mark}")
+
+        conn.close()
+    return 0
+
+
+if __name__ == '__main__':
+    exit(main())
@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+"""
+SQLite 连接参数性能对比脚本
+在临时数据库中模拟多个 gunicorn worker 同时读写（列表查询 + 写沟通记录并更新线索），
+对比默认参数（回滚日志、synchronous=FULL）与 config.py 中 SQLITE_PRAGMAS（WAL 等）的吞吐量和锁冲突。
+
+连接使用 pysqlite 默认的事务方式（与应用一致）：读查询在事务之外执行，第一条写语句之前才发送 BEGIN；
+写语句等待写锁超过 busy_timeout 返回 database is locked 时，按 retry_on_busy 的方式回滚并退避重试，
+重试用尽记为失败。
+
+用法：
+    python benchmark_sqlite_profile.py                # 默认 4 个进程，每种参数运行 10 秒
+    python benchmark_sqlite_profile.py 2 5            # 2 个进程，每种参数运行 5 秒
+"""
+
+import multiprocessing
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+
+from config import BaseConfig, apply_sqlite_pragmas
+
+PROFILES = [
+    ('默认参数', {'journal_mode': 'DELETE', 'synchronous': 'FULL', 'foreign_keys': 'ON'}),
+    ('SQLITE_PRAGMAS', BaseConfig.SQLITE_PRAGMAS),
+]
+
+LEAD_COUNT = 20000
+WRITE_RATIO = 0.2
+BUSY_RETRIES = BaseConfig.DB_BUSY_RETRIES
+BUSY_BACKOFF = BaseConfig.DB_BUSY_BACKOFF
+# 与 SQLAlchemy 的 pysqlite 默认值一致（未设置 busy_timeout 时等待写锁的秒数）
+CONNECT_TIMEOUT = 5.0
+
+
+def create_database(path):
+    """生成测试数据"""
+    conn = sqlite3.connect(path)
+    conn.executescript("""
+        CREATE TABLE leads (
+            id INTEGER PRIMARY KEY,
+            student_name VARCHAR(50),
+            sales_user_id INTEGER,
+            stage VARCHAR(50),
+            updated_at DATETIME
+        );
+        CREATE INDEX idx_leads_stage_updated ON leads (stage, updated_at);
+        CREATE TABLE communication_records (
+            id INTEGER PRIMARY KEY,
+            lead_id INTEGER NOT NULL REFERENCES leads(id),
+            content TEXT,
+            created_at DATETIME
+        );
+        CREATE INDEX idx_communication_records_lead ON communication_records (lead_id, created_at);
+    """)
+    random.seed(42)
+    stages = ['获取联系方式', '线下见面', '首笔支付', '次笔支付', '全款支付']
+    conn.executemany(
+        "INSERT INTO leads (student_name, sales_user_id, stage, updated_at) VALUES (?, ?, ?, datetime('now', ?))",
+        [(f'学员{i}', i % 10, random.choice(stages), f'-{i} minutes') for i in range(LEAD_COUNT)]
+    )
+    conn.commit()
+    conn.close()
+
+
+def read(conn):
+    """列表页查询：按阶段取最近更新的一页并统计总数"""
+    stage = random.choice(['获取联系方式', '线下见面', '首笔支付'])
+    conn.execute(
+        "SELECT * FROM leads WHERE stage = ? ORDER BY updated_at DESC LIMIT 20", (stage,)
+    ).fetchall()
+    conn.execute("SELECT count(*) FROM leads WHERE stage = ?", (stage,)).fetchone()
+
+
+def write(conn):
+    """写沟通记录：先读线索，再插入记录并更新线索（INSERT 之前由 pysqlite 自动开始事务）"""
+    lead_id = random.randint(1, LEAD_COUNT)
+    try:
+        conn.execute("SELECT id, stage FROM leads WHERE id = ?", (lead_id,)).fetchone()
+        conn.execute(
+            "INSERT INTO communication_records (lead_id, content, created_at) VALUES (?, ?, datetime('now'))",
+            (lead_id, '跟进沟通' * 20)
+        )
+        conn.execute("UPDATE leads SET updated_at = datetime('now') WHERE id = ?", (lead_id,))
+        conn.commit()
+    except sqlite3.OperationalError:
+        conn.rollback()
+        raise
+
+
+def worker(path, pragmas, duration, seed, results):
+    """一个进程：按比例混合读写，统计次数、耗时和锁冲突"""
+    random.seed(seed)
+    conn = sqlite3.connect(path, timeout=CONNECT_TIMEOUT)
+    apply_sqlite_pragmas(conn, pragmas)
+
+    reads = writes = retries = failures = 0
+    read_times = []
+    write_times = []
+    deadline = time.perf_counter() + duration
+    while time.perf_counter() < deadline:
+        start = time.perf_counter()
+        if random.random() >= WRITE_RATIO:
+            read(conn)
+            reads += 1
+            read_times.append(time.perf_counter() - start)
+            continue
+
+        for attempt in range(BUSY_RETRIES + 1):
+            try:
+                write(conn)
+                writes += 1
+                break
+            except sqlite3.OperationalError as e:
+                if 'locked' not in str(e) and 'busy' not in str(e):
+                    raise
+                if attempt == BUSY_RETRIES:
+                    failures += 1
+                    break
+                retries += 1
+                time.sleep(BUSY_BACKOFF * (2 ** attempt) * (0.5 + random.random()))
+        write_times.append(time.perf_counter() - start)
+
+    conn.close()
+    results.put((reads, writes, retries, failures, read_times, write_times))
+
+
+def percentile(values, p):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p))]
+
+
+def run_profile(name, pragmas, processes, duration):
+    """运行一种连接参数，返回统计结果"""
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'bench.db')
+        create_database(path)
+
+        results = multiprocessing.Queue()
+        workers = [
+            multiprocessing.Process(target=worker, args=(path, pragmas, duration, i, results))
+            for i in range(processes)
+        ]
+        for p in workers:
+            p.start()
+        rows = [results.get() for _ in workers]
+        for p in workers:
+            p.join()
+
+    reads = sum(r[0] for r in rows)
+    writes = sum(r[1] for r in rows)
+    read_times = [t for r in rows for t in r[4]]
+    write_times = [t for r in rows for t in r[5]]
+    return {
+        'name': name,
+        'reads': reads / duration,
+        'writes': writes / duration,
+        'retries': sum(r[2] for r in rows),
+        'failures': sum(r[3] for r in rows),
+        'read_p95': percentile(read_times, 0.95) * 1000,
+        'write_p95': percentile(write_times, 0.95) * 1000,
+    }
+
+
+def main():
+    processes = int(sys.argv[1]) if len(sys.argv) > 1 else 4
+    duration = float(sys.argv[2]) if len(sys.argv) > 2 else 10
+
+    print(f"{processes} 个进程并发读写，写操作占 {WRITE_RATIO:.0%}，每种参数运行 {duration:g} 秒\n")
+    print(f"{'连接参数':<16}{'读/秒':>10}{'写/秒':>10}{'读P95(ms)':>12}{'写P95(ms)':>12}{'重试':>8}{'失败':>8}")
+    for name, pragmas in PROFILES:
+        r = run_profile(name, pragmas, processes, duration)
+        print(f"{r['name']:<16}{r['reads']:>10.0f}{r['writes']:>10.0f}{r['read_p95']:>12.2f}"
+              f"{r['write_p95']:>12.2f}{r['retries']:>8}{r['failures']:>8}")
+
+
+if __name__ == '__main__':
+    main()
@@ -5,12 +5,14 @@
 
 from datetime import datetime
 from models import db, CommunicationRecord, Lead, Customer
+from utils.db_retry import retry_on_busy
 
 
 class CommunicationManager:
     """沟通记录管理器"""
     
     @staticmethod
+    @retry_on_busy
     def add_lead_communication(lead_id, content, user_id=None, created_at=None):
         """
         添加线索阶段沟通记录
@@ -46,6 +48,7 @@ class CommunicationManager:
         return record
     
     @staticmethod
+    @retry_on_busy
     def add_customer_communication(lead_id, customer_id, content, user_id=None, created_at=None):
         """
         添加客户阶段沟通记录
@@ -178,6 +181,7 @@ class CommunicationManager:
         }
     
     @staticmethod
+    @retry_on_busy
     def delete_communication(record_id):
         """
         删除沟通记录
@@ -198,6 +202,7 @@ class CommunicationManager:
         return True
     
     @staticmethod
+    @retry_on_busy
     def update_communication(record_id, content):
         """
         更新沟通记录内容
@@ -33,6 +33,35 @@ class BaseConfig:
     # 文件上传配置
     MAX_CONTENT_LENGTH = 16 * 1024 * 1024  # 16MB
 
+    # 数据导出任务配置
+    EXPORT_DIR = os.environ.get('EXPORT_DIR') or os.path.join(basedir, 'instance', 'exports')
+    EXPORT_RETENTION_HOURS = int(os.environ.get('EXPORT_RETENTION_HOURS') or 24)  # 导出文件保留时长
+    EXPORT_WORKER_THREADS = int(os.environ.get('EXPORT_WORKER_THREADS') or 1)  # 0 表示只由 export-worker 命令处理
+
+    # 登录日志配置
+    LOGIN_LOG_ASYNC = os.environ.get('LOGIN_LOG_ASYNC', 'true').lower() in ['true', 'on', '1']  # 后台批量写入
+    LOGIN_LOG_RETENTION_DAYS = int(os.environ.get('LOGIN_LOG_RETENTION_DAYS') or 90)  # 主库保留的原始日志天数
+    LOGIN_LOG_ARCHIVE_PATH = os.environ.get('LOGIN_LOG_ARCHIVE_PATH') or os.path.join(basedir, 'instance', 'login_logs_archive.db')
+
+    # 数据库备份配置（python run.py db-backup）
+    BACKUP_DIR = os.environ.get('BACKUP_DIR') or os.path.join(basedir, 'bak')
+    BACKUP_COMPRESSION = os.environ.get('BACKUP_COMPRESSION') or 'auto'  # auto（有 zstandard 用 zstd，否则 gzip）/zstd/gzip
+    BACKUP_PAGES_PER_STEP = int(os.environ.get('BACKUP_PAGES_PER_STEP') or 1024)  # 每步复制的页数，步与步之间让出数据库
+    BACKUP_STEP_SLEEP = float(os.environ.get('BACKUP_STEP_SLEEP') or 0.01)  # 每步之后的等待秒数
+    BACKUP_KEEP_DAILY = int(os.environ.get('BACKUP_KEEP_DAILY') or 7)  # 保留最近 N 天每天最新的一份
+    BACKUP_KEEP_WEEKLY = int(os.environ.get('BACKUP_KEEP_WEEKLY') or 4)  # 保留最近 N 周每周最新的一份
+    BACKUP_KEEP_MONTHLY = int(os.environ.get('BACKUP_KEEP_MONTHLY') or 12)  # 保留最近 N 个月每月最新的一份
+
+    # SQL 统计配置（Server-Timing 响应头、慢请求与慢查询日志）
+    SQL_STATS_ENABLED = os.environ.get('SQL_STATS_ENABLED', 'false').lower() in ['true', 'on', '1']
+    SLOW_REQUEST_MS = int(os.environ.get('SLOW_REQUEST_MS') or 500)  # 请求耗时超过该值时记录日志（含SQL）
+    SLOW_QUERY_MS = int(os.environ.get('SLOW_QUERY_MS') or 100)  # 单条语句超过该值时记录查询计划
+
+    # 运行指标配置（/metrics，Prometheus 文本格式）
+    METRICS_ENABLED = os.environ.get('METRICS_ENABLED', 'true').lower() in ['true', 'on', '1']
+    METRICS_DIR = os.environ.get('METRICS_DIR') or os.path.join(basedir, 'instance', 'metrics')  # 各 worker 的指标文件目录
+    METRICS_TOKEN = os.environ.get('METRICS_TOKEN')  # 设置后抓取 /metrics 需携带 Authorization: Bearer <令牌>（生产环境必须设置）
+
     # 应用信息
     APP_NAME = 'EduConnect CRM'
     APP_VERSION = '1.0.0'
@@ -47,24 +76,60 @@ class BaseConfig:
     # Redis配置
     REDIS_URL = os.environ.get('REDIS_URL')
 
+    # SQLite 连接参数（每个新连接执行）
+    # WAL 模式下读写互不阻塞，另一个 worker 提交时读请求不必等待；synchronous=NORMAL 在 WAL 下只在检查点时落盘，
+    # 断电最多丢失最近的提交、不会损坏数据库；busy_timeout 为等待写锁的毫秒数
+    SQLITE_PRAGMAS = {
+        'journal_mode': os.environ.get('SQLITE_JOURNAL_MODE') or 'WAL',
+        'synchronous': os.environ.get('SQLITE_SYNCHRONOUS') or 'NORMAL',
+        'busy_timeout': int(os.environ.get('SQLITE_BUSY_TIMEOUT') or 5000),
+        'cache_size': int(os.environ.get('SQLITE_CACHE_SIZE') or -16000),  # 负数为 KiB，即每个连接约 16MB
+        'mmap_size': int(os.environ.get('SQLITE_MMAP_SIZE') or 256 * 1024 * 1024),
+        'temp_store': 'MEMORY',
+        'foreign_keys': 'ON',
+    }
+
+    # 写事务遇到 SQLITE_BUSY（database is locked）时的重试次数和首次退避秒数（之后每次翻倍）
+    DB_BUSY_RETRIES = int(os.environ.get('DB_BUSY_RETRIES') or 3)
+    DB_BUSY_BACKOFF = float(os.environ.get('DB_BUSY_BACKOFF') or 0.05)
+
     @staticmethod
     def init_app(app):
         """初始化应用配置"""
-        # 启用 SQLite 外键约束
+        # 为每个新的 SQLite 连接设置连接参数（含外键约束）
         from sqlalchemy import event
         from sqlalchemy.engine import Engine
 
+        pragmas = app.config.get('SQLITE_PRAGMAS') or {'foreign_keys': 'ON'}
+
         @event.listens_for(Engine, "connect")
         def set_sqlite_pragma(dbapi_conn, connection_record):
-            cursor = dbapi_conn.cursor()
-            cursor.execute("PRAGMA foreign_keys=ON")
-            cursor.close()
+            apply_sqlite_pragmas(dbapi_conn, pragmas)
+
+
+def apply_sqlite_pragmas(dbapi_conn, pragmas):
+    """
+    在 SQLite 连接上执行连接参数（非 SQLite 连接直接跳过）
+
+    Args:
+        dbapi_conn: DBAPI 连接
+        pragmas (dict): {参数名: 值}，按顺序执行
+    """
+    import sqlite3
+    if not isinstance(dbapi_conn, sqlite3.Connection):
+        return
+    cursor = dbapi_conn.cursor()
+    for name, value in pragmas.items():
+        cursor.execute(f"PRAGMA {name}={value}")
+    cursor.close()
+
 
 class DevelopmentConfig(BaseConfig):
     """开发环境配置"""
     DEBUG = True
     TESTING = False
     SESSION_COOKIE_SECURE = False
+    SQL_STATS_ENABLED = os.environ.get('SQL_STATS_ENABLED', 'true').lower() in ['true', 'on', '1']
 
     @staticmethod
     def init_app(app):
@@ -77,6 +142,12 @@ class ProductionConfig(BaseConfig):
     TESTING = False
     SESSION_COOKIE_SECURE = True
 
+    # /metrics 会暴露端点名称、访问量和 worker 进程信息，生产环境只在设置了 METRICS_TOKEN 时启用
+    METRICS_ENABLED = BaseConfig.METRICS_ENABLED and bool(BaseConfig.METRICS_TOKEN)
+
+    # 导出由独立的 export-worker 服务（crm-export.service）处理，Web worker 不占用 CPU 生成文件
+    EXPORT_WORKER_THREADS = int(os.environ.get('EXPORT_WORKER_THREADS') or 0)
+
     # 生产环境数据库优化
     SQLALCHEMY_ENGINE_OPTIONS = {
         'pool_pre_ping': True,
@@ -121,6 +192,9 @@ class TestingConfig(BaseConfig):
     TESTING = True
     SQLALCHEMY_DATABASE_URI = 'sqlite:///:memory:'
     WTF_CSRF_ENABLED = False
+    LOGIN_LOG_ASYNC = False
+    METRICS_ENABLED = False
+    MAX_QUERIES_PER_REQUEST = 20  # 单个请求的SQL语句数上限，超出时请求失败（发现 N+1 查询）
     SESSION_COOKIE_SECURE = False
 
     @staticmethod
@@ -43,6 +43,7 @@ echo -e "${YELLOW}步骤 2/7: 停止当前服务...${NC}"
 if systemctl is-active --quiet crm 2>/dev/null; then
     echo -e "${GREEN}使用 systemctl 停止服务...${NC}"
     sudo systemctl stop crm
+    systemctl is-active --quiet crm-export 2>/dev/null && sudo systemctl stop crm-export
     echo -e "${GREEN}✓ systemd 服务已停止${NC}"
 else
     # 如果没有 systemd 服务，使用 pkill
@@ -106,6 +107,10 @@ mkdir -p logs
 if systemctl is-active --quiet crm 2>/dev/null || [ -f /etc/systemd/system/crm.service ]; then
     echo -e "${GREEN}检测到 systemd 服务配置，使用 systemctl 重启服务...${NC}"
     sudo systemctl restart crm
+    # 导出任务处理进程（crm-export.service）
+    if [ -f /etc/systemd/system/crm-export.service ]; then
+        sudo systemctl restart crm-export
+    fi
     sleep 3
 
     # 检查服务状态
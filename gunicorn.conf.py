@@ -45,3 +45,26 @@ tmp_upload_dir = None
 # SSL (如果需要)
 # keyfile = None
 # certfile = None
+
+# 钩子
+def on_starting(server):
+    """主进程启动时清空上次运行留下的指标文件"""
+    from config import BaseConfig
+    from utils.metrics import clear_metrics_dir
+    if os.path.isdir(BaseConfig.METRICS_DIR):
+        clear_metrics_dir(BaseConfig.METRICS_DIR)
+
+
+def worker_exit(server, worker):
+    """worker 退出前写完队列中的登录日志，并写入最后一次指标快照"""
+    from utils.login_log_writer import shutdown_login_log_writer
+    from utils.metrics import flush_metrics
+    shutdown_login_log_writer()
+    flush_metrics()
+
+
+def child_exit(server, worker):
+    """worker 退出后把它的累计指标并入汇总文件（在主进程中执行）"""
+    from config import BaseConfig
+    from utils.metrics import mark_process_dead
+    mark_process_dead(worker.pid, BaseConfig.METRICS_DIR)
@@ -30,8 +30,8 @@ if [ ! -f "run.py" ]; then
 fi
 
 # 检查 crm.service 文件是否存在
-if [ ! -f "crm.service" ]; then
-    echo -e "${RED}错误：找不到 crm.service 文件${NC}"
+if [ ! -f "crm.service" ] || [ ! -f "crm-export.service" ]; then
+    echo -e "${RED}错误：找不到 crm.service 或 crm-export.service 文件${NC}"
     exit 1
 fi
 
@@ -73,6 +73,8 @@ pkill -f "python.*run.py" 2>/dev/null && echo -e "${GREEN}✓ 已停止手动启
 echo -e "${YELLOW}安装 systemd 服务文件...${NC}"
 cp crm.service /etc/systemd/system/crm.service
 echo -e "${GREEN}✓ 服务文件已复制到 /etc/systemd/system/crm.service${NC}"
+cp crm-export.service /etc/systemd/system/crm-export.service
+echo -e "${GREEN}✓ 服务文件已复制到 /etc/systemd/system/crm-export.service${NC}"
 
 # 重新加载 systemd 配置
 echo -e "${YELLOW}重新加载 systemd 配置...${NC}"
@@ -81,12 +83,12 @@ echo -e "${GREEN}✓ systemd 配置已重新加载${NC}"
 
 # 启用服务（开机自启）
 echo -e "${YELLOW}启用服务（开机自启）...${NC}"
-systemctl enable crm
+systemctl enable crm crm-export
 echo -e "${GREEN}✓ 服务已设置为开机自启${NC}"
 
 # 启动服务
 echo -e "${YELLOW}启动服务...${NC}"
-systemctl start crm
+systemctl start crm crm-export
 sleep 3
 
 # 检查服务状态
@@ -94,6 +96,7 @@ if systemctl is-active --quiet crm; then
     echo -e "${GREEN}✓ 服务启动成功！${NC}"
     echo ""
     systemctl status crm --no-pager -l
+    systemctl status crm-export --no-pager -l
 else
     echo -e "${RED}错误：服务启动失败${NC}"
     echo ""
@@ -119,6 +122,7 @@ echo ""
 echo -e "${GREEN}应用日志文件：${NC}"
 echo -e "应用日志: ${YELLOW}${PROJECT_DIR}/logs/app.log${NC}"
 echo -e "访问日志: ${YELLOW}${PROJECT_DIR}/logs/access.log${NC}"
+echo -e "导出任务日志: ${YELLOW}${PROJECT_DIR}/logs/export.log${NC}"
 echo -e "错误日志: ${YELLOW}${PROJECT_DIR}/logs/error.log${NC}"
 echo ""
 echo -e "${GREEN}✓ 现在可以使用 'sudo systemctl restart crm' 重启服务了！${NC}"
@@ -297,6 +297,138 @@ def migrate_add_thesis_name_to_customers(conn):
         print_error(f"添加字段失败: {str(e)}")
         return False
 
+def migrate_add_contact_phone_to_leads(conn, batch_size=1000):
+    """为 leads 表添加 contact_phone 字段（规范化手机号）并分批回填"""
+    from utils.phone import contact_phone_value
+
+    cursor = conn.cursor()
+
+    try:
+        columns = get_table_columns(conn, 'leads')
+        added = False
+        if 'contact_phone' not in columns:
+            cursor.execute("ALTER TABLE leads ADD COLUMN contact_phone VARCHAR(20)")
+            conn.commit()
+            print_success("成功为 leads 表添加 contact_phone 字段")
+            added = True
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_leads_contact_phone ON leads(contact_phone)")
+
+        # 分批回填，每批单独提交，避免长时间占用写锁
+        last_id = 0
+        backfilled = 0
+        while True:
+            cursor.execute("""
+                SELECT id, contact_info FROM leads
+                WHERE id > ? AND contact_phone IS NULL AND contact_info IS NOT NULL
+                ORDER BY id LIMIT ?
+            """, (last_id, batch_size))
+            rows = cursor.fetchall()
+            if not rows:
+                break
+            # 没有号码的记录写入空字符串，之后不会再被当作未回填处理
+            updates = [(contact_phone_value(info), lead_id) for lead_id, info in rows]
+            cursor.executemany("UPDATE leads SET contact_phone = ? WHERE id = ?", updates)
+            conn.commit()
+            backfilled += len(updates)
+            last_id = rows[-1][0]
+
+        if backfilled:
+            print_success(f"回填 contact_phone {backfilled} 条")
+        elif not added:
+            print_warning("contact_phone字段已存在且已回填，跳过")
+        return added or backfilled > 0
+    except Exception as e:
+        print_error(f"添加 contact_phone 字段失败: {e}")
+        conn.rollback()
+        return False
+
+def migrate_add_service_type_mask_to_leads(conn, batch_size=1000):
+    """为 leads 表添加 service_type_mask 字段（服务类型掩码）并分批回填"""
+    from utils.service_types import parse_service_types, service_type_mask
+
+    cursor = conn.cursor()
+
+    try:
+        columns = get_table_columns(conn, 'leads')
+        added = False
+        if 'service_type_mask' not in columns:
+            cursor.execute("ALTER TABLE leads ADD COLUMN service_type_mask INTEGER")
+            conn.commit()
+            print_success("成功为 leads 表添加 service_type_mask 字段")
+            added = True
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_leads_service_type_mask ON leads(service_type_mask)")
+
+        # 分批回填，每批单独提交，避免长时间占用写锁
+        last_id = 0
+        backfilled = 0
+        while True:
+            cursor.execute("""
+                SELECT id, service_types FROM leads
+                WHERE id > ? AND service_type_mask IS NULL
+                ORDER BY id LIMIT ?
+            """, (last_id, batch_size))
+            rows = cursor.fetchall()
+            if not rows:
+                break
+            updates = [(service_type_mask(parse_service_types(value)), lead_id) for lead_id, value in rows]
+            cursor.executemany("UPDATE leads SET service_type_mask = ? WHERE id = ?", updates)
+            conn.commit()
+            backfilled += len(updates)
+            last_id = rows[-1][0]
+
+        if backfilled:
+            print_success(f"回填 service_type_mask {backfilled} 条")
+        elif not added:
+            print_warning("service_type_mask字段已存在且已回填，跳过")
+        return added or backfilled > 0
+    except Exception as e:
+        print_error(f"添加 service_type_mask 字段失败: {e}")
+        conn.rollback()
+        return False
+
+# 增量导出按 (updated_at, id) 记录水位的表
+UPDATED_AT_TABLES = [
+    'users', 'leads', 'customers', 'payments', 'teachers', 'tutoring_deliveries', 'competition_deliveries'
+]
+
+def migrate_backfill_updated_at(conn, batch_size=1000):
+    """分批回填增量导出表中为空的 updated_at（取 created_at，也为空时取 1970-01-01）"""
+    cursor = conn.cursor()
+
+    try:
+        backfilled = 0
+        for table_name in UPDATED_AT_TABLES:
+            if not check_table_exists(conn, table_name):
+                continue
+            # 分批回填，每批单独提交，避免长时间占用写锁
+            last_id = 0
+            while True:
+                cursor.execute(f"""
+                    SELECT id FROM {table_name}
+                    WHERE id > ? AND updated_at IS NULL
+                    ORDER BY id LIMIT ?
+                """, (last_id, batch_size))
+                ids = [row[0] for row in cursor.fetchall()]
+                if not ids:
+                    break
+                cursor.executemany(
+                    f"UPDATE {table_name} SET updated_at = COALESCE(created_at, '1970-01-01 00:00:00.000000') WHERE id = ?",
+                    [(row_id,) for row_id in ids]
+                )
+                conn.commit()
+                backfilled += len(ids)
+                last_id = ids[-1]
+
+        if not backfilled:
+            print_warning("updated_at 已回填，跳过")
+            return False
+        print_success(f"回填 updated_at {backfilled} 行")
+        return True
+    except Exception as e:
+        print_error(f"回填 updated_at 失败: {e}")
+        conn.rollback()
+        return False
+
 def verify_database_integrity(conn):
     """验证数据库完整性"""
     cursor = conn.cursor()
@@ -365,6 +497,45 @@ def migrate_add_customer_image_tables(conn):
         conn.rollback()
         return False
 
+# 列表页筛选/排序和增量导出使用的复合索引（与 models.py 中的 __table_args__ 保持一致）
+COMPOSITE_INDEXES = [
+    ('idx_leads_sales_first_payment', 'leads', 'sales_user_id, first_payment_at'),
+    ('idx_leads_stage_updated', 'leads', 'stage, updated_at'),
+    ('idx_payments_lead_date', 'payments', 'lead_id, payment_date'),
+    ('idx_customers_teacher_created', 'customers', 'teacher_user_id, created_at'),
+    ('idx_communication_records_lead_created', 'communication_records', 'lead_id, created_at'),
+    ('idx_login_logs_login_time', 'login_logs', 'login_time'),
+] + [(f'idx_{table_name}_updated_id', table_name, 'updated_at, id') for table_name in UPDATED_AT_TABLES]
+
+def migrate_add_composite_indexes(conn):
+    """添加列表页使用的复合索引"""
+    cursor = conn.cursor()
+
+    try:
+        cursor.execute("SELECT name FROM sqlite_master WHERE type='index'")
+        existing = {row[0] for row in cursor.fetchall()}
+
+        created = []
+        for index_name, table_name, columns in COMPOSITE_INDEXES:
+            if index_name in existing or not check_table_exists(conn, table_name):
+                continue
+            cursor.execute(f"CREATE INDEX IF NOT EXISTS {index_name} ON {table_name}({columns})")
+            created.append(index_name)
+
+        if not created:
+            print_warning("复合索引已存在，跳过")
+            return False
+
+        # 更新统计信息，让查询优化器使用新索引
+        cursor.execute("ANALYZE")
+        conn.commit()
+        print_success(f"成功创建 {len(created)} 个复合索引")
+        return True
+    except Exception as e:
+        print_error(f"创建复合索引失败: {e}")
+        conn.rollback()
+        return False
+
 def get_table_stats(conn):
     """获取表统计信息"""
     cursor = conn.cursor()
@@ -441,6 +612,22 @@ def main():
     if migrate_add_customer_image_tables(conn):
         migrations_applied.append("添加 course_record_images 和 award_certificate_images 表")
 
+    # 迁移8: 为 leads 表添加 contact_phone 字段
+    if migrate_add_contact_phone_to_leads(conn):
+        migrations_applied.append("为 leads 表添加 contact_phone 字段并回填")
+
+    # 迁移9: 为 leads 表添加 service_type_mask 字段
+    if migrate_add_service_type_mask_to_leads(conn):
+        migrations_applied.append("为 leads 表添加 service_type_mask 字段并回填")
+
+    # 迁移10: 回填 updated_at（增量导出按 updated_at 索引读取）
+    if migrate_backfill_updated_at(conn):
+        migrations_applied.append("回填增量导出表的 updated_at")
+
+    # 迁移11: 添加复合索引
+    if migrate_add_composite_indexes(conn):
+        migrations_applied.append("添加列表页复合索引")
+
     if migrations_applied:
         print_success(f"应用了 {len(migrations_applied)} 个迁移")
         for migration in migrations_applied:
@@ -3,12 +3,18 @@ from flask_login import UserMixin
 from datetime import datetime
 from werkzeug.security import generate_password_hash, check_password_hash
 from sqlalchemy import Numeric
+from sqlalchemy.orm import validates
+from utils.phone import contact_phone_value
+from utils.service_types import parse_service_types, service_type_mask, masks_with
 
 db = SQLAlchemy()
 
 class User(UserMixin, db.Model):
     """用户账号表"""
     __tablename__ = 'users'
+    __table_args__ = (
+        db.Index('idx_users_updated_id', 'updated_at', 'id'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     username = db.Column(db.String(50), nullable=False, comment='用户名')
@@ -17,7 +23,7 @@ class User(UserMixin, db.Model):
     group_name = db.Column(db.String(50), comment='所属组别')
     status = db.Column(db.Boolean, default=True, comment='账号状态：True启用/False禁用')
     created_at = db.Column(db.DateTime, default=datetime.utcnow, comment='创建时间')
-    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
     
     # 关联关系
     leads_as_sales = db.relationship('Lead', foreign_keys='Lead.sales_user_id', backref='sales_user', lazy='dynamic')
@@ -52,6 +58,13 @@ class User(UserMixin, db.Model):
 class Lead(db.Model):
     """学员线索表"""
     __tablename__ = 'leads'
+    __table_args__ = (
+        db.Index('idx_leads_sales_first_payment', 'sales_user_id', 'first_payment_at'),
+        db.Index('idx_leads_stage_updated', 'stage', 'updated_at'),
+        db.Index('idx_leads_contact_phone', 'contact_phone'),
+        db.Index('idx_leads_service_type_mask', 'service_type_mask'),
+        db.Index('idx_leads_updated_id', 'updated_at', 'id'),
+    )
 
     # 线索阶段常量定义
     STAGE_CONTACT = '获取联系方式'
@@ -74,6 +87,7 @@ class Lead(db.Model):
     parent_wechat_display_name = db.Column(db.String(50), nullable=False, comment='家长微信名')  # 新增必填字段
     parent_wechat_name = db.Column(db.String(50), nullable=False, unique=True, comment='家长微信号')  # 新增必填字段
     contact_info = db.Column(db.String(100), comment='联系方式')  # 改为可选
+    contact_phone = db.Column(db.String(20), comment='规范化手机号（由联系方式提取，仅数字，用于查重）')
     contact_locked = db.Column(db.Boolean, default=True, comment='联系方式是否锁定')
     lead_source = db.Column(db.String(50), comment='线索来源')
     grade = db.Column(db.String(10), comment='年级：1-9年级、高一、高二、高三')
@@ -92,11 +106,12 @@ class Lead(db.Model):
 
     # 服务内容
     service_types = db.Column(db.Text, comment='服务类型JSON：["tutoring", "competition", "upgrade_guidance"]')
+    service_type_mask = db.Column(db.Integer, default=0, comment='服务类型掩码（由服务类型计算：课题辅导1/竞赛辅导2/升学陪跑4，用于索引筛选）')
     competition_award_level = db.Column(db.String(20), comment='竞赛奖项等级：市奖/国奖')
     additional_requirements = db.Column(db.Text, comment='额外要求')
 
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
-    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
 
     # 关联关系（添加级联删除保护）
     customer = db.relationship('Customer', backref='lead', uselist=False,
@@ -106,19 +121,30 @@ class Lead(db.Model):
     communication_records = db.relationship('CommunicationRecord', back_populates='lead',
                                            cascade='all, delete-orphan')
 
+    @validates('contact_info')
+    def _sync_contact_phone(self, key, value):
+        """联系方式变更时同步规范化手机号"""
+        self.contact_phone = contact_phone_value(value)
+        return value
+
+    @validates('service_types')
+    def _sync_service_type_mask(self, key, value):
+        """服务类型变更时同步服务类型掩码"""
+        self.service_type_mask = service_type_mask(parse_service_types(value))
+        return value
+
+    @classmethod
+    def service_type_filter(cls, service_type):
+        """包含指定服务类型的查询条件（掩码等值查询，可利用索引）"""
+        return cls.service_type_mask.in_(masks_with(service_type))
+
     def get_service_types_list(self):
-        """获取服务类型列表"""
-        import json
-        if self.service_types:
-            try:
-                # 尝试解析 JSON 格式
-                return json.loads(self.service_types)
-            except:
-                # 如果不是 JSON，尝试按逗号分隔
-                if ',' in self.service_types or self.service_types:
-                    return [s.strip() for s in self.service_types.split(',') if s.strip()]
-                return []
-        return []
+        """获取服务类型列表（按服务类型文本缓存解析结果）"""
+        parsed = self.__dict__.get('_service_types_parsed')
+        if parsed is None or parsed[0] != self.service_types:
+            parsed = (self.service_types, tuple(parse_service_types(self.service_types)))
+            self._service_types_parsed = parsed
+        return list(parsed[1])
 
     def set_service_types_list(self, service_list):
         """设置服务类型列表"""
@@ -139,6 +165,10 @@ class Lead(db.Model):
 class Customer(db.Model):
     """成交客户表"""
     __tablename__ = 'customers'
+    __table_args__ = (
+        db.Index('idx_customers_teacher_created', 'teacher_user_id', 'created_at'),
+        db.Index('idx_customers_updated_id', 'updated_at', 'id'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     lead_id = db.Column(db.Integer, db.ForeignKey('leads.id'), nullable=False, comment='关联线索ID')
@@ -159,7 +189,7 @@ class Customer(db.Model):
     is_priority = db.Column(db.Boolean, default=False, comment='是否重点关注客户')
 
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
-    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
 
     # 关联关系（添加级联删除保护）
     tutoring_delivery = db.relationship('TutoringDelivery', backref='customer', uselist=False,
@@ -194,14 +224,8 @@ class Customer(db.Model):
         if not self.lead:
             return None
 
-        # 获取该线索的所有付款记录，按付款日期升序排列
-        payments = Payment.query.filter_by(lead_id=self.lead_id).order_by(Payment.payment_date.asc()).all()
-
-        # 如果有至少2笔付款，返回第二笔的付款日期
-        if len(payments) >= 2:
-            return payments[1].payment_date
-
-        return None
+        from utils.payment_ordinals import second_payment_dates
+        return second_payment_dates([self.lead_id]).get(self.lead_id)
 
     def get_expire_date(self):
         """获取服务到期时间"""
@@ -216,6 +240,9 @@ class Customer(db.Model):
 class TutoringDelivery(db.Model):
     """课题辅导服务交付表"""
     __tablename__ = 'tutoring_deliveries'
+    __table_args__ = (
+        db.Index('idx_tutoring_deliveries_updated_id', 'updated_at', 'id'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     customer_id = db.Column(db.Integer, db.ForeignKey('customers.id'), nullable=False, comment='关联客户ID')
@@ -233,18 +260,21 @@ class TutoringDelivery(db.Model):
     notes_history = db.Column(db.JSON, comment='备注历史版本')
 
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
-    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
 
     def update_remaining_sessions(self):
         """自动计算剩余节数"""
         self.remaining_sessions = self.total_sessions - self.completed_sessions
 
     def __repr__(self):
-        return f'<TutoringDelivery {self.customer.lead.student_name}>'
+        return f'<TutoringDelivery Customer#{self.customer_id}>'
 
 class CompetitionDelivery(db.Model):
     """竞赛奖项获取交付表"""
     __tablename__ = 'competition_deliveries'
+    __table_args__ = (
+        db.Index('idx_competition_deliveries_updated_id', 'updated_at', 'id'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     customer_id = db.Column(db.Integer, db.ForeignKey('customers.id'), nullable=False, comment='关联客户ID')
@@ -257,10 +287,10 @@ class CompetitionDelivery(db.Model):
     notes_history = db.Column(db.JSON, comment='备注历史版本')
 
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
-    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
 
     def __repr__(self):
-        return f'<CompetitionDelivery {self.customer.lead.student_name}>'
+        return f'<CompetitionDelivery Customer#{self.customer_id}>'
 
 class CompetitionName(db.Model):
     """竞赛名称配置表"""
@@ -316,11 +346,15 @@ class CustomerCompetition(db.Model):
         return color_map.get(self.status, 'bg-gray-100 text-gray-800')
 
     def __repr__(self):
-        return f'<CustomerCompetition {self.customer.lead.student_name} - {self.competition_name.name}>'
+        return f'<CustomerCompetition Customer#{self.customer_id} - Competition#{self.competition_name_id}>'
 
 class Payment(db.Model):
     """付款记录表"""
     __tablename__ = 'payments'
+    __table_args__ = (
+        db.Index('idx_payments_lead_date', 'lead_id', 'payment_date'),
+        db.Index('idx_payments_updated_id', 'updated_at', 'id'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     lead_id = db.Column(db.Integer, db.ForeignKey('leads.id'), nullable=False, comment='关联线索ID')
@@ -328,7 +362,7 @@ class Payment(db.Model):
     payment_date = db.Column(db.Date, nullable=False, comment='付款日期')
     payment_notes = db.Column(db.Text, comment='付款备注')
     created_at = db.Column(db.DateTime, default=datetime.utcnow, comment='创建时间')
-    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
 
     def __repr__(self):
         return f'<Payment {self.lead.student_name} ¥{self.amount}>'
@@ -382,6 +416,9 @@ class CustomerPayment(db.Model):
 class Teacher(db.Model):
     """老师信息表"""
     __tablename__ = 'teachers'
+    __table_args__ = (
+        db.Index('idx_teachers_updated_id', 'updated_at', 'id'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     chinese_name = db.Column(db.String(50), nullable=False, comment='中文名')
@@ -396,7 +433,7 @@ class Teacher(db.Model):
     status = db.Column(db.Boolean, default=True, comment='状态：True启用/False禁用')
     created_by_user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False, comment='创建人ID（班主任）')
     created_at = db.Column(db.DateTime, default=datetime.utcnow, comment='创建时间')
-    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
 
     # 关联关系
     customers = db.relationship('Customer', foreign_keys='Customer.teacher_id', backref='teacher', lazy='dynamic')
@@ -424,8 +461,11 @@ class Teacher(db.Model):
         }
 
 class LoginLog(db.Model):
-    """登录日志表"""
+    """登录日志表（超过保留天数的记录移入归档库，见 utils/login_log_retention.py）"""
     __tablename__ = 'login_logs'
+    __table_args__ = (
+        db.Index('idx_login_logs_login_time', 'login_time'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=True, comment='用户ID')
@@ -445,6 +485,9 @@ class LoginLog(db.Model):
 class CommunicationRecord(db.Model):
     """统一沟通记录表 - 记录线索和客户阶段的所有沟通"""
     __tablename__ = 'communication_records'
+    __table_args__ = (
+        db.Index('idx_communication_records_lead_created', 'lead_id', 'created_at'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
 
@@ -574,3 +617,129 @@ class SystemConfig(db.Model):
 
     def __repr__(self):
         return f'<SystemConfig {self.config_key}={self.config_value}>'
+
+
+class LeadDailyStat(db.Model):
+    """线索每日统计汇总表（按日期 × 责任销售增量维护）"""
+    __tablename__ = 'lead_daily_stats'
+    __table_args__ = (
+        db.UniqueConstraint('stat_date', 'sales_user_id', name='uq_lead_daily_stats_date_sales'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    stat_date = db.Column(db.Date, nullable=False, comment='统计日期')
+    sales_user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False, comment='责任销售ID')
+    new_leads = db.Column(db.Integer, nullable=False, default=0, comment='新增线索数（按创建日期）')
+    stage_transitions = db.Column(db.Integer, nullable=False, default=0, comment='阶段变更次数（按变更日期）')
+    payment_count = db.Column(db.Integer, nullable=False, default=0, comment='付款笔数（按付款日期）')
+    payment_sum = db.Column(Numeric(12, 2), nullable=False, default=0, comment='付款金额（按付款日期）')
+    contract_amount = db.Column(Numeric(12, 2), nullable=False, default=0, comment='合同金额（按首笔支付日期）')
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<LeadDailyStat {self.stat_date} sales#{self.sales_user_id}>'
+
+
+class LoginDailyStat(db.Model):
+    """登录每日汇总表（按日期 × 用户，登录日志写入时同步累加）"""
+    __tablename__ = 'login_daily_stats'
+    __table_args__ = (
+        db.UniqueConstraint('stat_date', 'user_id', name='uq_login_daily_stats_date_user'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    stat_date = db.Column(db.Date, nullable=False, comment='统计日期（按登录时间）')
+    # 不设外键：用户删除后保留历史汇总；0 表示未注册的手机号
+    user_id = db.Column(db.Integer, nullable=False, default=0, comment='用户ID（0 表示未注册手机号）')
+    success_count = db.Column(db.Integer, nullable=False, default=0, comment='登录成功次数')
+    failed_count = db.Column(db.Integer, nullable=False, default=0, comment='登录失败次数')
+    last_login_at = db.Column(db.DateTime, comment='当天最后一次登录时间')
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<LoginDailyStat {self.stat_date} user#{self.user_id}>'
+
+
+class CacheVersion(db.Model):
+    """缓存版本号表（数据变更时递增，供各进程判断本地缓存是否失效）"""
+    __tablename__ = 'cache_versions'
+
+    name = db.Column(db.String(50), primary_key=True, comment='缓存名称')
+    version = db.Column(db.Integer, nullable=False, default=0, comment='版本号')
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<CacheVersion {self.name}={self.version}>'
+
+
+class ExportJob(db.Model):
+    """数据导出任务表（后台生成导出文件，完成后在有效期内可下载）"""
+    __tablename__ = 'export_jobs'
+    __table_args__ = (
+        db.Index('idx_export_jobs_status_created', 'status', 'created_at'),
+    )
+
+    STATUS_PENDING = 'pending'
+    STATUS_RUNNING = 'running'
+    STATUS_COMPLETED = 'completed'
+    STATUS_FAILED = 'failed'
+    STATUS_EXPIRED = 'expired'
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False, comment='发起人ID')
+    tables = db.Column(db.Text, nullable=False, comment='导出的表（JSON数组）')
+    status = db.Column(db.String(20), nullable=False, default=STATUS_PENDING, comment='状态：pending/running/completed/failed/expired')
+    processed_rows = db.Column(db.Integer, nullable=False, default=0, comment='已导出行数')
+    total_rows = db.Column(db.Integer, comment='需导出总行数')
+    file_path = db.Column(db.String(500), comment='导出文件路径')
+    file_size = db.Column(db.Integer, comment='导出文件大小（字节）')
+    error_message = db.Column(db.Text, comment='失败原因')
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, comment='创建时间')
+    started_at = db.Column(db.DateTime, comment='开始时间')
+    heartbeat_at = db.Column(db.DateTime, comment='最近一次进度更新时间')
+    finished_at = db.Column(db.DateTime, comment='完成时间')
+    expires_at = db.Column(db.DateTime, comment='文件过期时间')
+
+    # 关联关系
+    user = db.relationship('User', backref='export_jobs')
+
+    def get_tables_list(self):
+        """获取导出的表列表"""
+        import json
+        try:
+            return json.loads(self.tables) if self.tables else []
+        except ValueError:
+            return []
+
+    @property
+    def progress(self):
+        """导出进度（0-100）"""
+        if self.status == self.STATUS_COMPLETED:
+            return 100
+        if not self.total_rows:
+            return 0
+        return min(int(self.processed_rows * 100 / self.total_rows), 99)
+
+    def __repr__(self):
+        return f'<ExportJob #{self.id} {self.status}>'
+
+
+class ExportWatermark(db.Model):
+    """增量导出水位表（每个导出方案、每张表记录上次导出到的位置）"""
+    __tablename__ = 'export_watermarks'
+    __table_args__ = (
+        db.UniqueConstraint('profile', 'table_key', name='uq_export_watermarks_profile_table'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    profile = db.Column(db.String(50), nullable=False, comment='导出方案名称')
+    table_key = db.Column(db.String(50), nullable=False, comment='导出表名')
+    watermark_column = db.Column(db.String(50), nullable=False, comment='水位字段：updated_at、id 或 snapshot（每次全量）')
+    last_changed_at = db.Column(db.DateTime, comment='已导出行的最大变更时间')
+    last_id = db.Column(db.Integer, nullable=False, default=0, comment='已导出行的最大ID（变更时间相同时按ID区分）')
+    last_row_count = db.Column(db.Integer, nullable=False, default=0, comment='上次导出行数')
+    last_file = db.Column(db.String(500), comment='上次导出文件路径')
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, comment='上次导出时间')
+
+    def __repr__(self):
+        return f'<ExportWatermark {self.profile}.{self.table_key}>'
@@ -3,6 +3,14 @@ from flask_login import login_required, current_user
 from functools import wraps
 from models import User, LoginLog, Lead, Customer, db
 from datetime import datetime, timedelta
+from sqlalchemy.orm import joinedload
+from utils.admin_overview import get_admin_overview
+from utils.date_filters import day_range
+from utils.lead_search import lead_search_condition
+from utils.loader_profiles import LEAD_LIST_PROFILE
+from utils.pagination import paginate_query
+from utils import reference_cache
+from utils.daily_stats import lead_stats_snapshot, apply_lead_stats_change
 import re
 import os
 from werkzeug.utils import secure_filename
@@ -44,43 +52,26 @@ def get_service_types_display(service_types_list):
 @admin_required
 def dashboard():
     """管理员仪表板"""
-    # 统计数据
-    total_users = User.query.count()
-    active_users = User.query.filter_by(status=True).count()
-    inactive_users = total_users - active_users
-    
-    # 最近登录记录
-    recent_logins = LoginLog.query.order_by(LoginLog.login_time.desc()).limit(10).all()
-
-    # 今日登录统计
-    from datetime import date
-    today = date.today()
-    today_logins = LoginLog.query.filter(
-        db.func.date(LoginLog.login_time) == today
-    ).count()
-
-    # 角色分布
-    sales_manager_count = User.query.filter_by(role='sales_manager', status=True).count()
-    salesperson_count = User.query.filter_by(role='salesperson', status=True).count()
-    teacher_count = User.query.filter_by(role='teacher', status=True).count()
-    admin_count = User.query.filter_by(role='admin', status=True).count()
-
-    # 线索和客户统计
-    total_leads = Lead.query.count()
-    total_customers = Customer.query.count()
+    # 统计数据（一次查询，进程内缓存 OVERVIEW_TTL 秒）
+    overview = get_admin_overview()
+
+    # 最近登录记录（一并加载登录用户）
+    recent_logins = LoginLog.query.options(
+        joinedload(LoginLog.user)
+    ).order_by(LoginLog.login_time.desc()).limit(10).all()
 
     return render_template('admin/dashboard.html',
-                         total_users=total_users,
-                         active_users=active_users,
-                         inactive_users=inactive_users,
+                         total_users=overview.total_users,
+                         active_users=overview.active_users,
+                         inactive_users=overview.inactive_users,
                          recent_logins=recent_logins,
-                         today_logins=today_logins,
-                         sales_manager_count=sales_manager_count,
-                         salesperson_count=salesperson_count,
-                         teacher_count=teacher_count,
-                         admin_count=admin_count,
-                         total_leads=total_leads,
-                         total_customers=total_customers)
+                         today_logins=overview.today_logins,
+                         sales_manager_count=overview.sales_manager_count,
+                         salesperson_count=overview.salesperson_count,
+                         teacher_count=overview.teacher_count,
+                         admin_count=overview.admin_count,
+                         total_leads=overview.total_leads,
+                         total_customers=overview.total_customers)
 
 @admin_bp.route('/users')
 @login_required
@@ -257,11 +248,14 @@ def login_logs():
     start_date = end_date - timedelta(days=days)
 
     # 查询日志
-    logs = LoginLog.query.filter(
+    # 日志持续增长，翻页使用游标分页，避免深层 OFFSET 扫描
+    query = LoginLog.query.filter(
         LoginLog.login_time >= start_date,
         LoginLog.login_time <= end_date
-    ).order_by(LoginLog.login_time.desc()).paginate(
-        page=page, per_page=50, error_out=False
+    )
+    logs = paginate_query(
+        query, [(LoginLog.login_time, True), (LoginLog.id, True)],
+        page=page, per_page=50, cursor=request.args.get('cursor')
     )
 
     return render_template('admin/login_logs.html', logs=logs, days=days)
@@ -378,16 +372,11 @@ def leads():
     if date_type and start_date and not end_date:
         end_date = datetime.now().strftime('%Y-%m-%d')
 
-    query = Lead.query
+    query = Lead.query.options(*LEAD_LIST_PROFILE)
 
     # 搜索过滤
     if search:
-        query = query.filter(
-            (Lead.parent_wechat_display_name.contains(search)) |
-            (Lead.parent_wechat_name.contains(search)) |
-            (Lead.contact_info.contains(search)) |
-            (Lead.student_name.contains(search) if Lead.student_name else False)
-        )
+        query = query.filter(lead_search_condition(search))
 
     # 阶段过滤
     if stage_filter:
@@ -404,40 +393,25 @@ def leads():
             end_dt = datetime.strptime(end_date, '%Y-%m-%d').date()
 
             if date_type == 'first_payment':
-                query = query.filter(
-                    and_(
-                        Lead.first_payment_at.isnot(None),
-                        func.date(Lead.first_payment_at) >= start_dt,
-                        func.date(Lead.first_payment_at) <= end_dt
-                    )
-                )
+                query = query.filter(day_range(Lead.first_payment_at, start_dt, end_dt))
             elif date_type == 'second_payment':
-                query = query.filter(
-                    and_(
-                        Lead.second_payment_at.isnot(None),
-                        func.date(Lead.second_payment_at) >= start_dt,
-                        func.date(Lead.second_payment_at) <= end_dt
-                    )
-                )
+                query = query.filter(day_range(Lead.second_payment_at, start_dt, end_dt))
             elif date_type == 'full_payment':
                 query = query.filter(
-                    and_(
-                        Lead.stage == '全款支付',
-                        Lead.updated_at.isnot(None),
-                        func.date(Lead.updated_at) >= start_dt,
-                        func.date(Lead.updated_at) <= end_dt
-                    )
+                    Lead.stage == '全款支付',
+                    day_range(Lead.updated_at, start_dt, end_dt)
                 )
         except ValueError:
             pass
 
-    # 分页
-    leads = query.order_by(Lead.updated_at.desc()).paginate(
-        page=page, per_page=20, error_out=False
+    # 分页（上一页/下一页使用游标分页）
+    leads = paginate_query(
+        query, [(Lead.updated_at, True), (Lead.id, True)],
+        page=page, per_page=20, cursor=request.args.get('cursor')
     )
 
     # 获取所有销售人员用于筛选
-    sales_users = User.query.filter(User.role.in_(['sales_manager', 'salesperson']), User.status == True).all()
+    sales_users = reference_cache.get_sales_users()
 
     # 线索阶段选项
     stages = ['获取联系方式', '线下见面', '首笔支付', '次笔支付', '全款支付']
@@ -465,8 +439,7 @@ def search_leads():
 
     # 搜索学员姓名或家长微信名
     leads = Lead.query.filter(
-        (Lead.student_name.ilike(f'%{query}%')) |
-        (Lead.parent_wechat_display_name.ilike(f'%{query}%'))
+        lead_search_condition(query, columns=('student_name', 'parent_wechat_display_name'))
     ).order_by(Lead.created_at.desc()).all()
 
     # 转换为JSON格式
@@ -521,6 +494,8 @@ def update_lead(lead_id):
     lead = Lead.query.get_or_404(lead_id)
 
     try:
+        stats_before = lead_stats_snapshot(lead)
+
         # 更新基本信息字段
         lead.parent_wechat_display_name = request.form.get('parent_wechat_display_name', '').strip()
         lead.parent_wechat_name = request.form.get('parent_wechat_name', '').strip()
@@ -573,6 +548,9 @@ def update_lead(lead_id):
         # 更新时间戳
         lead.updated_at = datetime.now()
 
+        # 责任销售、合同金额可能变更，同步每日汇总表
+        apply_lead_stats_change(stats_before, lead)
+
         db.session.commit()
         return jsonify({'success': True, 'message': '线索信息更新成功！'})
 
@@ -594,8 +572,14 @@ def delete_lead(lead_id):
     lead_name = lead.student_name or "未命名"
 
     try:
+        stats_before = lead_stats_snapshot(lead)
+
         # 直接删除线索，级联删除会自动处理所有关联数据
         db.session.delete(lead)
+
+        # 从每日汇总表中扣除该线索及其付款的贡献
+        apply_lead_stats_change(stats_before, None)
+
         db.session.commit()
 
         return jsonify({
@@ -1,7 +1,7 @@
 from flask import Blueprint, render_template, request, redirect, url_for, flash, session
 from flask_login import login_user, logout_user, login_required, current_user
-from models import User, LoginLog, db
-from datetime import datetime
+from models import User
+from utils.login_log_writer import enqueue_login_log
 import re
 
 auth_bp = Blueprint('auth', __name__)
@@ -12,18 +12,15 @@ def validate_phone(phone):
     return re.match(pattern, phone) is not None
 
 def log_login_attempt(phone, user_id=None, result='success', ip_address=None, user_agent=None):
-    """记录登录日志"""
+    """记录登录日志（放入队列由后台线程批量写入，登录请求不等待落盘）"""
     try:
-        log = LoginLog(
-            user_id=user_id,
+        enqueue_login_log(
             phone=phone,
-            login_time=datetime.utcnow(),
+            user_id=user_id,
+            login_result=result,
             ip_address=ip_address or request.remote_addr,
-            user_agent=user_agent or request.headers.get('User-Agent', ''),
-            login_result=result
+            user_agent=user_agent or request.headers.get('User-Agent', '')
         )
-        db.session.add(log)
-        db.session.commit()
     except Exception as e:
         print(f"记录登录日志失败: {e}")
 
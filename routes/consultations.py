@@ -8,6 +8,7 @@ from models import db, Lead, Customer, CommunicationRecord, User
 from datetime import datetime
 import functools
 from communication_utils import CommunicationManager
+from utils.loader_profiles import CONSULTATION_LIST_PROFILE
 
 # 创建蓝图
 consultations_bp = Blueprint('consultations', __name__)
@@ -39,7 +40,7 @@ def list_consultations():
     """咨询管理主页面 - 显示所有已约见的线索"""
     try:
         # 基础查询：所有有线下见面记录的线索（meeting_at不为空）
-        query = db.session.query(Lead).filter(Lead.meeting_at.isnot(None))
+        query = db.session.query(Lead).options(*CONSULTATION_LIST_PROFILE).filter(Lead.meeting_at.isnot(None))
 
         # 权限过滤
         if current_user.role == 'salesperson':
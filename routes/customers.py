@@ -5,6 +5,14 @@ from models import User, Customer, Lead, TutoringDelivery, CompetitionDelivery,
 from sqlalchemy.orm import joinedload
 from datetime import datetime, date
 from decimal import Decimal
+from utils.date_filters import day_range
+from utils.list_export import customer_view_export
+from utils.loader_profiles import CUSTOMER_LIST_PROFILE
+from utils.pagination import paginate_query
+from utils import reference_cache
+from utils.daily_stats import lead_stats_snapshot, apply_lead_stats_change
+from utils.payment_ordinals import second_payment_dates
+from utils.stream_export import STREAM_FORMATS, streaming_response
 import os
 from werkzeug.utils import secure_filename
 
@@ -22,33 +30,32 @@ def sales_or_admin_required(f):
 
 def get_teachers():
     """获取所有启用的班主任"""
-    return User.query.filter(
-        User.status == True,
-        User.role == 'teacher_supervisor'
-    ).all()
+    return reference_cache.get_teacher_supervisors()
 
-@customers_bp.route('/list')
-@login_required
-def list_customers():
-    """客户列表"""
-    page = request.args.get('page', 1, type=int)
-    search = request.args.get('search', '', type=str)
-    sales_filter = request.args.get('sales', '', type=str)  # 销售筛选
-    service_type = request.args.get('service_type', '', type=str)  # 服务类型筛选
-    completed = request.args.get('completed', '', type=str)  # 已完成筛选
+def _filtered_customers_query(args):
+    """
+    按客户列表的权限与筛选参数构建查询（列表页与导出共用）
+
+    Args:
+        args: 请求参数（request.args）
+
+    Returns:
+        Query: 已关联线索表的客户查询
+    """
+    search = args.get('search', '', type=str)
+    sales_filter = args.get('sales', '', type=str)  # 销售筛选
+    service_type = args.get('service_type', '', type=str)  # 服务类型筛选
+    completed = args.get('completed', '', type=str)  # 已完成筛选
 
     # 时间段筛选参数（按客户新增时间）
-    start_date = request.args.get('start_date', '', type=str)
-    end_date = request.args.get('end_date', '', type=str)
+    start_date = args.get('start_date', '', type=str)
+    end_date = args.get('end_date', '', type=str)
 
     # 如果只填了开始日期，结束日期默认为当天
     if start_date and not end_date:
         end_date = datetime.now().strftime('%Y-%m-%d')
 
-    query = Customer.query.join(Lead).options(
-        db.joinedload(Customer.tutoring_delivery),
-        db.joinedload(Customer.competition_delivery)
-    )
+    query = Customer.query.join(Lead)
 
     # 权限控制
     if current_user.role == 'teacher_supervisor':
@@ -83,66 +90,65 @@ def list_customers():
     # 服务类型筛选
     if service_type == 'tutoring':
         # 筛选有课题辅导服务的客户
-        query = query.filter(Lead.service_types.contains('tutoring'))
+        query = query.filter(Lead.service_type_filter('tutoring'))
     elif service_type == 'competition':
         # 筛选有竞赛辅导服务的客户
-        query = query.filter(Lead.service_types.contains('competition'))
+        query = query.filter(Lead.service_type_filter('competition'))
     elif service_type == 'upgrade_guidance':
         # 筛选有升学陪跑服务的客户
-        query = query.filter(Lead.service_types.contains('upgrade_guidance'))
+        query = query.filter(Lead.service_type_filter('upgrade_guidance'))
 
     # 已完成筛选
     if completed == 'true':
         # 筛选已完成的客户（课题辅导已完成或竞赛辅导已完成）
+        # 使用 EXISTS 子查询，避免未关联的交付表与客户表形成笛卡尔积
         query = query.filter(
-            (TutoringDelivery.thesis_status == '已完成') |
-            (CompetitionDelivery.delivery_status == '服务完结')
+            Customer.tutoring_delivery.has(TutoringDelivery.thesis_status == '已完成') |
+            Customer.competition_delivery.has(CompetitionDelivery.delivery_status == '服务完结')
         )
 
     # 时间段筛选（按客户新增时间）
     if start_date:
         try:
-            from sqlalchemy import func, and_
             start_dt = datetime.strptime(start_date, '%Y-%m-%d').date()
             end_dt = datetime.strptime(end_date, '%Y-%m-%d').date()
 
-            query = query.filter(
-                and_(
-                    func.date(Customer.created_at) >= start_dt,
-                    func.date(Customer.created_at) <= end_dt
-                )
-            )
+            query = query.filter(day_range(Customer.created_at, start_dt, end_dt))
         except ValueError:
             pass
 
-    # 分页 - 按次笔付款时间倒序排列（NULL值排最后），相同时间按客户创建时间倒序
-    customers = query.order_by(
-        Lead.second_payment_at.desc().nullslast(),
-        Customer.created_at.desc()
-    ).paginate(page=page, per_page=20, error_out=False)
+    return query
 
-    # 获取所有销售用户用于筛选
-    sales_users = User.query.filter(
-        User.role.in_(['sales_manager', 'salesperson']),
-        User.status == True
-    ).order_by(User.username).all()
+@customers_bp.route('/list')
+@login_required
+def list_customers():
+    """客户列表"""
+    page = request.args.get('page', 1, type=int)
+    search = request.args.get('search', '', type=str)
+    sales_filter = request.args.get('sales', '', type=str)
+    service_type = request.args.get('service_type', '', type=str)
+    completed = request.args.get('completed', '', type=str)
+    start_date = request.args.get('start_date', '', type=str)
+    end_date = request.args.get('end_date', '', type=str)
+    if start_date and not end_date:
+        end_date = datetime.now().strftime('%Y-%m-%d')
 
-    # 为当前页的客户批量查询次笔付款时间（性能优化）
-    from models import Payment
-    from sqlalchemy import func
+    query = _filtered_customers_query(request.args).options(*CUSTOMER_LIST_PROFILE)
 
-    # 获取当前页所有客户的lead_id
-    lead_ids = [customer.lead_id for customer in customers.items]
+    # 分页 - 按次笔付款时间倒序排列（NULL值排最后），相同时间按客户创建时间倒序
+    # 上一页/下一页使用游标分页
+    customers = paginate_query(
+        query,
+        [(Lead.second_payment_at, True), (Customer.created_at, True), (Customer.id, True)],
+        page=page, per_page=20, cursor=request.args.get('cursor'),
+        key=lambda c: (c.lead.second_payment_at, c.created_at, c.id)
+    )
 
-    # 批量查询每个线索的次笔付款时间
-    # 使用子查询找出每个线索的第二笔付款
-    second_payments = {}
-    if lead_ids:
-        # 为每个lead_id查询第二笔付款
-        for lead_id in lead_ids:
-            payments = Payment.query.filter_by(lead_id=lead_id).order_by(Payment.payment_date.asc()).limit(2).all()
-            if len(payments) >= 2:
-                second_payments[lead_id] = payments[1].payment_date
+    # 获取所有销售用户用于筛选
+    sales_users = reference_cache.get_sales_users(order_by_name=True)
+
+    # 为当前页的客户批量查询次笔付款时间（一条查询）
+    second_payments = second_payment_dates(customer.lead_id for customer in customers.items)
 
     # 批量查询每个客户的赛事数量
     customer_ids = [customer.id for customer in customers.items]
@@ -170,6 +176,19 @@ def list_customers():
                          second_payments=second_payments,
                          competition_counts=competition_counts)
 
+@customers_bp.route('/export')
+@login_required
+def export_customers():
+    """导出当前筛选条件下的客户列表（流式输出 CSV/NDJSON，参数同列表页）"""
+    fmt = request.args.get('format', 'csv')
+    if fmt not in STREAM_FORMATS:
+        return jsonify({'success': False, 'message': f'不支持的导出格式：{fmt}'}), 400
+
+    keys, column_names, batches = customer_view_export(_filtered_customers_query(request.args), raw=(fmt == 'ndjson'))
+    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+    return streaming_response(batches, fmt, column_names if fmt == 'csv' else keys, f'客户列表_{timestamp}',
+                              compress=request.args.get('gzip') == '1')
+
 @customers_bp.route('/<int:customer_id>/detail')
 @login_required
 def customer_detail(customer_id):
@@ -235,12 +254,17 @@ def edit_customer(customer_id):
                                      sales_users=sales_users, teacher_users=teacher_users)
 
         try:
+            stats_before = lead_stats_snapshot(customer.lead)
+
             # 更新线索信息
             customer.lead.student_name = student_name
             customer.lead.contact_info = contact_info
             customer.lead.sales_user_id = sales_user_id
             customer.lead.updated_at = datetime.utcnow()
 
+            # 责任销售可能变更，同步每日汇总表（在下面添加沟通记录提交之前，与线索修改一起提交）
+            apply_lead_stats_change(stats_before, customer.lead)
+
             # 更新客户信息
             customer.teacher_user_id = teacher_user_id if teacher_user_id else None
             customer.competition_award_level = competition_award_level if competition_award_level else None
@@ -711,7 +735,7 @@ def delete_competition(competition_id):
 def get_competition_names():
     """获取所有赛事名称（用于下拉选择）"""
     try:
-        competition_names = CompetitionName.query.order_by(CompetitionName.name).all()
+        competition_names = reference_cache.get_competition_names()
 
         data = [{'id': cn.id, 'name': cn.name} for cn in competition_names]
 
@@ -6,14 +6,21 @@
 from flask import Blueprint, render_template, request, jsonify, send_file
 from flask_login import login_required, current_user
 from functools import wraps
-from models import db, User, Lead, Customer, Payment, Teacher, TutoringDelivery, CompetitionDelivery, CommunicationRecord, LoginLog, CompetitionName, TeacherImage
+from models import db, ExportJob
+from utils.table_export import EXPORTABLE_TABLES, iter_table_batches, iter_table_rows, write_workbook
+from utils.stream_export import STREAM_FORMATS, streaming_response
+from utils.export_jobs import create_export_job, cleanup_expired_exports, is_downloadable, job_to_dict
 from datetime import datetime
-import pandas as pd
-import io
-import os
+import tempfile
 
 data_export_bp = Blueprint('data_export', __name__)
 
+# 导出文件在内存中保留的最大字节数，超出后写入磁盘临时文件
+SPOOL_MAX_SIZE = 8 * 1024 * 1024
+
+# 导出页面显示的最近任务数
+RECENT_JOBS_LIMIT = 10
+
 def admin_required(f):
     """管理员权限装饰器"""
     @wraps(f)
@@ -25,100 +32,70 @@ def admin_required(f):
         return f(*args, **kwargs)
     return decorated_function
 
-# 定义所有可导出的表及其中文名称
-EXPORTABLE_TABLES = {
-    'users': {
-        'name': '用户表',
-        'model': User,
-        'columns': ['id', 'username', 'phone', 'role', 'status', 'created_at', 'updated_at'],
-        'column_names': ['ID', '用户名', '手机号', '角色', '状态', '创建时间', '更新时间']
-    },
-    'leads': {
-        'name': '线索表',
-        'model': Lead,
-        'columns': ['id', 'student_name', 'parent_wechat_display_name', 'parent_wechat_name', 
-                   'contact_info', 'lead_source', 'grade', 'stage', 'sales_user_id', 
-                   'contact_obtained_at', 'meeting_at', 'meeting_location', 'follow_up_notes', 
-                   'created_at', 'updated_at'],
-        'column_names': ['ID', '学员姓名', '家长微信昵称', '家长微信号', '联系方式', '线索来源', 
-                        '年级', '阶段', '销售负责人ID', '获取联系方式时间', '约见时间', '约见地点', 
-                        '跟进备注', '创建时间', '更新时间']
-    },
-    'customers': {
-        'name': '客户表',
-        'model': Customer,
-        'columns': ['id', 'lead_id', 'sales_user_id', 'teacher_user_id', 'teacher_id', 
-                   'service_type', 'payment_amount', 'is_priority', 'customer_notes', 
-                   'converted_at', 'created_at', 'updated_at'],
-        'column_names': ['ID', '线索ID', '销售负责人ID', '班主任ID', '辅导老师ID', '服务类型', 
-                        '支付金额', '是否优先', '客户备注', '转化时间', '创建时间', '更新时间']
-    },
-    'payments': {
-        'name': '付款记录表',
-        'model': Payment,
-        'columns': ['id', 'lead_id', 'amount', 'payment_date', 'payment_method', 'notes', 
-                   'created_at', 'updated_at'],
-        'column_names': ['ID', '线索ID', '金额', '付款日期', '付款方式', '备注', '创建时间', '更新时间']
-    },
-    'teachers': {
-        'name': '老师表',
-        'model': Teacher,
-        'columns': ['id', 'chinese_name', 'english_name', 'current_institution', 'major', 
-                   'highest_degree', 'education_background', 'research_achievements', 
-                   'innovation_achievements', 'social_roles', 'status', 'created_at', 'updated_at'],
-        'column_names': ['ID', '中文名', '英文名', '现单位', '专业方向', '最高学历', '教育背景', 
-                        '科研成果', '科创辅导成果', '社会角色', '状态', '创建时间', '更新时间']
-    },
-    'tutoring_deliveries': {
-        'name': '课题辅导交付表',
-        'model': TutoringDelivery,
-        'columns': ['id', 'customer_id', 'project_topic', 'project_description', 
-                   'start_date', 'expected_completion_date', 'actual_completion_date', 
-                   'status', 'progress_notes', 'created_at', 'updated_at'],
-        'column_names': ['ID', '客户ID', '课题名称', '课题描述', '开始日期', '预计完成日期', 
-                        '实际完成日期', '状态', '进度备注', '创建时间', '更新时间']
-    },
-    'competition_deliveries': {
-        'name': '竞赛交付表',
-        'model': CompetitionDelivery,
-        'columns': ['id', 'customer_id', 'competition_name', 'target_award_level', 
-                   'registration_date', 'competition_date', 'result_date', 'actual_award_level', 
-                   'status', 'notes', 'created_at', 'updated_at'],
-        'column_names': ['ID', '客户ID', '竞赛名称', '目标奖项', '报名日期', '比赛日期', 
-                        '结果公布日期', '实际奖项', '状态', '备注', '创建时间', '更新时间']
-    },
-    'communication_records': {
-        'name': '沟通记录表',
-        'model': CommunicationRecord,
-        'columns': ['id', 'lead_id', 'customer_id', 'content', 'created_at'],
-        'column_names': ['ID', '线索ID', '客户ID', '沟通内容', '创建时间']
-    },
-    'login_logs': {
-        'name': '登录日志表',
-        'model': LoginLog,
-        'columns': ['id', 'user_id', 'login_time', 'ip_address', 'user_agent'],
-        'column_names': ['ID', '用户ID', '登录时间', 'IP地址', '用户代理']
-    },
-    'competition_names': {
-        'name': '竞赛名称配置表',
-        'model': CompetitionName,
-        'columns': ['id', 'name', 'category', 'description', 'is_active', 'created_at', 'updated_at'],
-        'column_names': ['ID', '竞赛名称', '类别', '描述', '是否启用', '创建时间', '更新时间']
-    }
-}
-
 @data_export_bp.route('/export')
 @login_required
 @admin_required
 def export_page():
     """数据导出页面"""
-    return render_template('data_export/index.html', tables=EXPORTABLE_TABLES)
+    recent_jobs = ExportJob.query.order_by(ExportJob.id.desc()).limit(RECENT_JOBS_LIMIT).all()
+    return render_template('data_export/index.html',
+                         tables=EXPORTABLE_TABLES,
+                         recent_jobs=[job_to_dict(job) for job in recent_jobs])
+
+@data_export_bp.route('/export/jobs', methods=['POST'])
+@login_required
+@admin_required
+def create_job():
+    """创建后台导出任务（立即返回，由后台生成文件）"""
+    try:
+        selected_tables = [key for key in request.json.get('tables', []) if key in EXPORTABLE_TABLES]
+
+        if not selected_tables:
+            return jsonify({'success': False, 'message': '请至少选择一个表'}), 400
+
+        cleanup_expired_exports()
+        job = create_export_job(current_user.id, selected_tables)
+
+        return jsonify({'success': True, 'job': job_to_dict(job)})
+
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'success': False, 'message': f'创建导出任务失败：{str(e)}'}), 500
+
+@data_export_bp.route('/export/jobs/<int:job_id>')
+@login_required
+@admin_required
+def job_status(job_id):
+    """查询导出任务进度"""
+    job = db.session.get(ExportJob, job_id)
+    if job is None:
+        return jsonify({'success': False, 'message': '导出任务不存在'}), 404
+    return jsonify({'success': True, 'job': job_to_dict(job)})
+
+@data_export_bp.route('/export/jobs/<int:job_id>/download')
+@login_required
+@admin_required
+def download_job(job_id):
+    """下载导出任务生成的文件（仅在有效期内）"""
+    job = db.session.get(ExportJob, job_id)
+    if job is None:
+        return jsonify({'success': False, 'message': '导出任务不存在'}), 404
+    if not is_downloadable(job):
+        return jsonify({'success': False, 'message': '导出文件未生成或已过期'}), 410
+
+    timestamp = job.finished_at.strftime('%Y%m%d_%H%M%S')
+    return send_file(
+        job.file_path,
+        mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+        as_attachment=True,
+        download_name=f'数据导出_{timestamp}.xlsx'
+    )
 
 @data_export_bp.route('/export/download', methods=['POST'])
 @login_required
 @admin_required
 def download_data():
-    """下载选中的表数据为Excel文件"""
+    """下载选中的表数据为Excel文件（同步生成，大表请使用后台导出任务）"""
     try:
         # 获取选中的表
         selected_tables = request.json.get('tables', [])
@@ -126,76 +103,15 @@ def download_data():
         if not selected_tables:
             return jsonify({'success': False, 'message': '请至少选择一个表'}), 400
         
-        # 创建Excel写入器
-        output = io.BytesIO()
-        
-        with pd.ExcelWriter(output, engine='openpyxl') as writer:
-            for table_key in selected_tables:
-                if table_key not in EXPORTABLE_TABLES:
-                    continue
-                
-                table_info = EXPORTABLE_TABLES[table_key]
-                model = table_info['model']
-                columns = table_info['columns']
-                column_names = table_info['column_names']
-                
-                # 查询数据
-                query = db.session.query(model)
-                
-                # 特殊处理：用户表不导出密码相关字段
-                if table_key == 'users':
-                    data = []
-                    for record in query.all():
-                        row = {}
-                        for col in columns:
-                            value = getattr(record, col, None)
-                            # 格式化特殊字段
-                            if col == 'role':
-                                role_map = {
-                                    'admin': '管理员',
-                                    'sales_manager': '销售管理',
-                                    'salesperson': '销售专员',
-                                    'teacher_supervisor': '班主任',
-                                    'teacher': '老师'
-                                }
-                                value = role_map.get(value, value)
-                            elif col == 'status':
-                                value = '启用' if value else '禁用'
-                            elif isinstance(value, datetime):
-                                value = value.strftime('%Y-%m-%d %H:%M:%S')
-                            row[col] = value
-                        data.append(row)
-                else:
-                    # 其他表直接导出
-                    data = []
-                    for record in query.all():
-                        row = {}
-                        for col in columns:
-                            value = getattr(record, col, None)
-                            # 格式化日期时间
-                            if isinstance(value, datetime):
-                                value = value.strftime('%Y-%m-%d %H:%M:%S')
-                            elif isinstance(value, bool):
-                                value = '是' if value else '否'
-                            row[col] = value
-                        data.append(row)
-                
-                # 创建DataFrame
-                if data:
-                    df = pd.DataFrame(data)
-                    # 重命名列为中文
-                    df.columns = column_names
-                else:
-                    # 空表也创建表头
-                    df = pd.DataFrame(columns=column_names)
-                
-                # 写入Excel，使用表的中文名作为sheet名
-                sheet_name = table_info['name'][:31]  # Excel sheet名称最多31字符
-                df.to_excel(writer, sheet_name=sheet_name, index=False)
-        
-        # 准备下载
+        # 流式写入Excel：按批读取数据，超过内存阈值的部分落盘到临时文件
+        output = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_SIZE)
+        try:
+            write_workbook(selected_tables, output)
+        except Exception:
+            output.close()
+            raise
         output.seek(0)
-        
+
         # 生成文件名
         timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
         filename = f'数据导出_{timestamp}.xlsx'
@@ -212,6 +128,34 @@ def download_data():
         traceback.print_exc()
         return jsonify({'success': False, 'message': f'导出失败：{str(e)}'}), 500
 
+@data_export_bp.route('/export/stream/<table_key>')
+@login_required
+@admin_required
+def stream_table(table_key):
+    """
+    流式导出单个表为 CSV 或 NDJSON（分块传输，边查询边输出）
+
+    查询参数：
+        format: csv（默认，中文表头）或 ndjson（英文字段名、原始值）
+        gzip: 1 时即时压缩为 .gz
+    """
+    if table_key not in EXPORTABLE_TABLES:
+        return jsonify({'success': False, 'message': '表不存在'}), 404
+
+    fmt = request.args.get('format', 'csv')
+    if fmt not in STREAM_FORMATS:
+        return jsonify({'success': False, 'message': f'不支持的导出格式：{fmt}'}), 400
+
+    table_info = EXPORTABLE_TABLES[table_key]
+    if fmt == 'csv':
+        batches, fields = iter_table_batches(table_key), table_info['column_names']
+    else:
+        batches, fields = iter_table_batches(table_key, raw=True), table_info['columns']
+
+    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+    return streaming_response(batches, fmt, fields, f"{table_info['name']}_{timestamp}",
+                              compress=request.args.get('gzip') == '1')
+
 @data_export_bp.route('/export/preview/<table_key>')
 @login_required
 @admin_required
@@ -223,26 +167,15 @@ def preview_table(table_key):
         
         table_info = EXPORTABLE_TABLES[table_key]
         model = table_info['model']
-        columns = table_info['columns']
         column_names = table_info['column_names']
         
         # 查询前10条数据
-        records = db.session.query(model).limit(10).all()
-        
         data = []
-        for record in records:
-            row = {}
-            for i, col in enumerate(columns):
-                value = getattr(record, col, None)
-                # 格式化显示
-                if isinstance(value, datetime):
-                    value = value.strftime('%Y-%m-%d %H:%M:%S')
-                elif isinstance(value, bool):
-                    value = '是' if value else '否'
-                elif value is None:
-                    value = ''
-                row[column_names[i]] = str(value)
-            data.append(row)
+        for values in iter_table_rows(table_key, limit=10):
+            data.append({
+                name: '' if value is None else str(value)
+                for name, value in zip(column_names, values)
+            })
         
         # 获取总记录数
         total_count = db.session.query(model).count()
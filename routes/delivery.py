@@ -4,6 +4,12 @@ from functools import wraps
 from models import User, Customer, Lead, TutoringDelivery, CompetitionDelivery, Payment, db
 from datetime import datetime, date
 from sqlalchemy import and_, func
+from utils.dashboard_metrics import compute_delivery_metrics
+from utils.date_filters import day_range
+from utils.loader_profiles import TUTORING_LIST_PROFILE, COMPETITION_LIST_PROFILE, LEAD_LIST_PROFILE
+from utils.pagination import paginate_query
+from utils import reference_cache
+from utils.payment_ordinals import first_payment_dates
 
 delivery_bp = Blueprint('delivery', __name__)
 
@@ -22,50 +28,15 @@ def teacher_supervisor_required(f):
 @teacher_supervisor_required
 def dashboard():
     """交付管理仪表板"""
-    # 我负责的客户统计
-    my_customers = Customer.query.filter_by(teacher_user_id=current_user.id).count()
-    
-    # 课题辅导统计 - 基于实际服务类型
-    tutoring_total = Customer.query.join(Customer.lead).filter(
-        Customer.teacher_user_id == current_user.id,
-        Lead.service_types.contains('tutoring')
-    ).count()
-
-    tutoring_completed = TutoringDelivery.query.join(Customer).join(Customer.lead).filter(
-        Customer.teacher_user_id == current_user.id,
-        Lead.service_types.contains('tutoring'),
-        TutoringDelivery.thesis_status == '已完成'
-    ).count()
-
-    # 竞赛辅导统计 - 基于实际服务类型
-    competition_total = Customer.query.join(Customer.lead).filter(
-        Customer.teacher_user_id == current_user.id,
-        Lead.service_types.contains('competition')
-    ).count()
+    # 负责客户及课题/竞赛辅导统计（一次查询）
+    metrics = compute_delivery_metrics(current_user.id)
 
-    competition_completed = CompetitionDelivery.query.join(Customer).join(Customer.lead).filter(
-        Customer.teacher_user_id == current_user.id,
-        Lead.service_types.contains('competition'),
-        CompetitionDelivery.delivery_status == '服务完结'
-    ).count()
-    
-    # 最近的交付任务
-    recent_tutoring = TutoringDelivery.query.join(Customer).filter(
-        Customer.teacher_user_id == current_user.id
-    ).order_by(TutoringDelivery.updated_at.desc()).limit(5).all()
-    
-    recent_competition = CompetitionDelivery.query.join(Customer).filter(
-        Customer.teacher_user_id == current_user.id
-    ).order_by(CompetitionDelivery.updated_at.desc()).limit(5).all()
-    
     return render_template('delivery/dashboard.html',
-                         my_customers=my_customers,
-                         tutoring_total=tutoring_total,
-                         tutoring_completed=tutoring_completed,
-                         competition_total=competition_total,
-                         competition_completed=competition_completed,
-                         recent_tutoring=recent_tutoring,
-                         recent_competition=recent_competition)
+                         my_customers=metrics.my_customers,
+                         tutoring_total=metrics.tutoring_total,
+                         tutoring_completed=metrics.tutoring_completed,
+                         competition_total=metrics.competition_total,
+                         competition_completed=metrics.competition_completed)
 
 @delivery_bp.route('/leads')
 @login_required
@@ -82,7 +53,7 @@ def leads_list():
         end_date = datetime.now().strftime('%Y-%m-%d')
 
     # 基础查询：只显示首笔支付阶段的线索
-    query = Lead.query.filter(Lead.stage == '首笔支付')
+    query = Lead.query.filter(Lead.stage == '首笔支付').options(*LEAD_LIST_PROFILE)
 
     # 搜索过滤（学员姓名或家长微信名）
     if search:
@@ -111,10 +82,7 @@ def leads_list():
 
             # 筛选首笔付款日期在范围内的线索
             lead_ids_in_range = db.session.query(subquery.c.lead_id).filter(
-                and_(
-                    func.date(subquery.c.first_payment_date) >= start_dt,
-                    func.date(subquery.c.first_payment_date) <= end_dt
-                )
+                day_range(subquery.c.first_payment_date, start_dt, end_dt)
             ).all()
 
             lead_ids = [lid[0] for lid in lead_ids_in_range]
@@ -126,25 +94,17 @@ def leads_list():
         except ValueError:
             pass
 
-    # 分页 - 按更新时间倒序
-    leads = query.order_by(Lead.updated_at.desc()).paginate(
-        page=page, per_page=20, error_out=False
+    # 分页 - 按更新时间倒序（上一页/下一页使用游标分页）
+    leads = paginate_query(
+        query, [(Lead.updated_at, True), (Lead.id, True)],
+        page=page, per_page=20, cursor=request.args.get('cursor')
     )
 
     # 获取所有销售用户（用于显示）
-    sales_users = User.query.filter(
-        User.role.in_(['sales_manager', 'salesperson']),
-        User.status == True
-    ).order_by(User.username).all()
+    sales_users = reference_cache.get_sales_users(order_by_name=True)
 
-    # 批量查询定金支付日期（首笔付款日期）
-    lead_ids = [lead.id for lead in leads.items]
-    first_payment_dates = {}
-    if lead_ids:
-        for lead_id in lead_ids:
-            payments = Payment.query.filter_by(lead_id=lead_id).order_by(Payment.payment_date.asc()).limit(1).all()
-            if payments and payments[0].payment_date:
-                first_payment_dates[lead_id] = payments[0].payment_date
+    # 批量查询定金支付日期（首笔付款日期，一条查询）
+    first_payments = first_payment_dates(lead.id for lead in leads.items)
 
     return render_template('delivery/leads_list.html',
                          leads=leads,
@@ -152,7 +112,7 @@ def leads_list():
                          start_date=start_date,
                          end_date=end_date,
                          sales_users=sales_users,
-                         first_payment_dates=first_payment_dates)
+                         first_payment_dates=first_payments)
 
 @delivery_bp.route('/tutoring')
 @login_required
@@ -163,7 +123,7 @@ def tutoring_list():
     search = request.args.get('search', '', type=str)
     status_filter = request.args.get('status', '', type=str)
     
-    query = TutoringDelivery.query.join(Customer).join(Customer.lead).filter(
+    query = TutoringDelivery.query.join(Customer).join(Customer.lead).options(*TUTORING_LIST_PROFILE).filter(
         Customer.teacher_user_id == current_user.id
     )
     
@@ -258,7 +218,7 @@ def competition_list():
     search = request.args.get('search', '', type=str)
     status_filter = request.args.get('status', '', type=str)
     
-    query = CompetitionDelivery.query.join(Customer).join(Customer.lead).filter(
+    query = CompetitionDelivery.query.join(Customer).join(Customer.lead).options(*COMPETITION_LIST_PROFILE).filter(
         Customer.teacher_user_id == current_user.id
     )
     
@@ -5,6 +5,16 @@ from models import User, Lead, Customer, Payment, db
 from datetime import datetime, date, timedelta
 from decimal import Decimal
 from sqlalchemy import func, and_
+from utils.dashboard_metrics import compute_dashboard_metrics
+from utils.date_filters import day_range
+from utils.lead_search import lead_search_condition
+from utils.list_export import lead_view_export
+from utils.loader_profiles import LEAD_LIST_PROFILE
+from utils.phone import normalize_phone
+from utils.pagination import paginate_query
+from utils.stream_export import STREAM_FORMATS, streaming_response
+from utils import reference_cache
+from utils.daily_stats import lead_stats_snapshot, apply_lead_stats_change, record_stage_transition
 import re
 
 leads_bp = Blueprint('leads', __name__)
@@ -36,6 +46,8 @@ def validate_phone(phone):
 
 def auto_update_lead_stage(lead):
     """根据线索的各种操作自动更新阶段"""
+    old_stage = lead.stage
+
     # 获取该线索的所有付款记录，按日期排序
     payments = Payment.query.filter_by(lead_id=lead.id).order_by(Payment.payment_date.asc()).all()
 
@@ -65,6 +77,9 @@ def auto_update_lead_stage(lead):
     else:
         lead.stage = '获取联系方式'
 
+    # 同一事务内记录阶段变更到每日汇总表
+    record_stage_transition(lead, old_stage)
+
 def update_lead_payment_times(lead):
     """根据付款记录自动更新线索的支付时间和阶段"""
     # 获取该线索的所有付款记录，按日期排序
@@ -103,7 +118,6 @@ def dashboard():
     """线索管理仪表板"""
     from datetime import date, timedelta
     from flask import request
-    from sqlalchemy import and_, func
 
     # 获取统计模式参数
     stats_mode = request.args.get('mode', 'period')  # period: 时间段统计, total: 累计统计
@@ -125,154 +139,52 @@ def dashboard():
         start_date = default_start
         end_date = today
 
-    if stats_mode == 'total':
-        # 累计统计模式：显示当前负责的所有线索的总体情况
-
-        # 1. 合同额统计 - 所有有合同金额的线索
-        contract_query = db.session.query(func.sum(Lead.contract_amount)).filter(
-            Lead.contract_amount.isnot(None)
-        )
-
-        # 权限控制：销售相关角色只能看到自己的数据
-        if current_user.is_sales():
-            contract_query = contract_query.filter(Lead.sales_user_id == current_user.id)
-
-        contract_amount_result = contract_query.scalar()
-        total_contract_amount = float(contract_amount_result or 0)
-
-    else:
-        # 时间段统计模式：基于首笔支付时间
-        contract_query = db.session.query(func.sum(Lead.contract_amount)).filter(
-            and_(
-                Lead.first_payment_at.isnot(None),
-                func.date(Lead.first_payment_at) >= start_date,
-                func.date(Lead.first_payment_at) <= end_date
-            )
-        )
-
-        # 权限控制：销售相关角色只能看到自己的数据
-        if current_user.is_sales():
-            contract_query = contract_query.filter(Lead.sales_user_id == current_user.id)
-
-        contract_amount_result = contract_query.scalar()
-        total_contract_amount = float(contract_amount_result or 0)
-
-
-
-    if stats_mode == 'total':
-        # 累计统计模式
-
-        # 2. 首笔客户数 - 处于"首笔支付"阶段的所有客户
-        first_payment_query = db.session.query(Lead.id).filter(Lead.stage == '首笔支付')
-
-        # 权限控制：销售相关角色只能看到自己的数据
-        if current_user.is_sales():
-            first_payment_query = first_payment_query.filter(Lead.sales_user_id == current_user.id)
-
-        first_payment_customers = first_payment_query.count()
-
-        # 3. 付款客户数 - 所有有付款记录的客户
-        paid_customers_query = db.session.query(Lead.id).join(Payment)
-
-        # 权限控制：销售相关角色只能看到自己的数据
-        if current_user.is_sales():
-            paid_customers_query = paid_customers_query.filter(Lead.sales_user_id == current_user.id)
-
-        paid_customers = paid_customers_query.distinct().count()
-
-        # 4. 付款金额 - 所有付款记录的总金额
-        payment_amount_query = db.session.query(func.sum(Payment.amount)).join(Lead)
-
-        # 权限控制：销售相关角色只能看到自己的数据
-        if current_user.is_sales():
-            payment_amount_query = payment_amount_query.filter(Lead.sales_user_id == current_user.id)
-
-        total_payment_amount = payment_amount_query.scalar() or 0
-
-    else:
-        # 时间段统计模式
-
-        # 2. 首笔客户数 - 处于"首笔支付"阶段的客户
-        first_payment_query = db.session.query(Lead.id).filter(
-            and_(
-                Lead.stage == '首笔支付',
-                Lead.created_at >= start_date,
-                Lead.created_at <= end_date
-            )
-        )
-
-        # 权限控制：销售相关角色只能看到自己的数据
-        if current_user.is_sales():
-            first_payment_query = first_payment_query.filter(Lead.sales_user_id == current_user.id)
-
-        first_payment_customers = first_payment_query.count()
-
-        # 3. 付款客户数 - 基于Payment表统计有实际付款记录的客户
-        paid_customers_query = db.session.query(Lead.id).join(Payment).filter(
-            and_(
-                Payment.payment_date >= start_date,
-                Payment.payment_date <= end_date
-            )
-        )
-
-        # 权限控制：销售相关角色只能看到自己的数据
-        if current_user.is_sales():
-            paid_customers_query = paid_customers_query.filter(Lead.sales_user_id == current_user.id)
-
-        paid_customers = paid_customers_query.distinct().count()
-
-        # 4. 付款金额 - 指定时间段内的总付款金额
-        payment_amount_query = db.session.query(func.sum(Payment.amount)).join(Lead).filter(
-            and_(
-                Payment.payment_date >= start_date,
-                Payment.payment_date <= end_date
-            )
-        )
-
-        # 权限控制：销售相关角色只能看到自己的数据
-        if current_user.is_sales():
-            payment_amount_query = payment_amount_query.filter(Lead.sales_user_id == current_user.id)
-
-        total_payment_amount = payment_amount_query.scalar() or 0
-
-
+    # 销售相关角色只能看到自己的数据；累计模式不限定时间段
+    metrics = compute_dashboard_metrics(
+        sales_user_id=current_user.id if current_user.is_sales() else None,
+        start_date=start_date if stats_mode != 'total' else None,
+        end_date=end_date if stats_mode != 'total' else None
+    )
 
     return render_template('leads/dashboard.html',
                          start_date=start_date.strftime('%Y-%m-%d'),
                          end_date=end_date.strftime('%Y-%m-%d'),
-                         total_contract_amount=total_contract_amount,
-                         first_payment_customers=first_payment_customers,
-                         paid_customers=paid_customers,
-                         total_payment_amount=total_payment_amount,
+                         total_contract_amount=metrics.total_contract_amount,
+                         first_payment_customers=metrics.first_payment_customers,
+                         paid_customers=metrics.paid_customers,
+                         total_payment_amount=metrics.total_payment_amount,
                          stats_mode=stats_mode)
 
-@leads_bp.route('/list')
-@login_required
-@sales_required
-def list_leads():
-    """线索列表"""
-    page = request.args.get('page', 1, type=int)
-    search = request.args.get('search', '', type=str)
-    stage_filter = request.args.get('stage', '', type=str)
-    sales_filter = request.args.get('sales', '', type=str)
-    lead_source_filter = request.args.get('lead_source', '', type=str)
+def _filtered_leads_query(args):
+    """
+    按线索列表的权限与筛选参数构建查询（列表页与导出共用）
+
+    Args:
+        args: 请求参数（request.args）
+
+    Returns:
+        Query: 线索查询
+    """
+    search = args.get('search', '', type=str)
+    stage_filter = args.get('stage', '', type=str)
+    sales_filter = args.get('sales', '', type=str)
+    lead_source_filter = args.get('lead_source', '', type=str)
 
     # 时间段筛选参数
-    date_type = request.args.get('date_type', '', type=str)  # first_payment, second_payment, full_payment
-    start_date = request.args.get('start_date', '', type=str)
-    end_date = request.args.get('end_date', '', type=str)
+    date_type = args.get('date_type', '', type=str)  # first_payment, second_payment, full_payment
+    start_date = args.get('start_date', '', type=str)
+    end_date = args.get('end_date', '', type=str)
 
     # 如果结束日期未填写，默认为当前日期
     if date_type and start_date and not end_date:
-        from datetime import date
         end_date = date.today().strftime('%Y-%m-%d')
 
     # 新增：仪表板跳转的筛选参数
-    first_payment_date_start = request.args.get('first_payment_date_start', '', type=str)
-    first_payment_date_end = request.args.get('first_payment_date_end', '', type=str)
-    has_contract_amount = request.args.get('has_contract_amount', '', type=str)
-    contract_date_start = request.args.get('contract_date_start', '', type=str)
-    contract_date_end = request.args.get('contract_date_end', '', type=str)
+    first_payment_date_start = args.get('first_payment_date_start', '', type=str)
+    first_payment_date_end = args.get('first_payment_date_end', '', type=str)
+    has_contract_amount = args.get('has_contract_amount', '', type=str)
+    contract_date_start = args.get('contract_date_start', '', type=str)
+    contract_date_end = args.get('contract_date_end', '', type=str)
 
     query = Lead.query
 
@@ -292,12 +204,7 @@ def list_leads():
 
     # 搜索过滤
     if search:
-        query = query.filter(
-            (Lead.parent_wechat_display_name.contains(search)) |
-            (Lead.parent_wechat_name.contains(search)) |
-            (Lead.contact_info.contains(search)) |
-            (Lead.student_name.contains(search) if Lead.student_name else False)
-        )
+        query = query.filter(lead_search_condition(search))
 
     # 阶段过滤
     if stage_filter:
@@ -319,22 +226,10 @@ def list_leads():
 
             if date_type == 'first_payment':
                 # 首笔支付时间筛选
-                query = query.filter(
-                    and_(
-                        Lead.first_payment_at.isnot(None),
-                        func.date(Lead.first_payment_at) >= start_dt,
-                        func.date(Lead.first_payment_at) <= end_dt
-                    )
-                )
+                query = query.filter(day_range(Lead.first_payment_at, start_dt, end_dt))
             elif date_type == 'second_payment':
                 # 次笔支付时间筛选
-                query = query.filter(
-                    and_(
-                        Lead.second_payment_at.isnot(None),
-                        func.date(Lead.second_payment_at) >= start_dt,
-                        func.date(Lead.second_payment_at) <= end_dt
-                    )
-                )
+                query = query.filter(day_range(Lead.second_payment_at, start_dt, end_dt))
             elif date_type == 'full_payment':
                 # 全款支付时间筛选（使用最后一笔支付时间）
                 # 子查询：获取每个线索的最后一笔支付日期
@@ -390,30 +285,50 @@ def list_leads():
                 start_date = datetime.strptime(contract_date_start, '%Y-%m-%d').date()
                 end_date = datetime.strptime(contract_date_end, '%Y-%m-%d').date()
                 # 这里我们使用首笔付款时间作为合同签订的参考时间
-                query = query.filter(
-                    and_(
-                        Lead.first_payment_at.isnot(None),
-                        func.date(Lead.first_payment_at) >= start_date,
-                        func.date(Lead.first_payment_at) <= end_date
-                    )
-                )
+                query = query.filter(day_range(Lead.first_payment_at, start_date, end_date))
             except ValueError:
                 pass
 
-    # 分页
-    leads = query.order_by(Lead.updated_at.desc()).paginate(
-        page=page, per_page=20, error_out=False
+    return query
+
+@leads_bp.route('/list')
+@login_required
+@sales_required
+def list_leads():
+    """线索列表"""
+    page = request.args.get('page', 1, type=int)
+    search = request.args.get('search', '', type=str)
+    stage_filter = request.args.get('stage', '', type=str)
+    sales_filter = request.args.get('sales', '', type=str)
+    lead_source_filter = request.args.get('lead_source', '', type=str)
+    date_type = request.args.get('date_type', '', type=str)
+    start_date = request.args.get('start_date', '', type=str)
+    end_date = request.args.get('end_date', '', type=str)
+    if date_type and start_date and not end_date:
+        end_date = date.today().strftime('%Y-%m-%d')
+
+    first_payment_date_start = request.args.get('first_payment_date_start', '', type=str)
+    first_payment_date_end = request.args.get('first_payment_date_end', '', type=str)
+    has_contract_amount = request.args.get('has_contract_amount', '', type=str)
+    contract_date_start = request.args.get('contract_date_start', '', type=str)
+    contract_date_end = request.args.get('contract_date_end', '', type=str)
+
+    query = _filtered_leads_query(request.args).options(*LEAD_LIST_PROFILE)
+
+    # 分页（上一页/下一页使用游标分页）
+    leads = paginate_query(
+        query, [(Lead.updated_at, True), (Lead.id, True)],
+        page=page, per_page=20, cursor=request.args.get('cursor')
     )
     
     # 获取所有销售人员用于筛选
-    sales_users = User.query.filter(User.role.in_(['sales_manager', 'salesperson']), User.status == True).all()
+    sales_users = reference_cache.get_sales_users()
 
     # 线索阶段选项
     stages = ['获取联系方式', '线下见面', '首笔支付', '次笔支付', '全款支付']
 
     # 获取所有线索来源（去重）
-    lead_sources = db.session.query(Lead.lead_source).filter(Lead.lead_source.isnot(None)).distinct().order_by(Lead.lead_source).all()
-    lead_sources = [source[0] for source in lead_sources]
+    lead_sources = reference_cache.get_lead_sources()
 
     # 确定筛选类型（用于页面标题显示）
     filter_type = None
@@ -430,10 +345,7 @@ def list_leads():
 
     # 获取班主任列表（用于转客户时选择）
     # 只包含：teacher_supervisor（班主任）角色
-    teachers = User.query.filter(
-        User.role == 'teacher_supervisor',
-        User.status == True
-    ).order_by(User.username).all()
+    teachers = reference_cache.get_teacher_supervisors(order_by_name=True)
 
     return render_template('leads/list.html',
                          leads=leads,
@@ -451,6 +363,20 @@ def list_leads():
                          start_date=start_date,
                          end_date=end_date)
 
+@leads_bp.route('/export')
+@login_required
+@sales_required
+def export_leads():
+    """导出当前筛选条件下的线索列表（流式输出 CSV/NDJSON，参数同列表页）"""
+    fmt = request.args.get('format', 'csv')
+    if fmt not in STREAM_FORMATS:
+        return jsonify({'success': False, 'message': f'不支持的导出格式：{fmt}'}), 400
+
+    keys, column_names, batches = lead_view_export(_filtered_leads_query(request.args), raw=(fmt == 'ndjson'))
+    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+    return streaming_response(batches, fmt, column_names if fmt == 'csv' else keys, f'线索列表_{timestamp}',
+                              compress=request.args.get('gzip') == '1')
+
 @leads_bp.route('/add', methods=['GET', 'POST'])
 @login_required
 @sales_required
@@ -503,15 +429,11 @@ def add_lead():
 
         # 检查手机号是否已存在（如果填写了手机号）
         if phone:
-            # 检查contact_info字段中是否包含该手机号
-            existing_leads = Lead.query.filter(Lead.contact_info.like(f'%{phone}%')).all()
-            for existing_lead in existing_leads:
-                # 提取contact_info中的手机号进行精确匹配
-                contact_parts = existing_lead.contact_info.split()
-                existing_phone = contact_parts[0] if contact_parts else existing_lead.contact_info
-                if existing_phone == phone:
-                    flash('手机号不能重复', 'error')
-                    return render_template('leads/add.html', sales_users=get_available_sales_users_for_assignment(current_user))
+            # 按规范化手机号精确匹配（contact_phone 有索引）
+            existing_lead = Lead.query.filter(Lead.contact_phone == normalize_phone(phone)).first()
+            if existing_lead:
+                flash('手机号不能重复', 'error')
+                return render_template('leads/add.html', sales_users=get_available_sales_users_for_assignment(current_user))
 
         # 如果没有指定销售，分配给当前用户
         if not assigned_sales_id:
@@ -591,6 +513,11 @@ def add_lead():
             auto_update_lead_stage(lead)
 
             db.session.add(lead)
+            db.session.flush()
+
+            # 新增线索计入每日汇总表
+            apply_lead_stats_change({}, lead)
+
             db.session.commit()
 
             # 如果有备注信息，添加为沟通记录
@@ -629,8 +556,9 @@ def check_phone():
     if not phone:
         return jsonify({'exists': False})
 
-    # 查找是否存在相同手机号的线索
-    existing_lead = Lead.query.filter(Lead.contact_info.like(f'{phone}%')).first()
+    # 查找是否存在相同手机号的线索（按规范化手机号精确匹配）
+    normalized_phone = normalize_phone(phone)
+    existing_lead = Lead.query.filter(Lead.contact_phone == normalized_phone).first() if normalized_phone else None
 
     if existing_lead:
         return jsonify({
@@ -671,7 +599,7 @@ def check_wechat():
 
 def get_sales_users():
     """获取所有启用的销售人员（包括销售管理和销售）"""
-    return User.query.filter(User.role.in_(['sales_manager', 'salesperson']), User.status == True).all()
+    return reference_cache.get_sales_users()
 
 def get_available_sales_users_for_assignment(current_user):
     """根据当前用户角色获取可分配的销售人员列表"""
@@ -868,6 +796,8 @@ def edit_lead(lead_id):
         # 移除自动转客户机制，用户可以手动选择转客户时机
 
         try:
+            stats_before = lead_stats_snapshot(lead)
+
             # 记录责任销售变更（只在未锁定时）
             sales_change_note = None
             if not is_field_locked(lead.sales_user_id, current_user) and lead.sales_user_id != sales_user_id:
@@ -967,6 +897,9 @@ def edit_lead(lead_id):
             # 根据当前状态自动更新阶段
             auto_update_lead_stage(lead)
 
+            # 责任销售可能变更，同步每日汇总表
+            apply_lead_stats_change(stats_before, lead)
+
             db.session.commit()
 
             # 处理备注作为沟通记录
@@ -1276,6 +1209,8 @@ def add_payment():
         except (ValueError, TypeError):
             return jsonify({'success': False, 'message': '付款金额格式错误'})
 
+        stats_before = lead_stats_snapshot(lead)
+
         # 创建付款记录
         payment = Payment(
             lead_id=lead_id,
@@ -1289,6 +1224,9 @@ def add_payment():
         # 自动更新线索的支付时间
         update_lead_payment_times(lead)
 
+        # 同一事务内更新每日汇总表
+        apply_lead_stats_change(stats_before, lead)
+
         db.session.commit()
 
         return jsonify({'success': True, 'message': '付款记录添加成功'})
@@ -1315,11 +1253,16 @@ def delete_payment(payment_id):
         if current_user.is_sales() and lead and lead.sales_user_id != current_user.id:
             return jsonify({'success': False, 'message': '您只能为自己负责的线索操作付款'})
 
+        stats_before = lead_stats_snapshot(lead)
+
         db.session.delete(payment)
 
         # 自动更新线索的支付时间
         update_lead_payment_times(lead)
 
+        # 同一事务内更新每日汇总表
+        apply_lead_stats_change(stats_before, lead)
+
         db.session.commit()
 
         return jsonify({'success': True, 'message': '付款记录删除成功'})
@@ -1357,10 +1300,15 @@ def update_contract_amount():
         except (ValueError, TypeError):
             return jsonify({'success': False, 'message': '合同金额格式错误'})
 
+        stats_before = lead_stats_snapshot(lead)
+
         # 更新合同金额
         lead.contract_amount = contract_amount
         lead.updated_at = datetime.utcnow()
 
+        # 同一事务内更新每日汇总表
+        apply_lead_stats_change(stats_before, lead)
+
         db.session.commit()
 
         return jsonify({'success': True, 'message': '合同金额更新成功'})
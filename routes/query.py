@@ -1,5 +1,7 @@
 from flask import Blueprint, render_template, request, jsonify
 from models import Lead, db
+from utils.lead_search import lead_search_condition
+from utils.phone import normalize_phone
 import re
 
 query_bp = Blueprint('query', __name__)
@@ -28,13 +30,13 @@ def api_search_leads():
         if search_type == 'wechat':
             # 查询微信号（家长微信号）
             leads = Lead.query.filter(
-                Lead.parent_wechat_name.like(f'%{search_value}%')
+                lead_search_condition(search_value, columns=('parent_wechat_name',))
             ).all()
             
         elif search_type == 'phone':
             # 查询联系电话
             leads = Lead.query.filter(
-                Lead.contact_info.like(f'%{search_value}%')
+                lead_search_condition(search_value, columns=('contact_info',))
             ).all()
             
         else:
@@ -91,8 +93,9 @@ def api_exact_search():
             lead = Lead.query.filter_by(parent_wechat_name=search_value).first()
             
         elif search_type == 'phone':
-            # 精确查询联系电话
-            lead = Lead.query.filter_by(contact_info=search_value).first()
+            # 精确查询联系电话（按规范化手机号，contact_phone 有索引）
+            normalized_phone = normalize_phone(search_value)
+            lead = Lead.query.filter_by(contact_phone=normalized_phone).first() if normalized_phone else None
             
         else:
             return jsonify({
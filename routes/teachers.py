@@ -3,6 +3,7 @@ from flask_login import login_required, current_user
 from functools import wraps
 from models import Teacher, Customer, Lead, TeacherImage, db
 from datetime import datetime
+from utils.pagination import paginate_query
 import os
 from werkzeug.utils import secure_filename
 
@@ -55,12 +56,12 @@ def list_teachers():
     elif status_filter == 'inactive':
         query = query.filter(Teacher.status == False)
 
-    # 按创建时间倒序排列
-    query = query.order_by(Teacher.created_at.desc())
-    
-    # 分页
+    # 按创建时间倒序排列，分页（上一页/下一页使用游标分页）
     per_page = 20
-    pagination = query.paginate(page=page, per_page=per_page, error_out=False)
+    pagination = paginate_query(
+        query, [(Teacher.created_at, True), (Teacher.id, True)],
+        page=page, per_page=per_page, cursor=request.args.get('cursor')
+    )
     teachers = pagination.items
     
     # 统计每个老师负责的客户数量
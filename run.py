@@ -31,6 +31,26 @@ def create_app(config_name=None):
     # 初始化扩展
     from models import db
     db.init_app(app)
+
+    # 参考数据缓存（相关表变更时自动失效）
+    from utils.reference_cache import init_reference_cache
+    init_reference_cache()
+
+    # 登录用户身份缓存（正常请求不查询 users 表）
+    from utils.user_identity import init_user_identity_cache, load_user_identity
+    init_user_identity_cache()
+
+    # 管理员仪表板概览缓存（用户/线索/客户变更时自动失效）
+    from utils.admin_overview import init_admin_overview_cache
+    init_admin_overview_cache()
+
+    # 请求 SQL 统计（Server-Timing、慢请求日志；测试环境超出 MAX_QUERIES_PER_REQUEST 时请求失败）
+    from utils.sql_stats import init_sql_stats
+    init_sql_stats(app)
+
+    # 运行指标（各端点请求数与耗时、SQL耗时、worker 内存，跨 worker 汇总）
+    from utils.metrics import init_metrics
+    init_metrics(app)
     
     login_manager = LoginManager()
     login_manager.init_app(app)
@@ -39,8 +59,7 @@ def create_app(config_name=None):
     
     @login_manager.user_loader
     def load_user(user_id):
-        from models import User
-        return User.query.get(int(user_id))
+        return load_user_identity(int(user_id))
     
     # 注册蓝图
     from routes.auth import auth_bp
@@ -124,6 +143,19 @@ def create_app(config_name=None):
             'database': db_status
         }), 200
 
+    @app.route('/metrics')
+    def metrics():
+        """运行指标（Prometheus 文本格式）"""
+        from flask import abort, request, Response
+        from utils.metrics import render_metrics
+
+        if not app.config.get('METRICS_ENABLED'):
+            abort(404)
+        token = app.config.get('METRICS_TOKEN')
+        if token and request.headers.get('Authorization') != f'Bearer {token}':
+            abort(401)
+        return Response(render_metrics(), mimetype='text/plain; version=0.0.4; charset=utf-8')
+
     # 主页路由
     @app.route('/')
     def index():
@@ -404,6 +436,48 @@ def init_database(app):
                 else:
                     print(f"⚠️ meeting_location字段添加失败: {e}")
 
+            # 添加contact_phone字段（规范化手机号，用于索引查重）
+            try:
+                db.session.execute(text("ALTER TABLE leads ADD COLUMN contact_phone VARCHAR(20)"))
+                db.session.commit()
+                print("✅ contact_phone字段添加成功")
+            except Exception as e:
+                db.session.rollback()
+                if "duplicate column name" in str(e):
+                    print("✅ contact_phone字段已存在")
+                else:
+                    print(f"⚠️ contact_phone字段添加失败: {e}")
+
+            # 分批回填contact_phone
+            from utils.phone import backfill_contact_phone
+            backfilled = backfill_contact_phone()
+            if backfilled:
+                print(f"✅ contact_phone回填完成，共 {backfilled} 条线索")
+
+            # 添加service_type_mask字段（服务类型掩码，用于索引筛选）
+            try:
+                db.session.execute(text("ALTER TABLE leads ADD COLUMN service_type_mask INTEGER"))
+                db.session.commit()
+                print("✅ service_type_mask字段添加成功")
+            except Exception as e:
+                db.session.rollback()
+                if "duplicate column name" in str(e):
+                    print("✅ service_type_mask字段已存在")
+                else:
+                    print(f"⚠️ service_type_mask字段添加失败: {e}")
+
+            # 分批回填service_type_mask
+            from utils.service_types import backfill_service_type_mask
+            backfilled = backfill_service_type_mask()
+            if backfilled:
+                print(f"✅ service_type_mask回填完成，共 {backfilled} 条线索")
+
+            # 分批回填增量导出表中为空的updated_at（按 (updated_at, id) 索引读取水位之后的行）
+            from utils.incremental_export import backfill_updated_at
+            backfilled = backfill_updated_at()
+            if backfilled:
+                print(f"✅ updated_at回填完成，共 {backfilled} 行")
+
             # 创建consultation_details表
             try:
                 db.session.execute(text("""
@@ -435,6 +509,21 @@ def init_database(app):
             print(f"❌ 数据库迁移失败: {e}")
             db.session.rollback()
 
+        # 补建模型中声明的索引（create_all 不会为已存在的表创建新索引）
+        try:
+            for table in db.metadata.sorted_tables:
+                for index in table.indexes:
+                    index.create(bind=db.engine, checkfirst=True)
+        except Exception as e:
+            print(f"⚠️ 索引创建失败: {e}")
+
+        # 线索全文检索索引（FTS5 不可用时检索自动回退为 LIKE）
+        from utils.lead_search import ensure_lead_fts
+        if ensure_lead_fts():
+            print("✅ 线索全文检索索引已就绪")
+        else:
+            print("⚠️ 当前 SQLite 不支持 FTS5 trigram，线索检索将使用 LIKE")
+
         # 创建测试账号列表
         test_users = [
             {
@@ -545,6 +634,136 @@ def main():
                 debug=(config_name == 'development')
             )
     
+    elif command == 'rebuild-daily-stats':
+        # 重建每日统计汇总表（加 --verify 只比对不写入）
+        verify_only = '--verify' in sys.argv[2:]
+        with app.app_context():
+            from models import db
+            from utils.daily_stats import rebuild_daily_stats
+
+            db.create_all()
+            mismatches = rebuild_daily_stats(verify_only=verify_only)
+
+        for stat_date, sales_user_id, field, have, want in mismatches:
+            print(f"  {stat_date} 销售#{sales_user_id} {field}: 汇总表={have} 实际={want}")
+        if verify_only:
+            print(f"比对完成，共 {len(mismatches)} 处不一致")
+        else:
+            print(f"每日统计汇总表重建完成，修正 {len(mismatches)} 处不一致")
+
+    elif command == 'rebuild-lead-fts':
+        # 重建线索全文检索索引
+        with app.app_context():
+            from utils.lead_search import rebuild_lead_fts
+            count = rebuild_lead_fts()
+        print(f"线索全文检索索引重建完成，共 {count} 条线索")
+
+    elif command == 'export-worker':
+        # 处理后台导出任务（加 --once 处理完排队任务后退出）
+        once = '--once' in sys.argv[2:]
+        with app.app_context():
+            from models import db
+            from utils.export_jobs import run_worker
+
+            db.create_all()
+            print("导出任务处理进程已启动" if not once else "正在处理排队中的导出任务...")
+            try:
+                run_worker(once=once)
+            except KeyboardInterrupt:
+                print("导出任务处理进程已停止")
+
+    elif command == 'export-incremental':
+        # 增量导出：export-incremental <方案名> [--format csv|ndjson] [--tables a,b] [--output 目录] [--reset]
+        args = sys.argv[2:]
+        if not args or args[0].startswith('--'):
+            print("用法: python run.py export-incremental <方案名> [--format csv|ndjson] [--tables a,b] [--output 目录] [--reset]")
+            sys.exit(1)
+
+        def option(name, default=None):
+            if name in args and args.index(name) + 1 < len(args):
+                return args[args.index(name) + 1]
+            return default
+
+        profile = args[0]
+        tables = option('--tables')
+        table_keys = [key.strip() for key in tables.split(',') if key.strip()] if tables else None
+        with app.app_context():
+            from models import db
+            from utils.incremental_export import export_incremental, reset_watermarks
+
+            db.create_all()
+            if '--reset' in args:
+                count = reset_watermarks(profile, table_keys)
+                print(f"已清除导出方案 {profile} 的 {count} 个水位，下次导出为全量")
+            else:
+                try:
+                    results = export_incremental(profile, table_keys, fmt=option('--format', 'csv'),
+                                                 output_dir=option('--output'))
+                except ValueError as e:
+                    print(f"导出失败: {e}")
+                    sys.exit(1)
+                for result in results:
+                    print(f"  {result['table']}: {result['rows']} 行" + (f" -> {result['file']}" if result['file'] else ''))
+                print(f"增量导出完成，共 {sum(result['rows'] for result in results)} 行")
+
+    elif command == 'login-logs-maintain':
+        # 登录日志维护：重新计算汇总并归档过期日志（--days N 覆盖保留天数，--rebuild 连当天汇总一起重建）
+        args = sys.argv[2:]
+        retention_days = None
+        if '--days' in args and args.index('--days') + 1 < len(args):
+            retention_days = int(args[args.index('--days') + 1])
+        with app.app_context():
+            from models import db
+            from utils.login_log_retention import maintain_login_logs
+
+            db.create_all()
+            rolled, archived = maintain_login_logs(retention_days, rebuild='--rebuild' in args)
+            archive_path = app.config['LOGIN_LOG_ARCHIVE_PATH']
+        print(f"登录日志维护完成：重新汇总 {rolled} 天，归档 {archived} 条日志到 {archive_path}")
+
+    elif command == 'db-backup':
+        # 在线备份数据库并按分层保留策略清理旧备份（--prune-only 只清理）
+        args = sys.argv[2:]
+        with app.app_context():
+            from utils.db_backup import BackupError, backup_database, prune_backups
+
+            backup_dir = app.config['BACKUP_DIR']
+            if '--prune-only' not in args:
+                try:
+                    result = backup_database()
+                except BackupError as e:
+                    print(f"备份失败: {e}")
+                    sys.exit(1)
+                if result['skipped']:
+                    print("数据库与上一份备份相同，跳过本次备份")
+                else:
+                    print(f"备份完成: {os.path.join(backup_dir, result['file'])} "
+                          f"（数据库 {result['database_bytes'] / 1024 / 1024:.1f}MB，"
+                          f"压缩后 {result['backup_bytes'] / 1024 / 1024:.1f}MB）")
+            removed = prune_backups()
+        for name in removed:
+            print(f"  删除旧备份: {name}")
+        print(f"清理完成，删除 {len(removed)} 个旧备份")
+
+    elif command == 'db-restore':
+        # 从备份恢复数据库：db-restore <备份文件> [目标路径]（默认当前数据库，需先停止服务）
+        args = sys.argv[2:]
+        if not args:
+            print("用法: python run.py db-restore <备份文件> [目标路径]")
+            sys.exit(1)
+        with app.app_context():
+            from models import db
+            from utils.db_backup import BackupError, restore_backup
+
+            target_path = args[1] if len(args) > 1 else db.engine.url.database
+            db.engine.dispose()
+            try:
+                size = restore_backup(args[0], target_path)
+            except BackupError as e:
+                print(f"恢复失败: {e}")
+                sys.exit(1)
+        print(f"已恢复到 {target_path}（{size / 1024 / 1024:.1f}MB）")
+
     elif command == 'test':
         # 运行测试
         print("运行测试...")
@@ -557,6 +776,13 @@ def main():
         print("  run      - 运行应用 (默认)")
         print("  init-db  - 初始化数据库")
         print("  test     - 运行测试")
+        print("  rebuild-daily-stats [--verify] - 重建/比对每日统计汇总表")
+        print("  rebuild-lead-fts - 重建线索全文检索索引")
+        print("  export-worker [--once] - 处理后台数据导出任务")
+        print("  export-incremental <方案名> [--format csv|ndjson] [--tables a,b] [--output 目录] [--reset] - 增量导出变更数据")
+        print("  login-logs-maintain [--days N] [--rebuild] - 汇总登录日志并归档过期记录")
+        print("  db-backup [--prune-only] - 在线备份数据库（压缩、校验）并按天/周/月分层清理旧备份")
+        print("  db-restore <备份文件> [目标路径] - 从备份恢复数据库（需先停止服务）")
         print("")
         print("环境变量:")
         print("  FLASK_ENV - 设置环境 (development/production/testing)")
@@ -0,0 +1,117 @@
+"""
+列表页查询数测试
+每个使用关联加载配置（utils/loader_profiles.py）的列表页在 5 行和 20 行数据下执行的 SQL 语句数应当相同，
+并且不超过测试环境的 MAX_QUERIES_PER_REQUEST（超出时 QueryLimitExceeded 使请求失败）。
+
+运行：python run.py test
+"""
+import unittest
+from datetime import datetime
+
+from sqlalchemy import event
+
+from run import create_app
+from models import (db, User, Lead, Customer, Teacher, TutoringDelivery, CompetitionDelivery,
+                    CompetitionName)
+
+# (角色, 地址)
+PROFILED_VIEWS = [
+    ('sales_manager', '/leads/list'),
+    ('admin', '/admin/leads'),
+    ('teacher_supervisor', '/delivery/leads'),
+    ('sales_manager', '/customers/list'),
+    ('teacher_supervisor', '/delivery/tutoring'),
+    ('teacher_supervisor', '/delivery/competition'),
+    ('sales_manager', '/consultations/list'),
+]
+
+
+class ListQueryCountTest(unittest.TestCase):
+
+    def setUp(self):
+        # 只在准备数据时进入应用上下文：请求共用外层上下文时 g 中缓存的登录用户会在请求之间残留
+        self.app = create_app('testing')
+        with self.app.app_context():
+            self.engine = db.engine
+            self._create_users()
+        self.lead_count = 0
+
+        self.statements = []
+        event.listen(self.engine, 'before_cursor_execute', self._record)
+
+    def tearDown(self):
+        event.remove(self.engine, 'before_cursor_execute', self._record)
+        with self.app.app_context():
+            db.session.remove()
+            db.drop_all()
+
+    def _create_users(self):
+        db.create_all()
+
+        users = {}
+        for i, role in enumerate(['sales_manager', 'admin', 'teacher_supervisor']):
+            user = User(username=f'{role}{i}', phone=f'1380000000{i}', role=role, status=True)
+            db.session.add(user)
+            users[role] = user
+        db.session.flush()
+        teacher = Teacher(chinese_name='老师', created_by_user_id=users['teacher_supervisor'].id)
+        competition_name = CompetitionName(name='测试竞赛')
+        db.session.add_all([teacher, competition_name])
+        db.session.commit()
+        self.user_ids = {role: user.id for role, user in users.items()}
+        self.teacher_id = teacher.id
+        self.competition_name_id = competition_name.id
+
+    def _record(self, conn, cursor, statement, parameters, context, executemany):
+        self.statements.append(statement)
+
+    def add_leads(self, count):
+        """添加已转客户（含课题、竞赛交付）的首笔支付线索"""
+        with self.app.app_context():
+            self._add_leads(count)
+
+    def _add_leads(self, count):
+        for _ in range(count):
+            self.lead_count += 1
+            i = self.lead_count
+            lead = Lead(parent_wechat_display_name=f'家长{i}', parent_wechat_name=f'wx{i}',
+                        contact_info=f'1390000{i:04d}', student_name=f'学员{i}',
+                        sales_user_id=self.user_ids['sales_manager'], stage='首笔支付',
+                        service_types='["tutoring", "competition"]', meeting_at=datetime(2024, 2, 1))
+            db.session.add(lead)
+            db.session.flush()
+            customer = Customer(lead_id=lead.id, payment_amount=1000,
+                                teacher_user_id=self.user_ids['teacher_supervisor'], teacher_id=self.teacher_id)
+            db.session.add(customer)
+            db.session.flush()
+            db.session.add(TutoringDelivery(customer_id=customer.id))
+            db.session.add(CompetitionDelivery(customer_id=customer.id,
+                                               competition_name_id=self.competition_name_id))
+        db.session.commit()
+
+    def query_count(self, role, url):
+        """登录后请求两次（第一次预热引用数据缓存），返回第二次执行的语句数"""
+        client = self.app.test_client()
+        with client.session_transaction() as session:
+            session['_user_id'] = str(self.user_ids[role])
+            session['_fresh'] = True
+        self.assertEqual(client.get(url).status_code, 200, url)
+        self.statements.clear()
+        response = client.get(url)
+        self.assertEqual(response.status_code, 200, url)
+        return len(self.statements)
+
+    def test_query_count_does_not_grow_with_rows(self):
+        self.add_leads(5)
+        small = {url: self.query_count(role, url) for role, url in PROFILED_VIEWS}
+        self.add_leads(15)
+        limit = self.app.config['MAX_QUERIES_PER_REQUEST']
+        for role, url in PROFILED_VIEWS:
+            with self.subTest(url=url):
+                count = self.query_count(role, url)
+                self.assertLessEqual(count, limit)
+                self.assertEqual(count, small[url])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,147 @@
+"""
+管理员仪表板概览
+用户总数/启用数、各角色启用人数通过 users 表上的条件聚合得到，线索总数、客户总数、
+今日登录次数作为标量子查询放在同一条 SELECT 中，一次数据库往返得到全部统计。
+
+结果在每个进程内缓存 OVERVIEW_TTL 秒：
+- 本进程通过 ORM 新增/删除用户、线索、客户，或修改用户的角色/状态时，提交后立即清除缓存；
+- 其他 gunicorn 进程的修改及登录日志（后台线程直接写库）最迟 OVERVIEW_TTL 秒后反映到概览中。
+
+用法：
+    overview = get_admin_overview()
+    overview.total_users, overview.today_logins
+"""
+import threading
+import time
+from dataclasses import dataclass
+from datetime import date
+
+from sqlalchemy import case, event, func, inspect, select
+
+from models import db, User, Lead, Customer, LoginDailyStat
+
+# 概览缓存时长（秒）
+OVERVIEW_TTL = 30
+
+# 影响概览的用户字段
+USER_FIELDS = ('role', 'status')
+
+_entry = {'expires_at': 0, 'overview': None}
+_lock = threading.Lock()
+_events_registered = False
+
+
+@dataclass(frozen=True)
+class AdminOverview:
+    """管理员仪表板统计结果"""
+    total_users: int = 0
+    active_users: int = 0
+    sales_manager_count: int = 0
+    salesperson_count: int = 0
+    teacher_count: int = 0
+    admin_count: int = 0
+    total_leads: int = 0
+    total_customers: int = 0
+    today_logins: int = 0
+
+    @property
+    def inactive_users(self):
+        return self.total_users - self.active_users
+
+
+def compute_admin_overview(stat_date=None):
+    """
+    计算管理员仪表板统计（一次查询）
+
+    Args:
+        stat_date (date): 登录统计日期，默认今天
+
+    Returns:
+        AdminOverview: 统计结果
+    """
+    stat_date = stat_date or date.today()
+
+    def active_role_count(role):
+        return func.coalesce(func.sum(case(((User.status == True) & (User.role == role), 1), else_=0)), 0)
+
+    lead_count = select(func.count(Lead.id)).scalar_subquery()
+    customer_count = select(func.count(Customer.id)).scalar_subquery()
+    login_count = select(
+        func.coalesce(func.sum(LoginDailyStat.success_count + LoginDailyStat.failed_count), 0)
+    ).where(LoginDailyStat.stat_date == stat_date).scalar_subquery()
+
+    row = db.session.execute(select(
+        func.count(User.id).label('total_users'),
+        func.coalesce(func.sum(case((User.status == True, 1), else_=0)), 0).label('active_users'),
+        active_role_count('sales_manager').label('sales_manager_count'),
+        active_role_count('salesperson').label('salesperson_count'),
+        active_role_count('teacher').label('teacher_count'),
+        active_role_count('admin').label('admin_count'),
+        lead_count.label('total_leads'),
+        customer_count.label('total_customers'),
+        login_count.label('today_logins')
+    )).one()
+    return AdminOverview(**row._asdict())
+
+
+def get_admin_overview():
+    """
+    获取管理员仪表板统计（优先使用进程内缓存）
+
+    Returns:
+        AdminOverview: 统计结果
+    """
+    now = time.monotonic()
+    with _lock:
+        if _entry['overview'] is not None and _entry['expires_at'] > now:
+            return _entry['overview']
+
+    overview = compute_admin_overview()
+    with _lock:
+        _entry['overview'] = overview
+        _entry['expires_at'] = now + OVERVIEW_TTL
+    return overview
+
+
+def invalidate():
+    """清除本进程缓存"""
+    with _lock:
+        _entry['overview'] = None
+        _entry['expires_at'] = 0
+
+
+def _overview_changed(session):
+    for obj in list(session.new) + list(session.deleted):
+        if isinstance(obj, (User, Lead, Customer)):
+            return True
+    for obj in session.dirty:
+        if isinstance(obj, User):
+            attrs = inspect(obj).attrs
+            if any(attrs[field].history.has_changes() for field in USER_FIELDS):
+                return True
+    return False
+
+
+def _after_flush(session, flush_context):
+    if _overview_changed(session):
+        session.info['admin_overview_changed'] = True
+
+
+def _after_commit(session):
+    if session.info.pop('admin_overview_changed', False):
+        invalidate()
+
+
+def _after_rollback(session):
+    session.info.pop('admin_overview_changed', None)
+
+
+def init_admin_overview_cache():
+    """注册会话事件（在应用工厂中调用一次）"""
+    global _events_registered
+    if _events_registered:
+        return
+    event.listen(db.session, 'after_flush', _after_flush)
+    event.listen(db.session, 'after_commit', _after_commit)
+    event.listen(db.session, 'after_rollback', _after_rollback)
+    _events_registered = True
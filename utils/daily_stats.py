@@ -0,0 +1,226 @@
+"""
+线索每日统计汇总（lead_daily_stats）维护工具
+
+汇总表按 日期 × 责任销售 记录新增线索、阶段变更、付款笔数、付款金额和合同金额，
+在修改线索/付款的同一个事务中增量更新，报表只需累加少量汇总行。
+
+用法：
+    before = lead_stats_snapshot(lead)
+    ...  # 修改线索或付款
+    apply_lead_stats_change(before, lead)
+    db.session.commit()
+"""
+from collections import defaultdict
+from datetime import datetime
+from decimal import Decimal
+
+from sqlalchemy import func
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+from models import db, Lead, Payment, LeadDailyStat
+
+# 可由 leads/payments 表重新计算的统计字段
+DERIVED_FIELDS = ('new_leads', 'payment_count', 'payment_sum', 'contract_amount')
+
+
+def _empty_row():
+    return {'new_leads': 0, 'payment_count': 0,
+            'payment_sum': Decimal('0'), 'contract_amount': Decimal('0')}
+
+
+def _as_date(value):
+    return value.date() if isinstance(value, datetime) else value
+
+
+def lead_stats_snapshot(lead):
+    """
+    计算单条线索（含其付款记录）对汇总表的贡献
+
+    Args:
+        lead (Lead): 线索对象，为None时表示线索不存在（如已删除）
+
+    Returns:
+        dict: {(stat_date, sales_user_id): {字段: 值}}
+    """
+    snapshot = defaultdict(_empty_row)
+    if lead is None or lead.id is None:
+        return snapshot
+
+    sales_user_id = lead.sales_user_id
+
+    if lead.created_at:
+        snapshot[(_as_date(lead.created_at), sales_user_id)]['new_leads'] += 1
+
+    if lead.first_payment_at and lead.contract_amount:
+        key = (_as_date(lead.first_payment_at), sales_user_id)
+        snapshot[key]['contract_amount'] += Decimal(lead.contract_amount)
+
+    payments = db.session.query(Payment.payment_date, Payment.amount).filter(
+        Payment.lead_id == lead.id
+    ).all()
+    for payment_date, amount in payments:
+        row = snapshot[(payment_date, sales_user_id)]
+        row['payment_count'] += 1
+        row['payment_sum'] += Decimal(amount or 0)
+
+    return snapshot
+
+
+def _upsert(stat_date, sales_user_id, **deltas):
+    """在当前事务中累加一行汇总数据（不存在则插入）"""
+    values = {
+        'stat_date': stat_date,
+        'sales_user_id': sales_user_id,
+        'new_leads': deltas.get('new_leads', 0),
+        'stage_transitions': deltas.get('stage_transitions', 0),
+        'payment_count': deltas.get('payment_count', 0),
+        'payment_sum': deltas.get('payment_sum', Decimal('0')),
+        'contract_amount': deltas.get('contract_amount', Decimal('0')),
+        'updated_at': datetime.utcnow()
+    }
+    stmt = sqlite_insert(LeadDailyStat.__table__).values(**values)
+    excluded = stmt.excluded
+    table = LeadDailyStat.__table__.c
+    stmt = stmt.on_conflict_do_update(
+        index_elements=['stat_date', 'sales_user_id'],
+        set_={
+            'new_leads': table.new_leads + excluded.new_leads,
+            'stage_transitions': table.stage_transitions + excluded.stage_transitions,
+            'payment_count': table.payment_count + excluded.payment_count,
+            'payment_sum': table.payment_sum + excluded.payment_sum,
+            'contract_amount': table.contract_amount + excluded.contract_amount,
+            'updated_at': excluded.updated_at
+        }
+    )
+    db.session.execute(stmt)
+
+
+def apply_lead_stats_change(before, lead):
+    """
+    将线索修改前后的贡献差值写入汇总表（不提交事务）
+
+    Args:
+        before (dict): 修改前 lead_stats_snapshot() 的结果
+        lead (Lead): 修改后的线索对象，删除线索时传None
+    """
+    after = lead_stats_snapshot(lead)
+
+    for key in set(before) | set(after):
+        old_row = before.get(key) or _empty_row()
+        new_row = after.get(key) or _empty_row()
+        deltas = {field: new_row[field] - old_row[field] for field in DERIVED_FIELDS}
+        if any(deltas.values()):
+            _upsert(key[0], key[1], **deltas)
+
+
+def record_stage_transition(lead, old_stage):
+    """记录一次线索阶段变更（不提交事务）"""
+    if lead.id is None or old_stage == lead.stage:
+        return
+    _upsert(datetime.utcnow().date(), lead.sales_user_id, stage_transitions=1)
+
+
+def summarize_daily_stats(start_date, end_date, sales_user_id=None):
+    """
+    汇总指定日期范围内的统计数据
+
+    Args:
+        start_date (date): 开始日期
+        end_date (date): 结束日期（包含当天）
+        sales_user_id (int): 责任销售ID，为None时汇总全部销售
+
+    Returns:
+        dict: 各统计字段的合计值
+    """
+    query = db.session.query(
+        func.coalesce(func.sum(LeadDailyStat.new_leads), 0),
+        func.coalesce(func.sum(LeadDailyStat.stage_transitions), 0),
+        func.coalesce(func.sum(LeadDailyStat.payment_count), 0),
+        func.coalesce(func.sum(LeadDailyStat.payment_sum), 0),
+        func.coalesce(func.sum(LeadDailyStat.contract_amount), 0)
+    ).filter(
+        LeadDailyStat.stat_date >= start_date,
+        LeadDailyStat.stat_date <= end_date
+    )
+    if sales_user_id is not None:
+        query = query.filter(LeadDailyStat.sales_user_id == sales_user_id)
+
+    new_leads, stage_transitions, payment_count, payment_sum, contract_amount = query.one()
+    return {
+        'new_leads': new_leads,
+        'stage_transitions': stage_transitions,
+        'payment_count': payment_count,
+        'payment_sum': Decimal(str(payment_sum)),
+        'contract_amount': Decimal(str(contract_amount))
+    }
+
+
+def _compute_from_live_tables():
+    """直接从 leads/payments 表计算全部汇总数据"""
+    rows = defaultdict(_empty_row)
+
+    lead_day = func.date(Lead.created_at)
+    for stat_date, sales_user_id, count in db.session.query(
+        lead_day, Lead.sales_user_id, func.count(Lead.id)
+    ).filter(Lead.created_at.isnot(None)).group_by(lead_day, Lead.sales_user_id):
+        rows[(datetime.strptime(stat_date, '%Y-%m-%d').date(), sales_user_id)]['new_leads'] = count
+
+    contract_day = func.date(Lead.first_payment_at)
+    for stat_date, sales_user_id, amount in db.session.query(
+        contract_day, Lead.sales_user_id, func.sum(Lead.contract_amount)
+    ).filter(
+        Lead.first_payment_at.isnot(None),
+        Lead.contract_amount.isnot(None)
+    ).group_by(contract_day, Lead.sales_user_id):
+        key = (datetime.strptime(stat_date, '%Y-%m-%d').date(), sales_user_id)
+        rows[key]['contract_amount'] = Decimal(str(amount or 0))
+
+    for stat_date, sales_user_id, count, amount in db.session.query(
+        Payment.payment_date, Lead.sales_user_id, func.count(Payment.id), func.sum(Payment.amount)
+    ).join(Lead, Payment.lead_id == Lead.id).group_by(Payment.payment_date, Lead.sales_user_id):
+        rows[(stat_date, sales_user_id)]['payment_count'] = count
+        rows[(stat_date, sales_user_id)]['payment_sum'] = Decimal(str(amount or 0))
+
+    return rows
+
+
+def rebuild_daily_stats(verify_only=False):
+    """
+    从 leads/payments 表重新计算汇总数据并与现有汇总表比对
+
+    阶段变更次数无法从现有数据还原（系统不保存阶段历史），重建时保留原值。
+
+    Args:
+        verify_only (bool): True时只比对不写入
+
+    Returns:
+        list: 不一致的记录 [(stat_date, sales_user_id, 字段, 汇总表值, 实际值)]
+    """
+    expected = _compute_from_live_tables()
+    existing = {(row.stat_date, row.sales_user_id): row for row in LeadDailyStat.query.all()}
+
+    mismatches = []
+    for key in sorted(set(expected) | set(existing), key=lambda k: (k[0], k[1])):
+        row = existing.get(key)
+        want = expected.get(key) or _empty_row()
+        for field in DERIVED_FIELDS:
+            have = getattr(row, field) if row else 0
+            if Decimal(str(have or 0)) != Decimal(str(want[field])):
+                mismatches.append((key[0], key[1], field, have, want[field]))
+
+        if verify_only:
+            continue
+
+        if row is None:
+            db.session.add(LeadDailyStat(stat_date=key[0], sales_user_id=key[1],
+                                         stage_transitions=0, **want))
+        elif not any(want.values()) and not row.stage_transitions:
+            db.session.delete(row)
+        else:
+            for field in DERIVED_FIELDS:
+                setattr(row, field, want[field])
+
+    if not verify_only:
+        db.session.commit()
+
+    return mismatches
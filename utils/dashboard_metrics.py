@@ -0,0 +1,134 @@
+"""
+仪表板统计工具
+- 销售仪表板：一次查询计算合同额、首笔客户数、付款客户数、付款金额；
+- 班主任交付仪表板：一次查询计算负责客户数、课题/竞赛辅导客户数及已完成数。
+"""
+from dataclasses import dataclass
+from decimal import Decimal
+
+from sqlalchemy import and_, case, exists, func
+
+from models import db, Lead, Customer, Payment, TutoringDelivery, CompetitionDelivery
+from utils.date_filters import day_range
+
+
+@dataclass
+class DashboardMetrics:
+    """仪表板统计结果"""
+    total_contract_amount: float = 0.0
+    first_payment_customers: int = 0
+    paid_customers: int = 0
+    total_payment_amount: Decimal = Decimal('0')
+
+
+@dataclass
+class DeliveryMetrics:
+    """交付仪表板统计结果"""
+    my_customers: int = 0
+    tutoring_total: int = 0
+    tutoring_completed: int = 0
+    competition_total: int = 0
+    competition_completed: int = 0
+
+
+def compute_dashboard_metrics(sales_user_id=None, start_date=None, end_date=None):
+    """
+    计算销售仪表板指标
+
+    以 leads LEFT JOIN（按线索聚合后的 payments）为基础，
+    通过条件聚合在一次数据库往返中得到全部指标。
+
+    Args:
+        sales_user_id (int): 责任销售ID，为None时统计全部线索
+        start_date (date): 统计开始日期，为None时为累计统计模式
+        end_date (date): 统计结束日期（包含当天）
+
+    Returns:
+        DashboardMetrics: 统计结果
+    """
+    period_mode = start_date is not None and end_date is not None
+
+    # 付款按线索预聚合，避免 JOIN 后线索行被付款笔数放大
+    payment_query = db.session.query(
+        Payment.lead_id.label('lead_id'),
+        func.count(Payment.id).label('payment_count'),
+        func.sum(Payment.amount).label('payment_sum')
+    )
+    if period_mode:
+        payment_query = payment_query.filter(
+            Payment.payment_date >= start_date,
+            Payment.payment_date <= end_date
+        )
+    payment_stats = payment_query.group_by(Payment.lead_id).subquery()
+
+    if period_mode:
+        # 时间段统计：合同额基于首笔支付时间（半开区间，可利用索引）
+        contract_condition = day_range(Lead.first_payment_at, start_date, end_date)
+        first_payment_condition = and_(
+            Lead.stage == Lead.STAGE_FIRST_PAYMENT,
+            day_range(Lead.created_at, start_date, end_date)
+        )
+    else:
+        # 累计统计：所有有合同金额的线索 / 处于首笔支付阶段的线索
+        contract_condition = Lead.contract_amount.isnot(None)
+        first_payment_condition = Lead.stage == Lead.STAGE_FIRST_PAYMENT
+
+    query = db.session.query(
+        func.sum(case((contract_condition, Lead.contract_amount))),
+        func.count(case((first_payment_condition, 1))),
+        func.count(payment_stats.c.lead_id),
+        func.sum(payment_stats.c.payment_sum)
+    ).select_from(Lead).outerjoin(
+        payment_stats, payment_stats.c.lead_id == Lead.id
+    )
+
+    if sales_user_id is not None:
+        query = query.filter(Lead.sales_user_id == sales_user_id)
+
+    contract_sum, first_payment_count, paid_count, payment_sum = query.one()
+
+    return DashboardMetrics(
+        total_contract_amount=float(contract_sum or 0),
+        first_payment_customers=first_payment_count or 0,
+        paid_customers=paid_count or 0,
+        total_payment_amount=payment_sum or Decimal('0')
+    )
+
+
+def compute_delivery_metrics(teacher_user_id):
+    """
+    计算班主任交付仪表板指标
+
+    以班主任负责的客户为基础，服务类型按线索的服务类型掩码判断，
+    完成状态用 EXISTS 子查询判断，通过条件聚合在一次数据库往返中得到全部指标。
+
+    Args:
+        teacher_user_id (int): 责任班主任ID
+
+    Returns:
+        DeliveryMetrics: 统计结果
+    """
+    has_tutoring = Lead.service_type_filter('tutoring')
+    has_competition = Lead.service_type_filter('competition')
+    tutoring_done = exists().where(
+        TutoringDelivery.customer_id == Customer.id,
+        TutoringDelivery.thesis_status == '已完成'
+    )
+    competition_done = exists().where(
+        CompetitionDelivery.customer_id == Customer.id,
+        CompetitionDelivery.delivery_status == '服务完结'
+    )
+
+    row = db.session.query(
+        func.count(Customer.id),
+        func.count(case((has_tutoring, 1))),
+        func.count(case((and_(has_tutoring, tutoring_done), 1))),
+        func.count(case((has_competition, 1))),
+        func.count(case((and_(has_competition, competition_done), 1)))
+    ).select_from(Customer).outerjoin(
+        Lead, Customer.lead_id == Lead.id
+    ).filter(
+        Customer.teacher_user_id == teacher_user_id
+    ).one()
+
+    return DeliveryMetrics(*row)
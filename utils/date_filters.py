@@ -0,0 +1,91 @@
+"""
+日期范围查询条件工具
+将“按天”筛选改写为半开区间 [开始日期, 结束日期+1天)，避免 func.date(column) 导致索引失效
+"""
+from datetime import date, datetime, time, timedelta
+
+from sqlalchemy import and_
+
+
+def day_bounds(start_date, end_date):
+    """
+    计算按天筛选的半开区间边界
+
+    Args:
+        start_date (date): 开始日期（包含）
+        end_date (date): 结束日期（包含）
+
+    Returns:
+        tuple: (开始时间, 结束日期次日零点)
+    """
+    if isinstance(start_date, datetime):
+        start_date = start_date.date()
+    if isinstance(end_date, datetime):
+        end_date = end_date.date()
+    return (datetime.combine(start_date, time.min),
+            datetime.combine(end_date + timedelta(days=1), time.min))
+
+
+def day_range(column, start_date, end_date=None):
+    """
+    生成 column 落在 [start_date, end_date] 这几天内的查询条件
+
+    等价于 func.date(column) BETWEEN start_date AND end_date，但可以使用索引。
+    Date 类型字段与 DateTime 类型字段均适用。
+
+    Args:
+        column: 日期或日期时间字段
+        start_date (date): 开始日期（包含）
+        end_date (date): 结束日期（包含），默认与开始日期相同
+
+    Returns:
+        查询条件表达式
+    """
+    lower, upper = day_bounds(start_date, end_date or start_date)
+    if _is_date_column(column):
+        lower, upper = lower.date(), upper.date()
+    return and_(column >= lower, column < upper)
+
+
+def _is_date_column(column):
+    """判断字段是否为纯日期类型"""
+    try:
+        return column.type.python_type is date
+    except (AttributeError, NotImplementedError):
+        return False
+
+
+def parse_month(value):
+    """
+    解析 YYYY-MM 格式的月份
+
+    Returns:
+        date: 该月1日，格式不正确时返回 None
+    """
+    try:
+        return datetime.strptime(value, '%Y-%m').date()
+    except (TypeError, ValueError):
+        return None
+
+
+def month_range(column, start_month=None, end_month=None):
+    """
+    生成 column 落在 [start_month, end_month] 这几个月内的查询条件
+
+    等价于 strftime('%Y-%m', column) BETWEEN start_month AND end_month，但可以使用索引。
+
+    Args:
+        column: 日期字段
+        start_month (date): 开始月份（任意一天均按该月1日处理），为None时不限
+        end_month (date): 结束月份（包含整月），为None时不限
+
+    Returns:
+        查询条件表达式，两端都不限时返回 None
+    """
+    conditions = []
+    if start_month:
+        conditions.append(column >= start_month.replace(day=1))
+    if end_month:
+        next_month = (end_month.replace(day=1) + timedelta(days=32)).replace(day=1)
+        conditions.append(column < next_month)
+    return and_(*conditions) if conditions else None
@@ -0,0 +1,343 @@
+"""
+数据库在线备份
+
+- 快照：通过 SQLite 备份接口（sqlite3.Connection.backup）按页分步复制，每步之间让出数据库，
+  服务运行中也能得到一致的快照（WAL 模式下直接复制数据库文件可能缺少尚未检查点的提交）；
+- 校验：对快照执行 PRAGMA integrity_check，失败时不保留；
+- 去重：快照内容与上一份备份相同（数据库没有变化）时不再写入新文件；
+- 压缩：zstd（已安装 zstandard 时）或 gzip，流式写入，最后原子重命名；
+- 保留：按天/周/月分层保留（每个时间段保留最新的一份），代替固定保留 30 天。
+
+备份文件命名为 edu_crm_YYYYMMDD_HHMMSS.db.zst / .db.gz，旧脚本生成的 .db 文件同样参与分层清理。
+每份备份的校验和记录在备份目录的 manifest.json 中。
+
+用法：
+    python run.py db-backup                      # 备份并按保留策略清理
+    python run.py db-backup --prune-only         # 只清理
+    python run.py db-restore <备份文件> <目标路径>  # 解压并校验（需先停止服务）
+"""
+import gzip
+import hashlib
+import json
+import os
+import re
+import shutil
+import sqlite3
+import tempfile
+import time
+from datetime import datetime
+
+from flask import current_app
+
+from models import db
+
+try:
+    import zstandard
+except ImportError:  # 可选依赖，未安装时使用 gzip
+    zstandard = None
+
+BACKUP_PREFIX = 'edu_crm_'
+BACKUP_PATTERN = re.compile(r'^edu_crm_(\d{8}_\d{6})\.db(\.gz|\.zst)?$')
+MANIFEST_NAME = 'manifest.json'
+# 流式压缩/解压的块大小
+CHUNK_SIZE = 1024 * 1024
+ZSTD_LEVEL = 10
+GZIP_LEVEL = 6
+
+
+class BackupError(Exception):
+    """备份或恢复失败"""
+
+
+def _database_path():
+    path = db.engine.url.database
+    if db.engine.dialect.name != 'sqlite' or not path or path == ':memory:':
+        raise BackupError('只支持备份 SQLite 文件数据库')
+    return path
+
+
+def _compression(name=None):
+    name = (name or current_app.config.get('BACKUP_COMPRESSION') or 'auto').lower()
+    if name == 'auto':
+        return 'zstd' if zstandard is not None else 'gzip'
+    if name == 'zstd' and zstandard is None:
+        raise BackupError('BACKUP_COMPRESSION=zstd 需要安装 zstandard')
+    if name not in ('zstd', 'gzip'):
+        raise BackupError(f'不支持的压缩方式: {name}')
+    return name
+
+
+def _suffix(compression):
+    return '.db.zst' if compression == 'zstd' else '.db.gz'
+
+
+def _load_manifest(backup_dir):
+    try:
+        with open(os.path.join(backup_dir, MANIFEST_NAME), encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _save_manifest(backup_dir, manifest):
+    path = os.path.join(backup_dir, MANIFEST_NAME)
+    tmp_path = f'{path}.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2, sort_keys=True)
+    os.replace(tmp_path, path)
+
+
+def snapshot_database(source_path, target_path, pages=None, step_sleep=None):
+    """
+    通过 SQLite 备份接口生成一致的数据库快照
+
+    Args:
+        source_path (str): 数据库文件路径
+        target_path (str): 快照文件路径（已存在时覆盖）
+        pages (int): 每步复制的页数，默认 BACKUP_PAGES_PER_STEP
+        step_sleep (float): 每步之后的等待秒数，默认 BACKUP_STEP_SLEEP
+
+    Returns:
+        int: 快照的页数
+    """
+    pages = pages or current_app.config.get('BACKUP_PAGES_PER_STEP', 1024)
+    step_sleep = current_app.config.get('BACKUP_STEP_SLEEP', 0.01) if step_sleep is None else step_sleep
+
+    def progress(status, remaining, total):
+        # 每步之间等待片刻，降低备份对磁盘 I/O 的占用
+        if remaining and step_sleep:
+            time.sleep(step_sleep)
+
+    source = sqlite3.connect(source_path, timeout=30, isolation_level=None)
+    target = sqlite3.connect(target_path)
+    try:
+        # 其他连接在两步之间提交时备份会从头开始，写入频繁时可能一直无法完成。
+        # WAL 模式下在整个备份期间持有一个读事务：各步读取同一个快照，且不阻塞写入
+        wal = source.execute('PRAGMA journal_mode').fetchone()[0].lower() == 'wal'
+        if wal:
+            source.execute('BEGIN')
+            source.execute('SELECT count(*) FROM sqlite_master').fetchone()
+        source.backup(target, pages=pages, progress=progress)
+        if wal:
+            source.execute('COMMIT')
+        # 快照继承源库的 WAL 标记，改回回滚日志模式，备份文件单独即可使用
+        target.execute('PRAGMA journal_mode=DELETE')
+        return target.execute('PRAGMA page_count').fetchone()[0]
+    finally:
+        target.close()
+        source.close()
+
+
+def check_integrity(path):
+    """
+    对数据库文件执行 PRAGMA integrity_check
+
+    Raises:
+        BackupError: 校验未通过
+    """
+    conn = sqlite3.connect(f'file:{path}?mode=ro', uri=True)
+    try:
+        rows = [row[0] for row in conn.execute('PRAGMA integrity_check').fetchall()]
+    finally:
+        conn.close()
+    if rows != ['ok']:
+        raise BackupError('完整性校验失败: ' + '; '.join(rows[:10]))
+
+
+def _file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _compress(source_path, target_path, compression):
+    with open(source_path, 'rb') as src, open(target_path, 'wb') as dst:
+        if compression == 'zstd':
+            compressor = zstandard.ZstdCompressor(level=ZSTD_LEVEL, threads=-1)
+            with compressor.stream_writer(dst, closefd=False) as writer:
+                shutil.copyfileobj(src, writer, CHUNK_SIZE)
+        else:
+            with gzip.GzipFile(filename='', mode='wb', fileobj=dst, compresslevel=GZIP_LEVEL, mtime=0) as writer:
+                shutil.copyfileobj(src, writer, CHUNK_SIZE)
+        dst.flush()
+        os.fsync(dst.fileno())
+
+
+def _open_backup(path):
+    """按扩展名打开备份文件（返回解压后的读取流）"""
+    if path.endswith('.zst'):
+        if zstandard is None:
+            raise BackupError('解压 .zst 备份需要安装 zstandard')
+        return zstandard.ZstdDecompressor().stream_reader(open(path, 'rb'), closefd=True)
+    if path.endswith('.gz'):
+        return gzip.open(path, 'rb')
+    return open(path, 'rb')
+
+
+def list_backups(backup_dir=None):
+    """
+    列出备份目录中的备份文件
+
+    Returns:
+        list: [(备份时间, 文件名)]，按时间从新到旧
+    """
+    backup_dir = backup_dir or current_app.config['BACKUP_DIR']
+    if not os.path.isdir(backup_dir):
+        return []
+    backups = []
+    for name in os.listdir(backup_dir):
+        match = BACKUP_PATTERN.match(name)
+        if match:
+            backups.append((datetime.strptime(match.group(1), '%Y%m%d_%H%M%S'), name))
+    backups.sort(reverse=True)
+    return backups
+
+
+def select_backups_to_keep(backups, daily, weekly, monthly):
+    """
+    分层保留：最近 daily 天、weekly 周、monthly 个月中，每个时间段保留最新的一份；最新的备份始终保留
+
+    Args:
+        backups (list): [(备份时间, 文件名)]，按时间从新到旧
+        daily (int): 保留的天数
+        weekly (int): 保留的周数
+        monthly (int): 保留的月数
+
+    Returns:
+        set: 需要保留的文件名
+    """
+    tiers = (
+        (daily, lambda t: t.date()),
+        (weekly, lambda t: t.isocalendar()[:2]),
+        (monthly, lambda t: (t.year, t.month)),
+    )
+    keep = {backups[0][1]} if backups else set()
+    for count, period in tiers:
+        seen = set()
+        for backup_time, name in backups:
+            if len(seen) >= count:
+                break
+            key = period(backup_time)
+            if key not in seen:
+                seen.add(key)
+                keep.add(name)
+    return keep
+
+
+def prune_backups(backup_dir=None):
+    """
+    按 BACKUP_KEEP_DAILY / WEEKLY / MONTHLY 删除不再保留的备份
+
+    Returns:
+        list: 已删除的文件名
+    """
+    config = current_app.config
+    backup_dir = backup_dir or config['BACKUP_DIR']
+    backups = list_backups(backup_dir)
+    keep = select_backups_to_keep(
+        backups, config['BACKUP_KEEP_DAILY'], config['BACKUP_KEEP_WEEKLY'], config['BACKUP_KEEP_MONTHLY']
+    )
+
+    removed = []
+    for _, name in backups:
+        if name not in keep:
+            os.remove(os.path.join(backup_dir, name))
+            removed.append(name)
+
+    if removed:
+        manifest = _load_manifest(backup_dir)
+        for name in removed:
+            manifest.pop(name, None)
+        _save_manifest(backup_dir, manifest)
+    return removed
+
+
+def backup_database(backup_dir=None, compression=None):
+    """
+    生成一份经过校验的压缩备份（数据库与上一份备份相同时跳过）
+
+    Args:
+        backup_dir (str): 备份目录，默认 BACKUP_DIR
+        compression (str): zstd/gzip，默认 BACKUP_COMPRESSION
+
+    Returns:
+        dict: file（新备份文件名，跳过时为 None）、database_bytes、backup_bytes、sha256、skipped
+    """
+    backup_dir = backup_dir or current_app.config['BACKUP_DIR']
+    compression = _compression(compression)
+    source_path = _database_path()
+    os.makedirs(backup_dir, exist_ok=True)
+
+    # 临时快照放在备份目录中，和最终文件在同一文件系统上
+    fd, snapshot_path = tempfile.mkstemp(prefix='.snapshot_', suffix='.db', dir=backup_dir)
+    os.close(fd)
+    target_path = None
+    try:
+        snapshot_database(source_path, snapshot_path)
+        check_integrity(snapshot_path)
+        sha256 = _file_sha256(snapshot_path)
+        database_bytes = os.path.getsize(snapshot_path)
+
+        manifest = _load_manifest(backup_dir)
+        latest = list_backups(backup_dir)
+        if latest and manifest.get(latest[0][1], {}).get('sha256') == sha256:
+            return {'file': None, 'database_bytes': database_bytes, 'backup_bytes': 0,
+                    'sha256': sha256, 'skipped': True}
+
+        name = f"{BACKUP_PREFIX}{datetime.now().strftime('%Y%m%d_%H%M%S')}{_suffix(compression)}"
+        target_path = os.path.join(backup_dir, name)
+        _compress(snapshot_path, f'{target_path}.tmp', compression)
+        os.replace(f'{target_path}.tmp', target_path)
+        backup_bytes = os.path.getsize(target_path)
+
+        manifest[name] = {
+            'sha256': sha256,
+            'database_bytes': database_bytes,
+            'backup_bytes': backup_bytes,
+            'created_at': datetime.now().isoformat(timespec='seconds'),
+        }
+        _save_manifest(backup_dir, manifest)
+        return {'file': name, 'database_bytes': database_bytes, 'backup_bytes': backup_bytes,
+                'sha256': sha256, 'skipped': False}
+    finally:
+        for path in (snapshot_path, f'{snapshot_path}-journal', f'{target_path}.tmp' if target_path else None):
+            if path and os.path.exists(path):
+                os.remove(path)
+
+
+def restore_backup(backup_path, target_path):
+    """
+    解压备份到目标路径并校验（目标数据库不能正在使用）
+
+    Args:
+        backup_path (str): 备份文件路径（.db.zst / .db.gz / .db）
+        target_path (str): 恢复后的数据库文件路径，已存在时覆盖
+
+    Returns:
+        int: 恢复后的文件字节数
+    """
+    target_dir = os.path.dirname(os.path.abspath(target_path))
+    fd, tmp_path = tempfile.mkstemp(prefix='.restore_', suffix='.db', dir=target_dir)
+    try:
+        with os.fdopen(fd, 'wb') as dst, _open_backup(backup_path) as src:
+            shutil.copyfileobj(src, dst, CHUNK_SIZE)
+            dst.flush()
+            os.fsync(dst.fileno())
+
+        expected = _load_manifest(os.path.dirname(os.path.abspath(backup_path))) \
+            .get(os.path.basename(backup_path), {}).get('sha256')
+        if expected and _file_sha256(tmp_path) != expected:
+            raise BackupError('备份文件校验和不一致')
+        check_integrity(tmp_path)
+
+        # 旧库的 WAL 文件属于被替换的数据库，必须一并删除
+        for suffix in ('-wal', '-shm'):
+            if os.path.exists(target_path + suffix):
+                os.remove(target_path + suffix)
+        os.replace(tmp_path, target_path)
+        return os.path.getsize(target_path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
@@ -0,0 +1,105 @@
+"""
+SQLite 写事务重试
+pysqlite 默认在第一条 INSERT/UPDATE/DELETE 之前才发送 BEGIN，写事务一开始就申请写锁；
+另一个 worker 长时间持有写锁（批量写入、检查点、迁移等）超过 busy_timeout 时，
+语句返回 SQLITE_BUSY（database is locked）。此时事务已回滚，只能重新执行整个写操作单元。
+
+retry_on_busy 装饰完整的写操作单元（函数内完成查询、修改和提交），遇到 SQLITE_BUSY 时回滚会话，
+按指数退避（加随机抖动）等待后重新执行，最多重试 DB_BUSY_RETRIES 次。
+被装饰的函数在提交之前不能有数据库以外的副作用；嵌套调用时只由最外层重试。
+调用时会话中已有调用方未提交的修改（未 flush 的对象或已开始的写事务）时不重试：
+回滚会丢掉调用方的修改，错误直接抛给调用方处理。
+
+用法：
+    @retry_on_busy
+    def add_lead_communication(...):
+        ...
+        db.session.commit()
+"""
+import random
+import sqlite3
+import threading
+import time
+from functools import wraps
+
+from flask import current_app, has_app_context
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import scoped_session
+
+from models import db
+
+# SQLITE_BUSY、SQLITE_LOCKED 及其扩展错误码的低 8 位
+BUSY_ERROR_CODES = (sqlite3.SQLITE_BUSY, sqlite3.SQLITE_LOCKED)
+BUSY_MESSAGES = ('database is locked', 'database table is locked', 'database is busy')
+
+_state = threading.local()
+
+
+def is_busy_error(exc):
+    """是否为 SQLite 忙/锁定错误"""
+    if not isinstance(exc, OperationalError):
+        return False
+    code = getattr(exc.orig, 'sqlite_errorcode', None)
+    if code is not None:
+        return code & 0xff in BUSY_ERROR_CODES
+    return any(message in str(exc.orig) for message in BUSY_MESSAGES)
+
+
+def has_pending_writes(session):
+    """会话中是否有尚未提交的修改（待 flush 的对象，或已经 flush、写事务已开始）"""
+    if isinstance(session, scoped_session):
+        session = session()
+    if session.new or session.dirty or session.deleted:
+        return True
+    if not session.in_transaction():
+        return False
+    dbapi_conn = session.connection().connection.dbapi_connection
+    return bool(getattr(dbapi_conn, 'in_transaction', False))
+
+
+def _retry_settings():
+    if has_app_context():
+        return current_app.config.get('DB_BUSY_RETRIES', 3), current_app.config.get('DB_BUSY_BACKOFF', 0.05)
+    return 3, 0.05
+
+
+def retry_on_busy(func=None, *, session_factory=None):
+    """
+    写事务遇到 SQLITE_BUSY 时回滚并重新执行
+
+    Args:
+        func: 被装饰的函数
+        session_factory: 返回需要回滚的会话，默认 db.session；直接使用连接（engine.begin）的函数传 False
+    """
+    def decorator(f):
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            if getattr(_state, 'active', False):
+                return f(*args, **kwargs)
+            session = None
+            if session_factory is not False:
+                session = (session_factory or (lambda: db.session))()
+                if has_pending_writes(session):
+                    return f(*args, **kwargs)
+
+            retries, backoff = _retry_settings()
+            _state.active = True
+            try:
+                attempt = 0
+                while True:
+                    try:
+                        return f(*args, **kwargs)
+                    except OperationalError as e:
+                        if not is_busy_error(e) or attempt >= retries:
+                            raise
+                        if session is not None:
+                            session.rollback()
+                        time.sleep(backoff * (2 ** attempt) * (0.5 + random.random()))
+                        attempt += 1
+            finally:
+                _state.active = False
+        return decorated_function
+
+    if func is not None:
+        return decorator(func)
+    return decorator
@@ -0,0 +1,261 @@
+"""
+数据导出任务
+导出请求只登记一条 export_jobs 记录即返回，由独立的 export-worker 进程（生产环境，crm-export.service）
+或开发环境 Web 进程内的后台线程生成文件，页面轮询任务进度，完成后在有效期内下载。
+
+任务通过条件 UPDATE 原子领取，Web 进程内的后台线程与 export-worker 可以同时运行而不会重复导出；
+进度长时间未更新的运行中任务（如所在进程被重启）会被重新领取。
+
+用法：
+    job = create_export_job(current_user.id, ['leads', 'payments'])
+    python run.py export-worker          # 持续处理导出任务
+    python run.py export-worker --once   # 处理完当前排队的任务后退出
+"""
+import json
+import os
+import threading
+import time
+import traceback
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+from flask import current_app
+from sqlalchemy import and_, or_, update
+
+from models import db, ExportJob
+from utils.table_export import EXPORTABLE_TABLES, count_table_rows, write_workbook
+
+# 运行中任务超过该时长没有更新进度，视为已中断，可被重新领取
+STALE_JOB_SECONDS = 300
+# 进度写入数据库的最小间隔（秒）
+PROGRESS_INTERVAL = 1.0
+# export-worker 轮询间隔（秒）
+WORKER_POLL_SECONDS = 5
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _claimable_condition(now):
+    stale_before = now - timedelta(seconds=STALE_JOB_SECONDS)
+    return or_(
+        ExportJob.status == ExportJob.STATUS_PENDING,
+        and_(ExportJob.status == ExportJob.STATUS_RUNNING, ExportJob.heartbeat_at < stale_before)
+    )
+
+
+def create_export_job(user_id, table_keys):
+    """
+    登记导出任务并通知后台线程处理
+
+    Args:
+        user_id (int): 发起人ID
+        table_keys (list): 要导出的表名，不在 EXPORTABLE_TABLES 中的会被忽略
+
+    Returns:
+        ExportJob: 新建的任务
+    """
+    tables = [key for key in table_keys if key in EXPORTABLE_TABLES]
+    job = ExportJob(user_id=user_id, tables=json.dumps(tables), status=ExportJob.STATUS_PENDING)
+    db.session.add(job)
+    db.session.commit()
+
+    _submit_to_local_worker()
+    return job
+
+
+def _submit_to_local_worker():
+    """交给本进程的后台线程处理（EXPORT_WORKER_THREADS 为0时只由 export-worker 处理，生产环境默认为0）"""
+    global _executor
+    threads = current_app.config.get('EXPORT_WORKER_THREADS', 1)
+    if threads <= 0:
+        return
+
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=threads, thread_name_prefix='export-job')
+    _executor.submit(_run_in_app_context, current_app._get_current_object())
+
+
+def _run_in_app_context(app):
+    with app.app_context():
+        try:
+            run_pending_jobs()
+        except Exception:
+            traceback.print_exc()
+        finally:
+            db.session.remove()
+
+
+def claim_next_job():
+    """
+    领取一个待处理的导出任务
+
+    Returns:
+        ExportJob: 领取到的任务，没有可领取的任务时返回 None
+    """
+    now = datetime.utcnow()
+    candidates = db.session.query(ExportJob.id).filter(
+        _claimable_condition(now)
+    ).order_by(ExportJob.created_at, ExportJob.id).limit(5).all()
+
+    for (job_id,) in candidates:
+        # 条件更新：只有一个进程/线程能把任务改为运行中
+        result = db.session.execute(
+            update(ExportJob).where(
+                ExportJob.id == job_id,
+                _claimable_condition(now)
+            ).values(
+                status=ExportJob.STATUS_RUNNING,
+                started_at=now,
+                heartbeat_at=now,
+                processed_rows=0,
+                error_message=None
+            ).execution_options(synchronize_session=False)
+        )
+        db.session.commit()
+        if result.rowcount == 1:
+            return db.session.get(ExportJob, job_id)
+    return None
+
+
+def run_export_job(job):
+    """
+    生成导出文件并更新任务状态
+
+    Args:
+        job (ExportJob): 已领取（运行中）的任务
+    """
+    export_dir = current_app.config['EXPORT_DIR']
+    retention = timedelta(hours=current_app.config.get('EXPORT_RETENTION_HOURS', 24))
+    file_path = os.path.join(export_dir, f'export_{job.id}_{uuid.uuid4().hex}.xlsx')
+    temp_path = file_path + '.part'
+
+    try:
+        tables = job.get_tables_list()
+        job.total_rows = sum(count_table_rows(table_key) for table_key in tables)
+        db.session.commit()
+
+        last_update = time.monotonic()
+
+        def report_progress(rows):
+            nonlocal last_update
+            if time.monotonic() - last_update < PROGRESS_INTERVAL:
+                return
+            job.processed_rows = rows
+            job.heartbeat_at = datetime.utcnow()
+            db.session.commit()
+            last_update = time.monotonic()
+
+        os.makedirs(export_dir, exist_ok=True)
+        with open(temp_path, 'wb') as output:
+            rows = write_workbook(tables, output, progress=report_progress)
+        os.replace(temp_path, file_path)
+
+        now = datetime.utcnow()
+        job.status = ExportJob.STATUS_COMPLETED
+        job.processed_rows = rows
+        job.file_path = file_path
+        job.file_size = os.path.getsize(file_path)
+        job.finished_at = now
+        job.expires_at = now + retention
+        db.session.commit()
+    except Exception as e:
+        traceback.print_exc()
+        db.session.rollback()
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        job.status = ExportJob.STATUS_FAILED
+        job.error_message = str(e)
+        job.finished_at = datetime.utcnow()
+        db.session.commit()
+
+
+def run_pending_jobs(max_jobs=None):
+    """
+    依次处理排队中的导出任务
+
+    Args:
+        max_jobs (int): 最多处理的任务数，为None时处理到队列为空
+
+    Returns:
+        int: 处理的任务数
+    """
+    processed = 0
+    while max_jobs is None or processed < max_jobs:
+        job = claim_next_job()
+        if job is None:
+            break
+        run_export_job(job)
+        processed += 1
+    return processed
+
+
+def cleanup_expired_exports():
+    """
+    删除过期的导出文件
+
+    Returns:
+        int: 清理的任务数
+    """
+    jobs = ExportJob.query.filter(
+        ExportJob.status == ExportJob.STATUS_COMPLETED,
+        ExportJob.expires_at < datetime.utcnow()
+    ).all()
+
+    for job in jobs:
+        if job.file_path and os.path.exists(job.file_path):
+            os.remove(job.file_path)
+        job.status = ExportJob.STATUS_EXPIRED
+        job.file_path = None
+
+    if jobs:
+        db.session.commit()
+    return len(jobs)
+
+
+def run_worker(once=False):
+    """
+    export-worker 主循环
+
+    Args:
+        once (bool): 处理完当前排队的任务后退出
+    """
+    while True:
+        cleanup_expired_exports()
+        processed = run_pending_jobs()
+        if processed:
+            print(f"已完成 {processed} 个导出任务")
+        if once:
+            return
+        db.session.remove()
+        time.sleep(WORKER_POLL_SECONDS)
+
+
+def is_downloadable(job):
+    """任务文件是否可以下载"""
+    return (
+        job.status == ExportJob.STATUS_COMPLETED
+        and job.expires_at is not None
+        and job.expires_at > datetime.utcnow()
+        and job.file_path is not None
+        and os.path.exists(job.file_path)
+    )
+
+
+def job_to_dict(job):
+    """任务状态（供页面轮询）"""
+    return {
+        'id': job.id,
+        'status': job.status,
+        'progress': job.progress,
+        'processed_rows': job.processed_rows,
+        'total_rows': job.total_rows,
+        'tables': [EXPORTABLE_TABLES[key]['name'] for key in job.get_tables_list() if key in EXPORTABLE_TABLES],
+        'file_size': job.file_size,
+        'error_message': job.error_message,
+        'created_at': job.created_at.strftime('%Y-%m-%d %H:%M:%S') if job.created_at else None,
+        'expires_at': job.expires_at.strftime('%Y-%m-%d %H:%M:%S') if job.expires_at else None,
+        'downloadable': is_downloadable(job)
+    }
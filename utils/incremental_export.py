@@ -0,0 +1,300 @@
+"""
+增量数据导出工具
+按导出方案（profile）为每张表记录水位，每次只导出水位之后新增或修改的行，
+输出 CSV.gz 或 NDJSON 文件，导出量与当天的数据变动量成正比，而不是整个数据库。
+
+水位规则：
+    有 updated_at 字段的表按 (updated_at, ID) 记录水位，每批沿 (updated_at, id) 索引定位、排序，
+    只读取本批的行（updated_at 不为空，历史空值由 backfill_updated_at 按 created_at 回填）；
+    沟通记录、登录日志没有 updated_at，按自增ID记录水位（只导出新增的行，修改不会导出）；
+    SNAPSHOT_TABLES 中的小配置表可以在页面上改名、删除，又没有变更时间，每次导出全表快照
+    （表为空时也输出只有表头的文件），下游用最新快照替换。
+    其他表删除的行不会导出。
+
+最近 WATERMARK_LAG_SECONDS 秒内变更的行留到下一次导出，避免遗漏导出时尚未提交的事务；
+文件完整写入后才推进水位，导出失败时下次会从原水位重新导出。
+
+用法：
+    results = export_incremental('finance', fmt='csv')
+    python run.py export-incremental finance --format ndjson --tables payments,customers
+"""
+import csv
+import gzip
+import json
+import os
+import re
+from datetime import datetime, timedelta
+
+from flask import current_app
+from sqlalchemy import func, literal, or_, select, update
+
+from models import db, ExportWatermark
+from utils.stream_export import json_value
+from utils.table_export import EXPORTABLE_TABLES, EXPORT_BATCH_SIZE, export_columns, format_value
+
+# 只导出该时长之前的变更，给仍在进行中的事务留出提交时间
+WATERMARK_LAG_SECONDS = 60
+
+# 回填 updated_at 时 created_at 也为空的历史数据取该时间（首次导出时包含在内）
+EPOCH = datetime(1970, 1, 1)
+
+EXPORT_FORMATS = {
+    'csv': '.csv.gz',
+    'ndjson': '.ndjson',
+}
+
+PROFILE_PATTERN = re.compile(r'^[A-Za-z0-9_-]{1,50}$')
+
+# 每次全量导出的表（行数少、会被修改或删除、没有 updated_at）
+SNAPSHOT_TABLES = {'competition_names'}
+
+
+def watermark_column(table_key):
+    """表的水位字段：有 updated_at 的表为 'updated_at'，全量快照表为 'snapshot'，否则为 'id'"""
+    if table_key in SNAPSHOT_TABLES:
+        return 'snapshot'
+    model = EXPORTABLE_TABLES[table_key]['model']
+    return 'updated_at' if 'updated_at' in model.__table__.c else 'id'
+
+
+def backfill_updated_at(batch_size=1000):
+    """
+    分批回填按 updated_at 记录水位的表中为空的 updated_at（取 created_at，也为空时取 EPOCH）
+
+    Args:
+        batch_size (int): 每批处理的行数，每批单独提交，避免长时间占用写锁
+
+    Returns:
+        int: 回填的行数
+    """
+    updated = 0
+    for table_key in EXPORTABLE_TABLES:
+        if watermark_column(table_key) != 'updated_at':
+            continue
+        table = EXPORTABLE_TABLES[table_key]['model'].__table__
+        last_id = 0
+        while True:
+            ids = db.session.execute(
+                select(table.c.id).where(table.c.id > last_id, table.c.updated_at.is_(None))
+                .order_by(table.c.id).limit(batch_size)
+            ).scalars().all()
+            if not ids:
+                break
+            db.session.execute(
+                update(table).where(table.c.id.in_(ids)).values(
+                    updated_at=func.coalesce(table.c.created_at, literal(EPOCH, type_=table.c.updated_at.type))
+                )
+            )
+            db.session.commit()
+            updated += len(ids)
+            last_id = ids[-1]
+    return updated
+
+
+def iter_changed_batches(table_key, watermark, cutoff, batch_size=EXPORT_BATCH_SIZE):
+    """
+    分批读取水位之后变更的行
+
+    Args:
+        table_key (str): EXPORTABLE_TABLES 中的表名
+        watermark (ExportWatermark): 当前水位，为None时从头导出（全量快照表忽略水位）
+        cutoff (datetime): 只导出变更时间早于该时间的行（按 updated_at 记录水位的表）
+        batch_size (int): 每批行数
+
+    Yields:
+        tuple: (本批行数据列表, 本批最后一行的变更时间, 本批最后一行的ID)，
+        行数据为原始值，顺序与 columns 一致
+    """
+    model = EXPORTABLE_TABLES[table_key]['model']
+    primary_key = model.__table__.c.id
+    mode = watermark_column(table_key)
+    last_id = watermark.last_id if watermark and mode != 'snapshot' else 0
+
+    if mode in ('id', 'snapshot'):
+        stmt = select(primary_key, *export_columns(table_key)).order_by(primary_key)
+        while True:
+            rows = db.session.execute(stmt.where(primary_key > last_id).limit(batch_size)).all()
+            if not rows:
+                break
+            last_id = rows[-1][0]
+            yield [list(row[1:]) for row in rows], None, last_id
+            if len(rows) < batch_size:
+                break
+        return
+
+    updated_at = model.__table__.c.updated_at
+    last_changed_at = watermark.last_changed_at if watermark and watermark.last_changed_at else None
+    stmt = select(updated_at, primary_key, *export_columns(table_key)).where(
+        updated_at < cutoff
+    ).order_by(updated_at, primary_key)
+
+    while True:
+        batch_stmt = stmt
+        if last_changed_at is not None:
+            # (updated_at, ID) 组合游标，updated_at 相同的行不会重复或遗漏；
+            # 单独的 updated_at >= 条件让每批从 idx_<表名>_updated_id 索引上的水位处开始读取
+            batch_stmt = stmt.where(
+                updated_at >= last_changed_at,
+                or_(updated_at > last_changed_at, primary_key > last_id)
+            )
+        rows = db.session.execute(batch_stmt.limit(batch_size)).all()
+        if not rows:
+            break
+        last_changed_at, last_id = rows[-1][0], rows[-1][1]
+        yield [list(row[2:]) for row in rows], last_changed_at, last_id
+        if len(rows) < batch_size:
+            break
+
+
+class _CsvGzWriter:
+    """CSV.gz 输出（UTF-8 带 BOM，Excel 可直接打开中文表头）"""
+
+    def __init__(self, path, table_key):
+        self.table_key = table_key
+        self.columns = EXPORTABLE_TABLES[table_key]['columns']
+        self.file = gzip.open(path, 'wt', encoding='utf-8-sig', newline='')
+        self.writer = csv.writer(self.file)
+        self.writer.writerow(EXPORTABLE_TABLES[table_key]['column_names'])
+
+    def write_rows(self, rows):
+        self.writer.writerows(
+            [format_value(self.table_key, name, value) for name, value in zip(self.columns, row)]
+            for row in rows
+        )
+
+    def close(self):
+        self.file.close()
+
+
+class _NdjsonWriter:
+    """NDJSON 输出（每行一个 JSON 对象，键为英文字段名）"""
+
+    def __init__(self, path, table_key):
+        self.columns = EXPORTABLE_TABLES[table_key]['columns']
+        self.file = open(path, 'w', encoding='utf-8')
+
+    def write_rows(self, rows):
+        for row in rows:
+            record = {name: json_value(value) for name, value in zip(self.columns, row)}
+            self.file.write(json.dumps(record, ensure_ascii=False))
+            self.file.write('\n')
+
+    def close(self):
+        self.file.close()
+
+
+WRITERS = {
+    'csv': _CsvGzWriter,
+    'ndjson': _NdjsonWriter,
+}
+
+
+def get_watermark(profile, table_key):
+    """获取导出方案中某张表的水位，尚未导出过时返回 None"""
+    return ExportWatermark.query.filter_by(profile=profile, table_key=table_key).first()
+
+
+def reset_watermarks(profile, table_keys=None):
+    """
+    清除导出方案的水位（下次导出为全量）
+
+    Returns:
+        int: 清除的水位数
+    """
+    query = ExportWatermark.query.filter_by(profile=profile)
+    if table_keys:
+        query = query.filter(ExportWatermark.table_key.in_(table_keys))
+    count = query.delete(synchronize_session=False)
+    db.session.commit()
+    return count
+
+
+def export_table_incremental(profile, table_key, output_dir, fmt='csv', now=None):
+    """
+    导出一张表在水位之后变更的行，并推进水位
+
+    Args:
+        profile (str): 导出方案名称
+        table_key (str): EXPORTABLE_TABLES 中的表名
+        output_dir (str): 输出目录
+        fmt (str): 输出格式，csv（CSV.gz）或 ndjson
+        now (datetime): 当前时间（UTC），默认取系统时间
+
+    Returns:
+        dict: 导出结果 {'table', 'rows', 'file'}，没有变更时 file 为 None
+    """
+    now = now or datetime.utcnow()
+    cutoff = now - timedelta(seconds=WATERMARK_LAG_SECONDS)
+    watermark = get_watermark(profile, table_key)
+
+    file_path = os.path.join(output_dir, f"{table_key}_{now.strftime('%Y%m%d_%H%M%S')}{EXPORT_FORMATS[fmt]}")
+    temp_path = file_path + '.part'
+    writer = None
+    rows = 0
+    last_changed_at = last_id = None
+
+    try:
+        for batch, last_changed_at, last_id in iter_changed_batches(table_key, watermark, cutoff):
+            if writer is None:
+                os.makedirs(output_dir, exist_ok=True)
+                writer = WRITERS[fmt](temp_path, table_key)
+            writer.write_rows(batch)
+            rows += len(batch)
+        if writer is None and watermark_column(table_key) == 'snapshot':
+            # 全量快照表为空时同样输出文件，下游据此删除全部行
+            os.makedirs(output_dir, exist_ok=True)
+            writer = WRITERS[fmt](temp_path, table_key)
+        # 读取结束后释放读事务，写水位前不占用连接
+        db.session.commit()
+    except Exception:
+        if writer is not None:
+            writer.close()
+            os.remove(temp_path)
+        raise
+
+    if writer is None:
+        return {'table': table_key, 'rows': 0, 'file': None}
+
+    writer.close()
+    os.replace(temp_path, file_path)
+
+    # 文件写完后再推进水位
+    if watermark is None:
+        watermark = ExportWatermark(profile=profile, table_key=table_key)
+        db.session.add(watermark)
+    watermark.watermark_column = watermark_column(table_key)
+    watermark.last_changed_at = last_changed_at
+    watermark.last_id = last_id or 0
+    watermark.last_row_count = rows
+    watermark.last_file = file_path
+    db.session.commit()
+
+    return {'table': table_key, 'rows': rows, 'file': file_path}
+
+
+def export_incremental(profile, table_keys=None, fmt='csv', output_dir=None):
+    """
+    按导出方案增量导出多张表（每张表一个文件）
+
+    Args:
+        profile (str): 导出方案名称（字母、数字、下划线、短横线）
+        table_keys (list): 要导出的表名，为None时导出全部可导出表
+        fmt (str): 输出格式，csv（CSV.gz）或 ndjson
+        output_dir (str): 输出目录，默认 EXPORT_DIR/incremental/<profile>
+
+    Returns:
+        list: 各表的导出结果
+    """
+    if not PROFILE_PATTERN.match(profile or ''):
+        raise ValueError(f'导出方案名称不合法: {profile}')
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f'不支持的导出格式: {fmt}')
+
+    table_keys = table_keys or list(EXPORTABLE_TABLES)
+    unknown = [key for key in table_keys if key not in EXPORTABLE_TABLES]
+    if unknown:
+        raise ValueError(f"不支持导出的表: {', '.join(unknown)}")
+
+    output_dir = output_dir or os.path.join(current_app.config['EXPORT_DIR'], 'incremental', profile)
+    now = datetime.utcnow()
+    return [export_table_incremental(profile, table_key, output_dir, fmt, now) for table_key in table_keys]
@@ -0,0 +1,131 @@
+"""
+线索全文检索工具
+基于 SQLite FTS5（trigram 分词）建立 leads_fts 索引，支持中文子串和手机号片段检索；
+FTS5 不可用或检索词少于3个字符时自动回退为 LIKE 查询。
+"""
+from sqlalchemy import Integer, column, or_, text
+
+from models import db, Lead
+
+# 参与全文检索的线索字段
+LEAD_SEARCH_COLUMNS = ('student_name', 'parent_wechat_display_name', 'parent_wechat_name', 'contact_info')
+
+# trigram 分词要求检索词至少3个字符
+FTS_MIN_QUERY_LENGTH = 3
+
+_columns_sql = ', '.join(LEAD_SEARCH_COLUMNS)
+_new_values_sql = ', '.join(f'new.{name}' for name in LEAD_SEARCH_COLUMNS)
+_old_values_sql = ', '.join(f'old.{name}' for name in LEAD_SEARCH_COLUMNS)
+
+# 建立 FTS5 外部内容表及同步触发器
+FTS_DDL = [
+    f"""
+    CREATE VIRTUAL TABLE IF NOT EXISTS leads_fts USING fts5(
+        {_columns_sql},
+        content='leads', content_rowid='id', tokenize='trigram'
+    )
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS leads_fts_ai AFTER INSERT ON leads BEGIN
+        INSERT INTO leads_fts(rowid, {_columns_sql}) VALUES (new.id, {_new_values_sql});
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS leads_fts_ad AFTER DELETE ON leads BEGIN
+        INSERT INTO leads_fts(leads_fts, rowid, {_columns_sql}) VALUES ('delete', old.id, {_old_values_sql});
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS leads_fts_au AFTER UPDATE OF {_columns_sql} ON leads BEGIN
+        INSERT INTO leads_fts(leads_fts, rowid, {_columns_sql}) VALUES ('delete', old.id, {_old_values_sql});
+        INSERT INTO leads_fts(rowid, {_columns_sql}) VALUES (new.id, {_new_values_sql});
+    END
+    """,
+]
+
+FTS_REBUILD_SQL = "INSERT INTO leads_fts(leads_fts) VALUES ('rebuild')"
+
+# 当前进程中 leads_fts 是否可用（None 表示尚未检测）
+_fts_available = None
+
+
+def ensure_lead_fts():
+    """
+    创建 leads_fts 全文索引表和同步触发器（已存在则跳过）
+
+    Returns:
+        bool: FTS5 是否可用
+    """
+    global _fts_available
+    try:
+        created = not _fts_table_exists()
+        for statement in FTS_DDL:
+            db.session.execute(text(statement))
+        if created:
+            db.session.execute(text(FTS_REBUILD_SQL))
+        db.session.commit()
+        _fts_available = True
+    except Exception:
+        # 当前 SQLite 未编译 FTS5 或不支持 trigram 分词
+        db.session.rollback()
+        _fts_available = False
+    return _fts_available
+
+
+def rebuild_lead_fts():
+    """
+    根据 leads 表重建全文索引
+
+    Returns:
+        int: 索引的线索数
+    """
+    if not ensure_lead_fts():
+        raise RuntimeError('当前 SQLite 不支持 FTS5 trigram 分词，无法建立全文索引')
+    db.session.execute(text(FTS_REBUILD_SQL))
+    db.session.commit()
+    return db.session.query(db.func.count(Lead.id)).scalar()
+
+
+def _fts_table_exists():
+    return db.session.execute(
+        text("SELECT 1 FROM sqlite_master WHERE type='table' AND name='leads_fts'")
+    ).first() is not None
+
+
+def fts_available():
+    """当前数据库是否已建立 leads_fts 全文索引"""
+    global _fts_available
+    if _fts_available is None:
+        try:
+            _fts_available = _fts_table_exists()
+        except Exception:
+            _fts_available = False
+    return _fts_available
+
+
+def _fts_match_query(search, columns):
+    """构造 FTS5 MATCH 表达式：按短语匹配，并限定检索字段"""
+    phrase = '"' + search.replace('"', '""') + '"'
+    if tuple(columns) == LEAD_SEARCH_COLUMNS:
+        return phrase
+    return '{' + ' '.join(columns) + '} : ' + phrase
+
+
+def lead_search_condition(search, columns=LEAD_SEARCH_COLUMNS):
+    """
+    生成线索模糊检索条件
+
+    Args:
+        search (str): 检索词
+        columns (tuple): 检索的字段名，默认为全部检索字段
+
+    Returns:
+        查询条件表达式，可直接用于 Lead.query.filter()
+    """
+    if len(search) >= FTS_MIN_QUERY_LENGTH and fts_available():
+        matched_ids = text(
+            "SELECT rowid FROM leads_fts WHERE leads_fts MATCH :fts_query"
+        ).bindparams(fts_query=_fts_match_query(search, columns)).columns(column('rowid', Integer))
+        return Lead.id.in_(matched_ids)
+
+    return or_(*[getattr(Lead, name).contains(search) for name in columns])
@@ -0,0 +1,176 @@
+"""
+列表视图导出工具
+在线索/客户列表的筛选查询上，用一条集合查询联出销售、班主任、付款合计等展示列，
+按排序键分批查询、流式输出，不逐行访问 ORM 属性。
+
+用法：
+    keys, column_names, batches = lead_view_export(filtered_query)
+    return streaming_response(batches, 'csv', column_names, '线索列表')
+"""
+from sqlalchemy import func, select
+from sqlalchemy.orm import aliased
+
+from models import User, Lead, Customer, Payment, TutoringDelivery, CompetitionDelivery
+from utils.pagination import iter_keyset_batches
+from utils.service_types import parse_service_types
+from utils.table_export import EXPORT_BATCH_SIZE, format_value
+
+# (键名, 中文列名)
+LEAD_VIEW_COLUMNS = [
+    ('id', 'ID'),
+    ('student_name', '学员姓名'),
+    ('parent_wechat_display_name', '家长微信名'),
+    ('parent_wechat_name', '家长微信号'),
+    ('contact_info', '联系方式'),
+    ('lead_source', '线索来源'),
+    ('grade', '年级'),
+    ('stage', '阶段'),
+    ('sales_username', '责任销售'),
+    ('contract_amount', '合同金额'),
+    ('paid_amount', '已付款合计'),
+    ('payment_count', '付款笔数'),
+    ('first_payment_at', '首笔支付时间'),
+    ('second_payment_at', '次笔支付时间'),
+    ('created_at', '创建时间'),
+    ('updated_at', '更新时间'),
+]
+
+CUSTOMER_VIEW_COLUMNS = [
+    ('id', '客户ID'),
+    ('lead_id', '线索ID'),
+    ('student_name', '学员姓名'),
+    ('parent_wechat_display_name', '家长微信名'),
+    ('contact_info', '联系方式'),
+    ('service_types', '服务类型'),
+    ('sales_username', '责任销售'),
+    ('teacher_username', '责任班主任'),
+    ('exam_year', '升学年份'),
+    ('payment_amount', '合同金额'),
+    ('paid_amount', '已付款合计'),
+    ('payment_count', '付款笔数'),
+    ('first_payment_at', '首笔支付时间'),
+    ('second_payment_at', '次笔支付时间'),
+    ('thesis_status', '课题状态'),
+    ('delivery_status', '竞赛交付状态'),
+    ('is_priority', '重点关注'),
+    ('created_at', '新增时间'),
+]
+
+
+SERVICE_TYPE_NAMES = {
+    'tutoring': '课题辅导',
+    'competition': '竞赛辅导',
+    'upgrade_guidance': '升学陪跑'
+}
+
+
+def _format_value(view_key, key, value):
+    """格式化导出值（服务类型显示中文）"""
+    if key == 'service_types':
+        return ', '.join(SERVICE_TYPE_NAMES.get(item, item) for item in parse_service_types(value))
+    return format_value(view_key, key, value)
+
+
+def _payment_totals():
+    """每个线索的付款合计与笔数（分组子查询）"""
+    return select(
+        Payment.lead_id.label('lead_id'),
+        func.sum(Payment.amount).label('paid_amount'),
+        func.count(Payment.id).label('payment_count')
+    ).group_by(Payment.lead_id).subquery('payment_totals')
+
+
+def _latest_delivery(model, column):
+    """客户最新一条交付记录的字段（关联子查询，客户有多条交付记录时也只输出一行）"""
+    return select(column).where(
+        model.customer_id == Customer.id
+    ).order_by(model.id.desc()).limit(1).scalar_subquery()
+
+
+def _iter_batches(query, order_by, view_key, keys, raw):
+    """按排序键分批查询（每批一次短查询，下载期间不占用读事务）"""
+    for rows in iter_keyset_batches(query, order_by, EXPORT_BATCH_SIZE):
+        if raw:
+            yield [list(row) for row in rows]
+        else:
+            yield [[_format_value(view_key, key, value) for key, value in zip(keys, row)] for row in rows]
+
+
+def lead_view_export(query, raw=False):
+    """
+    线索列表导出（排序与列表页一致：更新时间倒序）
+
+    Args:
+        query: 已应用权限与筛选条件的线索查询
+        raw (bool): 返回数据库原始值，不做 format_value 格式化
+
+    Returns:
+        tuple: (键名列表, 中文列名列表, 数据批迭代器)
+    """
+    sales_user = aliased(User)
+    totals = _payment_totals()
+    columns = {
+        'sales_username': sales_user.username,
+        'paid_amount': func.coalesce(totals.c.paid_amount, 0),
+        'payment_count': func.coalesce(totals.c.payment_count, 0),
+    }
+    keys = [key for key, _ in LEAD_VIEW_COLUMNS]
+    query = query.outerjoin(
+        sales_user, Lead.sales_user_id == sales_user.id
+    ).outerjoin(
+        totals, totals.c.lead_id == Lead.id
+    ).with_entities(
+        *[(columns[key] if key in columns else getattr(Lead, key)).label(key) for key in keys]
+    )
+    order_by = [(Lead.updated_at, True), (Lead.id, True)]
+
+    return keys, [name for _, name in LEAD_VIEW_COLUMNS], _iter_batches(query, order_by, 'lead_view', keys, raw)
+
+
+def customer_view_export(query, raw=False):
+    """
+    客户列表导出（排序与列表页一致：次笔付款时间倒序，相同时按新增时间倒序）
+
+    Args:
+        query: 已应用权限与筛选条件、并已关联线索表的客户查询
+        raw (bool): 返回数据库原始值，不做 format_value 格式化
+
+    Returns:
+        tuple: (键名列表, 中文列名列表, 数据批迭代器)
+    """
+    sales_user = aliased(User)
+    teacher_user = aliased(User)
+    totals = _payment_totals()
+    columns = {
+        'id': Customer.id,
+        'lead_id': Customer.lead_id,
+        'student_name': Lead.student_name,
+        'parent_wechat_display_name': Lead.parent_wechat_display_name,
+        'contact_info': Lead.contact_info,
+        'service_types': Lead.service_types,
+        'sales_username': sales_user.username,
+        'teacher_username': teacher_user.username,
+        'exam_year': Customer.exam_year,
+        'payment_amount': Customer.payment_amount,
+        'paid_amount': func.coalesce(totals.c.paid_amount, 0),
+        'payment_count': func.coalesce(totals.c.payment_count, 0),
+        'first_payment_at': Lead.first_payment_at,
+        'second_payment_at': Lead.second_payment_at,
+        'thesis_status': _latest_delivery(TutoringDelivery, TutoringDelivery.thesis_status),
+        'delivery_status': _latest_delivery(CompetitionDelivery, CompetitionDelivery.delivery_status),
+        'is_priority': Customer.is_priority,
+        'created_at': Customer.created_at,
+    }
+    keys = [key for key, _ in CUSTOMER_VIEW_COLUMNS]
+    query = query.outerjoin(
+        sales_user, Lead.sales_user_id == sales_user.id
+    ).outerjoin(
+        teacher_user, Customer.teacher_user_id == teacher_user.id
+    ).outerjoin(
+        totals, totals.c.lead_id == Lead.id
+    ).with_entities(
+        *[columns[key].label(key) for key in keys]
+    )
+    order_by = [(Lead.second_payment_at, True), (Customer.created_at, True), (Customer.id, True)]
+
+    return keys, [name for _, name in CUSTOMER_VIEW_COLUMNS], _iter_batches(query, order_by, 'customer_view', keys, raw)
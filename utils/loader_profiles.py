@@ -0,0 +1,46 @@
+"""
+列表页关联加载配置
+列表模板逐行访问 customer.lead、lead.sales_user、customer.teacher_user 等关联，
+默认的延迟加载会让每一行各触发一次查询（N+1）。这里为每个列表页定义一组加载选项，
+列表视图通过 query.options(*PROFILE) 一次性加载，查询数与每页行数无关。
+
+用法：
+    query = _filtered_customers_query(request.args).options(*CUSTOMER_LIST_PROFILE)
+"""
+from sqlalchemy.orm import configure_mappers, contains_eager, joinedload, selectinload
+
+from models import Lead, Customer, TutoringDelivery, CompetitionDelivery
+
+# Customer.lead、TutoringDelivery.customer 等由 backref 定义，映射配置完成后才存在
+configure_mappers()
+
+# 客户列表（查询已关联线索表）：线索及责任销售、责任班主任、辅导老师、课题/竞赛交付
+CUSTOMER_LIST_PROFILE = (
+    contains_eager(Customer.lead).joinedload(Lead.sales_user),
+    joinedload(Customer.teacher_user),
+    joinedload(Customer.teacher),
+    joinedload(Customer.tutoring_delivery),
+    joinedload(Customer.competition_delivery),
+)
+
+# 课题辅导交付列表（查询已关联客户表和线索表）
+TUTORING_LIST_PROFILE = (
+    contains_eager(TutoringDelivery.customer).contains_eager(Customer.lead),
+)
+
+# 竞赛交付列表（查询已关联客户表和线索表）：另加载赛事名称
+COMPETITION_LIST_PROFILE = (
+    contains_eager(CompetitionDelivery.customer).contains_eager(Customer.lead),
+    joinedload(CompetitionDelivery.competition_name),
+)
+
+# 线索列表（销售、管理员、班主任的线索页）：责任销售、已转客户（模板按行判断是否显示"转客户"）
+LEAD_LIST_PROFILE = (
+    joinedload(Lead.sales_user),
+    selectinload(Lead.customer),
+)
+
+# 咨询列表（线索查询）：责任销售
+CONSULTATION_LIST_PROFILE = (
+    joinedload(Lead.sales_user),
+)
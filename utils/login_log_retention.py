@@ -0,0 +1,231 @@
+"""
+登录日志保留与归档
+
+- 汇总：登录日志写入时在同一事务中累加 login_daily_stats（日期 × 用户的成功/失败次数），
+  仪表板等统计直接读汇总表；维护任务会按原始日志重新计算已结束的日期，保证汇总与明细一致；
+- 归档：超过 LOGIN_LOG_RETENTION_DAYS 天的原始日志按批移入独立的归档 SQLite 文件
+  （需要时才 ATTACH 到当前连接），主库和备份不再随登录量持续增长。
+
+用法：
+    python run.py login-logs-maintain            # 汇总并归档过期日志
+    python run.py login-logs-maintain --rebuild  # 按原始日志重建全部汇总（含当天）
+"""
+from collections import defaultdict
+from contextlib import contextmanager
+from datetime import date, datetime, time, timedelta
+
+from flask import current_app
+from sqlalchemy import Column, Integer, MetaData, Table, case, delete, func, insert, literal, select
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+from models import db, LoginLog, LoginDailyStat
+
+# 每批归档的行数（每批一个事务，避免长时间占用写锁）
+ARCHIVE_BATCH_SIZE = 5000
+# 归档库在连接中的名称
+ARCHIVE_SCHEMA = 'login_archive'
+
+
+def _stat_key(record):
+    login_time = record.get('login_time') or datetime.utcnow()
+    return login_time.date(), record.get('user_id') or 0
+
+
+def apply_login_stats(connection, records):
+    """
+    将一批登录日志累加到每日汇总表（与日志插入在同一事务中调用）
+
+    Args:
+        connection: 当前事务的数据库连接
+        records (list): 登录日志字段字典列表
+    """
+    totals = defaultdict(lambda: {'success_count': 0, 'failed_count': 0, 'last_login_at': None})
+    for record in records:
+        row = totals[_stat_key(record)]
+        if record.get('login_result', 'success') == 'success':
+            row['success_count'] += 1
+        else:
+            row['failed_count'] += 1
+        login_time = record.get('login_time')
+        if login_time and (row['last_login_at'] is None or login_time > row['last_login_at']):
+            row['last_login_at'] = login_time
+
+    table = LoginDailyStat.__table__
+    now = datetime.utcnow()
+    for (stat_date, user_id), row in totals.items():
+        stmt = sqlite_insert(table).values(stat_date=stat_date, user_id=user_id, updated_at=now, **row)
+        excluded = stmt.excluded
+        stmt = stmt.on_conflict_do_update(
+            index_elements=['stat_date', 'user_id'],
+            set_={
+                'success_count': table.c.success_count + excluded.success_count,
+                'failed_count': table.c.failed_count + excluded.failed_count,
+                'last_login_at': func.max(func.coalesce(table.c.last_login_at, excluded.last_login_at),
+                                          func.coalesce(excluded.last_login_at, table.c.last_login_at)),
+                'updated_at': excluded.updated_at
+            }
+        )
+        connection.execute(stmt)
+
+
+def rollup_login_logs(through_date):
+    """
+    按原始日志重新计算汇总（只处理主库中仍有原始日志的日期，已归档日期的汇总保持不变）
+
+    Args:
+        through_date (date): 重新计算到该日期（包含）
+
+    Returns:
+        int: 重新计算的天数
+    """
+    upper = datetime.combine(through_date + timedelta(days=1), time.min)
+    login_day = func.date(LoginLog.login_time)
+    days = [row[0] for row in db.session.query(login_day).filter(
+        LoginLog.login_time < upper
+    ).distinct().all()]
+    if not days:
+        return 0
+
+    stat_days = [datetime.strptime(day, '%Y-%m-%d').date() for day in days]
+    is_success = case((LoginLog.login_result == 'success', 1), else_=0)
+    grouped = select(
+        login_day,
+        func.coalesce(LoginLog.user_id, 0),
+        func.sum(is_success),
+        func.sum(1 - is_success),
+        func.max(LoginLog.login_time),
+        literal(datetime.utcnow(), type_=LoginDailyStat.updated_at.type)
+    ).where(LoginLog.login_time < upper).group_by(login_day, func.coalesce(LoginLog.user_id, 0))
+
+    # 删除与重算在同一事务中完成，期间新写入的日志会等待写锁，不会被重复累加或遗漏
+    db.session.execute(delete(LoginDailyStat).where(LoginDailyStat.stat_date.in_(stat_days)))
+    db.session.execute(insert(LoginDailyStat).from_select(
+        ['stat_date', 'user_id', 'success_count', 'failed_count', 'last_login_at', 'updated_at'], grouped
+    ))
+    db.session.commit()
+    return len(stat_days)
+
+
+def _archive_table():
+    """
+    归档库中的登录日志表（与主表字段一致，不含外键）
+
+    主表 id 不是 AUTOINCREMENT，某次归档删空主表后 SQLite 会重新从 1 分配ID，
+    所以归档表以自己的 archive_id 为主键，原ID只作为普通（带索引的）字段保存，重复的ID不会冲突。
+    """
+    columns = [Column('archive_id', Integer, primary_key=True)]
+    columns += [Column(column.name, column.type, index=column.name == 'id')
+                for column in LoginLog.__table__.columns]
+    return Table(LoginLog.__tablename__, MetaData(schema=ARCHIVE_SCHEMA), *columns)
+
+
+def _upgrade_archive_table(connection, archive):
+    """旧版归档表以原ID为主键，改建为 archive_id 主键（保留已归档的数据）"""
+    columns = [row[1] for row in connection.exec_driver_sql(
+        f'PRAGMA {ARCHIVE_SCHEMA}.table_info({archive.name})'
+    ).all()]
+    if not columns or 'archive_id' in columns:
+        return
+
+    connection.exec_driver_sql(f'ALTER TABLE {ARCHIVE_SCHEMA}.{archive.name} RENAME TO {archive.name}_old')
+    archive.create(connection)
+    names = ', '.join(name for name in columns if name in archive.c)
+    connection.exec_driver_sql(
+        f'INSERT INTO {ARCHIVE_SCHEMA}.{archive.name} ({names}) '
+        f'SELECT {names} FROM {ARCHIVE_SCHEMA}.{archive.name}_old ORDER BY id'
+    )
+    connection.exec_driver_sql(f'DROP TABLE {ARCHIVE_SCHEMA}.{archive.name}_old')
+
+
+@contextmanager
+def attached_archive(archive_path=None):
+    """
+    打开一个连接并附加归档库，退出时分离
+
+    Args:
+        archive_path (str): 归档库文件路径，默认 LOGIN_LOG_ARCHIVE_PATH
+
+    Yields:
+        tuple: (数据库连接, 归档表)
+    """
+    archive_path = archive_path or current_app.config['LOGIN_LOG_ARCHIVE_PATH']
+    archive = _archive_table()
+    with db.engine.connect() as connection:
+        # ATTACH 不能在事务中执行
+        connection.exec_driver_sql(f'ATTACH DATABASE ? AS {ARCHIVE_SCHEMA}', (archive_path,))
+        try:
+            _upgrade_archive_table(connection, archive)
+            archive.create(connection, checkfirst=True)
+            connection.commit()
+            yield connection, archive
+        finally:
+            connection.rollback()
+            connection.exec_driver_sql(f'DETACH DATABASE {ARCHIVE_SCHEMA}')
+
+
+def archive_login_logs(before, archive_path=None, batch_size=ARCHIVE_BATCH_SIZE):
+    """
+    将早于指定时间的原始日志移入归档库
+
+    按ID分批，每批在一个事务中先复制到归档库再从主库删除；
+    已在归档库中的同一条日志（ID 和登录时间都相同，如中断后重新执行）不再复制，
+    ID 被重新分配的新日志照常复制，不会因ID重复被跳过后又从主库删除。
+
+    Args:
+        before (datetime): 归档该时间之前的日志
+        archive_path (str): 归档库文件路径
+        batch_size (int): 每批行数
+
+    Returns:
+        int: 归档的行数
+    """
+    columns = [column.name for column in LoginLog.__table__.columns]
+    main = LoginLog.__table__
+    archived = 0
+
+    with attached_archive(archive_path) as (connection, archive):
+        stored = archive.alias('stored')
+        already_archived = select(stored.c.id).where(
+            stored.c.id == main.c.id, stored.c.login_time == main.c.login_time
+        ).exists()
+        while True:
+            ids = connection.execute(
+                select(main.c.id).where(main.c.login_time < before).order_by(main.c.id).limit(batch_size)
+            ).scalars().all()
+            if not ids:
+                break
+
+            condition = (main.c.login_time < before) & (main.c.id <= ids[-1])
+            connection.execute(
+                insert(archive).from_select(
+                    columns, select(*[main.c[name] for name in columns]).where(condition, ~already_archived)
+                )
+            )
+            connection.execute(delete(main).where(condition))
+            connection.commit()
+            archived += len(ids)
+
+    return archived
+
+
+def maintain_login_logs(retention_days=None, archive_path=None, rebuild=False):
+    """
+    登录日志维护：重新计算已结束日期的汇总，然后归档超过保留天数的原始日志
+
+    Args:
+        retention_days (int): 主库保留天数，默认 LOGIN_LOG_RETENTION_DAYS
+        archive_path (str): 归档库文件路径
+        rebuild (bool): 是否连当天的汇总一起重新计算（首次启用汇总表时使用）
+
+    Returns:
+        tuple: (重新计算的天数, 归档的行数)
+    """
+    if retention_days is None:
+        retention_days = current_app.config.get('LOGIN_LOG_RETENTION_DAYS', 90)
+    today = date.today()
+
+    rolled = rollup_login_logs(today if rebuild else today - timedelta(days=1))
+    # 按整天归档，保证归档日期的汇总已经完整
+    cutoff = datetime.combine(today - timedelta(days=retention_days), time.min)
+    archived = archive_login_logs(cutoff, archive_path)
+    return rolled, archived
@@ -0,0 +1,165 @@
+"""
+登录日志异步写入
+登录请求只把日志放入进程内队列即返回，由后台线程按批（满 FLUSH_BATCH_SIZE 条或等待 FLUSH_INTERVAL 秒）
+以 executemany 一次插入，避免员工集中登录时每次登录都单独占用 SQLite 写锁并等待落盘。
+同一事务中累加登录每日汇总表（login_daily_stats）。
+
+进程退出时（gunicorn worker_exit 钩子 / atexit）会把队列中剩余的日志写完。
+LOGIN_LOG_ASYNC 为 False 时（如测试环境）直接同步写入。
+
+用法：
+    enqueue_login_log(phone='13800000000', user_id=1, login_result='success',
+                      ip_address=request.remote_addr, user_agent=request.headers.get('User-Agent', ''))
+"""
+import atexit
+import os
+import queue
+import threading
+import time
+import traceback
+from datetime import datetime
+
+from flask import current_app
+from sqlalchemy import insert
+
+from models import db, LoginLog
+from utils.db_retry import retry_on_busy
+from utils.login_log_retention import apply_login_stats
+
+# 每批最多写入的条数
+FLUSH_BATCH_SIZE = 100
+# 队列中最早一条日志最多等待的秒数
+FLUSH_INTERVAL = 2.0
+# 队列上限，超出时在当前线程同步写入
+MAX_QUEUE_SIZE = 10000
+
+_writer = None
+_writer_lock = threading.Lock()
+
+
+@retry_on_busy(session_factory=False)
+def _insert_login_logs(records):
+    with db.engine.begin() as connection:
+        connection.execute(insert(LoginLog.__table__), records)
+        apply_login_stats(connection, records)
+
+
+def write_login_logs(app, records):
+    """一次 executemany 插入一批日志（失败时只打印错误，不影响登录）"""
+    try:
+        with app.app_context():
+            _insert_login_logs(records)
+    except Exception as e:
+        print(f"记录登录日志失败（{len(records)} 条）: {e}")
+        traceback.print_exc()
+
+
+class LoginLogWriter:
+    """后台批量写入登录日志的线程"""
+
+    def __init__(self, app):
+        self.app = app
+        self.queue = queue.Queue(maxsize=MAX_QUEUE_SIZE)
+        self.pid = os.getpid()
+        self._stopping = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='login-log-writer', daemon=True)
+        self._thread.start()
+
+    def submit(self, record):
+        """放入队列（队列已满时同步写入）"""
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.write([record])
+
+    def _next_batch(self):
+        """等待并取出一批日志"""
+        try:
+            batch = [self.queue.get(timeout=FLUSH_INTERVAL)]
+        except queue.Empty:
+            return []
+
+        deadline = time.monotonic() + FLUSH_INTERVAL
+        while len(batch) < FLUSH_BATCH_SIZE and not self._stopping.is_set():
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self.queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while not self._stopping.is_set():
+            batch = self._next_batch()
+            if batch:
+                self.write(batch)
+
+    def drain(self):
+        """同步写入队列中剩余的全部日志"""
+        while True:
+            batch = []
+            try:
+                while len(batch) < FLUSH_BATCH_SIZE:
+                    batch.append(self.queue.get_nowait())
+            except queue.Empty:
+                pass
+            if not batch:
+                return
+            self.write(batch)
+
+    def write(self, records):
+        write_login_logs(self.app, records)
+
+    def shutdown(self, timeout=5):
+        """停止后台线程并写完剩余日志"""
+        self._stopping.set()
+        self._thread.join(timeout)
+        self.drain()
+
+
+def _get_writer():
+    """本进程的写入线程（gunicorn fork 出的 worker 各自创建）"""
+    global _writer
+    app = current_app._get_current_object()
+    with _writer_lock:
+        if _writer is None or _writer.pid != os.getpid():
+            _writer = LoginLogWriter(app)
+        return _writer
+
+
+def enqueue_login_log(phone, user_id=None, login_result='success', ip_address=None, user_agent=None):
+    """
+    记录一条登录日志（异步批量写入）
+
+    Args:
+        phone (str): 登录手机号
+        user_id (int): 用户ID
+        login_result (str): success/failed
+        ip_address (str): IP地址
+        user_agent (str): 用户代理
+    """
+    record = {
+        'user_id': user_id,
+        'phone': phone,
+        'login_time': datetime.utcnow(),
+        'ip_address': ip_address,
+        'user_agent': (user_agent or '')[:500],
+        'login_result': login_result,
+    }
+    if not current_app.config.get('LOGIN_LOG_ASYNC', True):
+        write_login_logs(current_app._get_current_object(), [record])
+        return
+    _get_writer().submit(record)
+
+
+def shutdown_login_log_writer():
+    """写完本进程队列中的日志（进程退出时调用）"""
+    with _writer_lock:
+        writer = _writer
+    if writer is not None and writer.pid == os.getpid():
+        writer.shutdown()
+
+
+atexit.register(shutdown_login_log_writer)
@@ -0,0 +1,367 @@
+"""
+运行指标（Prometheus 文本格式，/metrics）
+
+- crm_http_requests_total{endpoint, method, status}：各端点请求数；
+- crm_http_request_duration_seconds{endpoint}：各端点请求耗时直方图；
+- crm_db_query_duration_seconds{endpoint}：各端点单条 SQL 耗时直方图；
+- crm_http_requests_in_flight{pid}、crm_process_resident_memory_bytes{pid}：各 worker 正在处理的请求数和常驻内存。
+
+gunicorn 多个 worker 各自计数，/metrics 由任意一个 worker 响应，因此需要跨进程汇总：
+- 计数器和直方图保存在进程内，请求结束后最多每 SNAPSHOT_INTERVAL 秒写一次快照文件
+  （METRICS_DIR/worker_<pid>.json，先写临时文件再原子替换）；
+- 正在处理的请求数和内存写入 mmap 映射的状态文件（worker_<pid>.state），每次请求只是一次内存写入；
+- worker 退出时 gunicorn 主进程把它的计数并入 dead.json 并删除状态文件（child_exit 钩子），
+  重启 worker（max_requests）不会让累计计数回退；主进程启动时清空目录（on_starting 钩子）；
+- 没有 gunicorn 钩子时（python run.py run、开发服务器重载），汇总时发现进程已不存在的快照同样并入 dead.json；
+  新进程复用了旧进程号时先并入旧快照再开始计数。
+
+用法：
+    init_metrics(app)          # 在应用工厂中调用
+    render_metrics()           # /metrics 视图返回的文本
+"""
+import fcntl
+import glob
+import json
+import mmap
+import os
+import resource
+import struct
+import threading
+import time
+
+from flask import g, has_request_context, request, request_started
+from sqlalchemy import event
+
+from models import db
+
+# 快照文件最短写入间隔（秒）
+SNAPSHOT_INTERVAL = 1.0
+
+REQUEST_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+QUERY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 5.0)
+
+# 指标名称 -> (类型, 说明, 直方图分桶)
+METRICS = {
+    'crm_http_requests_total': ('counter', '请求数', None),
+    'crm_http_request_duration_seconds': ('histogram', '请求耗时（秒）', REQUEST_BUCKETS),
+    'crm_db_query_duration_seconds': ('histogram', '单条SQL耗时（秒）', QUERY_BUCKETS),
+    'crm_http_requests_in_flight': ('gauge', '正在处理的请求数', None),
+    'crm_process_resident_memory_bytes': ('gauge', 'worker 常驻内存（字节）', None),
+}
+
+# 状态文件布局：正在处理的请求数、常驻内存字节数、更新时间
+_STATE_FORMAT = '<qqd'
+_STATE_SIZE = struct.calcsize(_STATE_FORMAT)
+
+DEAD_FILE = 'dead.json'
+
+_registry = None
+_registry_lock = threading.Lock()
+_metrics_dir = None
+
+
+class _Registry:
+    """本进程的指标（fork 出的 worker 各自创建）"""
+
+    def __init__(self, metrics_dir):
+        self.pid = os.getpid()
+        self.lock = threading.Lock()
+        self.counters = {}    # {(名称, 标签): 数值}
+        self.histograms = {}  # {(名称, 标签): [各分桶计数..., 总和, 总数]}
+        self.in_flight = 0
+        self.last_snapshot = 0.0
+        self.snapshot_path = os.path.join(metrics_dir, f'worker_{self.pid}.json')
+        os.makedirs(metrics_dir, exist_ok=True)
+        # 同一进程号的旧快照属于已退出的进程，覆盖前先并入 dead.json
+        if os.path.exists(self.snapshot_path):
+            mark_process_dead(self.pid, metrics_dir)
+        state_path = os.path.join(metrics_dir, f'worker_{self.pid}.state')
+        with open(state_path, 'wb') as f:
+            f.write(b'\0' * _STATE_SIZE)
+        with open(state_path, 'r+b') as f:
+            self.state = mmap.mmap(f.fileno(), _STATE_SIZE)
+
+    def inc(self, name, labels, value=1):
+        key = (name, labels)
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def observe(self, name, labels, value):
+        buckets = METRICS[name][2]
+        key = (name, labels)
+        with self.lock:
+            row = self.histograms.get(key)
+            if row is None:
+                row = self.histograms[key] = [0] * (len(buckets) + 2)
+            for i, bound in enumerate(buckets):
+                if value <= bound:
+                    row[i] += 1
+                    break
+            row[-2] += value
+            row[-1] += 1
+
+    def set_state(self, in_flight_delta):
+        with self.lock:
+            self.in_flight += in_flight_delta
+            self.state[:_STATE_SIZE] = struct.pack(_STATE_FORMAT, self.in_flight, _rss_bytes(), time.time())
+
+    def snapshot(self, force=False):
+        """写入快照文件（距上次写入不足 SNAPSHOT_INTERVAL 秒时跳过）"""
+        now = time.monotonic()
+        if not force and now - self.last_snapshot < SNAPSHOT_INTERVAL:
+            return
+        with self.lock:
+            data = {
+                'counters': [[name, list(labels), value] for (name, labels), value in self.counters.items()],
+                'histograms': [[name, list(labels), row] for (name, labels), row in self.histograms.items()],
+            }
+            self.last_snapshot = now
+        temp_path = f'{self.snapshot_path}.tmp'
+        with open(temp_path, 'w') as f:
+            json.dump(data, f)
+        os.replace(temp_path, self.snapshot_path)
+
+
+def _rss_bytes():
+    """当前常驻内存（Linux 读 /proc，其他系统退回为峰值内存）"""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def _get_registry():
+    global _registry
+    with _registry_lock:
+        if _registry is None or _registry.pid != os.getpid():
+            _registry = _Registry(_metrics_dir)
+        return _registry
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _load_json(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _key(name, labels):
+    """快照中的 [名称, [[标签名, 值], ...]] 转为字典键"""
+    return name, tuple(tuple(pair) for pair in labels)
+
+
+def _merge(totals, data):
+    """把一个快照累加到汇总结果"""
+    counters, histograms = totals
+    for name, labels, value in data.get('counters', []):
+        key = _key(name, labels)
+        counters[key] = counters.get(key, 0) + value
+    for name, labels, row in data.get('histograms', []):
+        key = _key(name, labels)
+        if key in histograms:
+            histograms[key] = [a + b for a, b in zip(histograms[key], row)]
+        else:
+            histograms[key] = list(row)
+
+
+def mark_process_dead(pid, metrics_dir=None):
+    """
+    把已退出 worker 的计数并入 dead.json 并删除它的文件（gunicorn child_exit 钩子中调用）
+
+    Args:
+        pid (int): worker 进程号
+        metrics_dir (str): 指标目录
+    """
+    metrics_dir = metrics_dir or _metrics_dir
+    if not metrics_dir or not os.path.isdir(metrics_dir):
+        return
+    snapshot_path = os.path.join(metrics_dir, f'worker_{pid}.json')
+    dead_path = os.path.join(metrics_dir, DEAD_FILE)
+
+    with open(os.path.join(metrics_dir, '.lock'), 'w') as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        data = _load_json(snapshot_path)
+        if data:
+            totals = ({}, {})
+            _merge(totals, _load_json(dead_path) or {})
+            _merge(totals, data)
+            temp_path = f'{dead_path}.tmp'
+            with open(temp_path, 'w') as f:
+                json.dump({
+                    'counters': [[name, list(labels), value] for (name, labels), value in totals[0].items()],
+                    'histograms': [[name, list(labels), row] for (name, labels), row in totals[1].items()],
+                }, f)
+            os.replace(temp_path, dead_path)
+        for suffix in ('.json', '.state'):
+            try:
+                os.remove(os.path.join(metrics_dir, f'worker_{pid}{suffix}'))
+            except FileNotFoundError:
+                pass
+
+
+def clear_metrics_dir(metrics_dir):
+    """清空指标目录（gunicorn 主进程启动时调用）"""
+    for path in glob.glob(os.path.join(metrics_dir, '*')):
+        if os.path.isfile(path):
+            os.remove(path)
+
+
+def flush_metrics():
+    """立即写入本进程的快照（worker 退出时调用）"""
+    if _registry is not None and _registry.pid == os.getpid():
+        _registry.snapshot(force=True)
+
+
+def _worker_pid(path):
+    name = os.path.basename(path)
+    return int(name[len('worker_'):name.index('.')])
+
+
+def _collect():
+    """汇总所有 worker 的指标"""
+    for path in glob.glob(os.path.join(_metrics_dir, 'worker_*.json')):
+        pid = _worker_pid(path)
+        if not _pid_alive(pid):
+            mark_process_dead(pid, _metrics_dir)
+
+    totals = ({}, {})
+    with open(os.path.join(_metrics_dir, '.lock'), 'w') as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_SH)
+        _merge(totals, _load_json(os.path.join(_metrics_dir, DEAD_FILE)) or {})
+        for path in glob.glob(os.path.join(_metrics_dir, 'worker_*.json')):
+            _merge(totals, _load_json(path) or {})
+
+    gauges = {}
+    for path in glob.glob(os.path.join(_metrics_dir, 'worker_*.state')):
+        pid = _worker_pid(path)
+        if not _pid_alive(pid):
+            continue
+        try:
+            with open(path, 'rb') as f:
+                in_flight, rss, _ = struct.unpack(_STATE_FORMAT, f.read(_STATE_SIZE))
+        except (OSError, struct.error):
+            continue
+        gauges[('crm_http_requests_in_flight', (('pid', str(pid)),))] = in_flight
+        gauges[('crm_process_resident_memory_bytes', (('pid', str(pid)),))] = rss
+    return totals[0], totals[1], gauges
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _label_text(labels, extra=None):
+    pairs = list(labels) + (extra or [])
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{key}="{_escape(value)}"' for key, value in pairs) + '}'
+
+
+def _number(value):
+    if isinstance(value, float):
+        return repr(value)
+    return str(value)
+
+
+def render_metrics():
+    """
+    生成 Prometheus 文本格式的指标
+
+    Returns:
+        str: 指标文本
+    """
+    registry = _get_registry()
+    registry.set_state(0)
+    registry.snapshot(force=True)
+    counters, histograms, gauges = _collect()
+
+    lines = []
+    for name, (kind, help_text, buckets) in METRICS.items():
+        lines.append(f'# HELP {name} {help_text}')
+        lines.append(f'# TYPE {name} {kind}')
+        if kind == 'histogram':
+            for (metric, labels), row in sorted(histograms.items()):
+                if metric != name:
+                    continue
+                cumulative = 0
+                for bound, count in zip(buckets, row):
+                    cumulative += count
+                    lines.append(f'{name}_bucket{_label_text(labels, [("le", bound)])} {cumulative}')
+                lines.append(f'{name}_bucket{_label_text(labels, [("le", "+Inf")])} {row[-1]}')
+                lines.append(f'{name}_sum{_label_text(labels)} {_number(row[-2])}')
+                lines.append(f'{name}_count{_label_text(labels)} {row[-1]}')
+        else:
+            values = counters if kind == 'counter' else gauges
+            for (metric, labels), value in sorted(values.items()):
+                if metric == name:
+                    lines.append(f'{name}{_label_text(labels)} {_number(value)}')
+    return '\n'.join(lines) + '\n'
+
+
+def _endpoint():
+    return request.endpoint or '<unmatched>'
+
+
+def init_metrics(app):
+    """注册请求钩子和数据库事件（在应用工厂中调用）"""
+    global _metrics_dir
+    if not app.config.get('METRICS_ENABLED', False):
+        return
+    _metrics_dir = app.config['METRICS_DIR']
+    os.makedirs(_metrics_dir, exist_ok=True)
+
+    def start_request(sender, **extra):
+        g._metrics_started_at = time.perf_counter()
+        _get_registry().set_state(1)
+    request_started.connect(start_request, app, weak=False)
+
+    @app.after_request
+    def record_request(response):
+        started_at = g.get('_metrics_started_at')
+        if started_at is not None:
+            registry = _get_registry()
+            endpoint = _endpoint()
+            registry.inc('crm_http_requests_total', (
+                ('endpoint', endpoint), ('method', request.method), ('status', str(response.status_code))
+            ))
+            registry.observe('crm_http_request_duration_seconds', (('endpoint', endpoint),),
+                             time.perf_counter() - started_at)
+        return response
+
+    @app.teardown_request
+    def finish_request(exc):
+        if g.pop('_metrics_started_at', None) is None:
+            return
+        registry = _get_registry()
+        registry.set_state(-1)
+        registry.snapshot()
+
+    with app.app_context():
+        engine = db.engine
+
+    @event.listens_for(engine, 'before_cursor_execute')
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        # 与 sql_stats 相同，开始时间记在本条语句的执行上下文上，不放在连接池连接共用的 conn.info 中
+        if context is not None and has_request_context() and '_metrics_started_at' in g:
+            context._crm_metrics_query_start = time.perf_counter()
+
+    @event.listens_for(engine, 'after_cursor_execute')
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        started = getattr(context, '_crm_metrics_query_start', None)
+        if started is None:
+            return
+        duration = time.perf_counter() - started
+        if has_request_context():
+            _get_registry().observe('crm_db_query_duration_seconds', (('endpoint', _endpoint()),), duration)
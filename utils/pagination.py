@@ -0,0 +1,284 @@
+"""
+列表分页工具
+支持两种分页方式：
+- 页码分页：沿用 Flask-SQLAlchemy 的 paginate()，用于跳转到指定页；
+- 键集（游标）分页：按排序键定位下一页/上一页，深层翻页不再需要 OFFSET 扫描。
+
+两种方式返回的分页对象都带有 next_cursor / prev_cursor，模板中的“上一页/下一页”链接
+携带游标即可进入键集分页；总数通过短期缓存获取，翻页时不必每次执行 COUNT(*)。
+"""
+import base64
+import json
+import math
+import threading
+import time
+from collections import OrderedDict
+from datetime import date, datetime
+from decimal import Decimal
+
+from sqlalchemy import and_, false, or_
+
+# 总数缓存：{查询语句及参数: (过期时间, 总数)}
+COUNT_CACHE_TTL = 60
+COUNT_CACHE_MAX_ENTRIES = 256
+_count_cache = OrderedDict()
+_count_cache_lock = threading.Lock()
+
+
+def cached_count(query, ttl=COUNT_CACHE_TTL):
+    """
+    获取查询结果总数（短期缓存）
+
+    Args:
+        query: SQLAlchemy 查询对象
+        ttl (int): 缓存秒数，为0时不使用缓存
+
+    Returns:
+        int: 总数
+    """
+    count_query = query.order_by(None)
+    if not ttl:
+        return count_query.count()
+
+    compiled = count_query.statement.compile()
+    cache_key = (str(compiled), repr(sorted(compiled.params.items())))
+    now = time.monotonic()
+
+    with _count_cache_lock:
+        cached = _count_cache.get(cache_key)
+        if cached and cached[0] > now:
+            return cached[1]
+
+    total = count_query.count()
+
+    with _count_cache_lock:
+        _count_cache[cache_key] = (now + ttl, total)
+        _count_cache.move_to_end(cache_key)
+        while len(_count_cache) > COUNT_CACHE_MAX_ENTRIES:
+            _count_cache.popitem(last=False)
+
+    return total
+
+
+def _encode_value(value):
+    if isinstance(value, datetime):
+        return {'dt': value.isoformat()}
+    if isinstance(value, date):
+        return {'d': value.isoformat()}
+    if isinstance(value, Decimal):
+        return {'n': str(value)}
+    return value
+
+
+def _decode_value(value):
+    if isinstance(value, dict):
+        if 'dt' in value:
+            return datetime.fromisoformat(value['dt'])
+        if 'd' in value:
+            return date.fromisoformat(value['d'])
+        if 'n' in value:
+            return Decimal(value['n'])
+    return value
+
+
+# 游标中允许的排序键值类型（解码后），其他类型（嵌套列表、对象等）视为无效游标
+CURSOR_VALUE_TYPES = (str, int, float, Decimal, date, type(None))
+
+
+def encode_cursor(direction, page, values):
+    """生成不透明的游标字符串"""
+    payload = json.dumps([direction, page, [_encode_value(v) for v in values]], separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """
+    解析游标
+
+    Returns:
+        tuple: (方向 'next'/'prev', 页码, 排序键值列表)，游标无效时返回 None
+    """
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        direction, page, values = json.loads(base64.urlsafe_b64decode(padded.encode()).decode())
+        if direction not in ('next', 'prev') or not isinstance(values, list):
+            return None
+        values = [_decode_value(v) for v in values]
+        if not all(isinstance(v, CURSOR_VALUE_TYPES) for v in values):
+            return None
+        return direction, max(int(page), 1), values
+    except (ValueError, TypeError):
+        return None
+
+
+def _after(order_by, values, reverse=False):
+    """
+    构造“排在 values 之后”的条件
+
+    SQLite 默认升序时 NULL 在前、降序时 NULL 在后，这里按同样规则处理可为空的排序字段。
+    """
+    conditions = []
+    for index, (column, descending) in enumerate(order_by):
+        descending = descending != reverse
+        value = values[index]
+
+        if value is None:
+            strictly_after = false() if descending else column.isnot(None)
+            equal = column.is_(None)
+        else:
+            strictly_after = or_(column < value, column.is_(None)) if descending else column > value
+            equal = column == value
+
+        conditions.append((strictly_after, equal))
+
+    condition = conditions[-1][0]
+    for strictly_after, equal in reversed(conditions[:-1]):
+        condition = or_(strictly_after, and_(equal, condition))
+    return condition
+
+
+def _order_clauses(order_by, reverse=False):
+    return [column.desc() if descending != reverse else column.asc() for column, descending in order_by]
+
+
+def _default_key(order_by):
+    def key(item):
+        return tuple(getattr(item, column.key) for column, _ in order_by)
+    return key
+
+
+def iter_keyset_batches(query, order_by, batch_size, key=None):
+    """
+    按排序键分批读取查询结果（用于导出）
+
+    每批是一次独立的“排在上一批最后一行之后”的 LIMIT 查询，批与批之间不占用读事务，
+    客户端下载较慢时也不会长时间阻塞 WAL 检查点。
+
+    Args:
+        query: SQLAlchemy 查询对象（原有排序会被替换）
+        order_by (list): 排序键 [(字段, 是否降序)]，最后一项必须唯一（通常为主键）
+        batch_size (int): 每批行数
+        key (callable): 从结果行取排序键值的函数，默认按字段名读取
+
+    Yields:
+        list: 一批结果行
+    """
+    key = key or _default_key(order_by)
+    last = None
+    while True:
+        batch_query = query.order_by(None)
+        if last is not None:
+            batch_query = batch_query.filter(_after(order_by, last))
+        rows = batch_query.order_by(*_order_clauses(order_by)).limit(batch_size).all()
+        if not rows:
+            break
+        yield rows
+        if len(rows) < batch_size:
+            break
+        last = key(rows[-1])
+
+
+class KeysetPagination:
+    """键集分页结果（属性与 Flask-SQLAlchemy Pagination 保持一致，模板可直接复用）"""
+
+    is_keyset = True
+
+    def __init__(self, items, page, per_page, total, has_prev, has_next, prev_cursor, next_cursor):
+        self.items = items
+        self.page = page
+        self.per_page = per_page
+        self.total = total
+        self.has_prev = has_prev
+        self.has_next = has_next
+        self.prev_cursor = prev_cursor
+        self.next_cursor = next_cursor
+
+    @property
+    def pages(self):
+        if not self.total or not self.per_page:
+            return self.page + (1 if self.has_next else 0)
+        return max(math.ceil(self.total / self.per_page), self.page)
+
+    @property
+    def prev_num(self):
+        return self.page - 1 if self.has_prev else None
+
+    @property
+    def next_num(self):
+        return self.page + 1 if self.has_next else None
+
+    def iter_pages(self, left_edge=2, left_current=2, right_current=4, right_edge=2):
+        last = 0
+        for num in range(1, self.pages + 1):
+            if (num <= left_edge
+                    or self.page - left_current <= num <= self.page + right_current
+                    or num > self.pages - right_edge):
+                if last + 1 != num:
+                    yield None
+                yield num
+                last = num
+
+
+def paginate_query(query, order_by, page=1, per_page=20, cursor=None, key=None, count_ttl=COUNT_CACHE_TTL):
+    """
+    分页查询：有游标时使用键集分页，否则使用页码分页
+
+    Args:
+        query: 未排序的 SQLAlchemy 查询对象
+        order_by (list): 排序键 [(字段, 是否降序)]，最后一项必须唯一（通常为主键）
+        page (int): 页码（页码分页时使用）
+        per_page (int): 每页条数
+        cursor (str): 上一页/下一页链接携带的游标
+        key (callable): 从结果对象取排序键值的函数，默认按字段名读取结果对象的属性
+        count_ttl (int): 总数缓存秒数
+
+    Returns:
+        分页对象，带有 items/page/pages/total/has_prev/has_next/prev_cursor/next_cursor 等属性
+    """
+    key = key or _default_key(order_by)
+    decoded = decode_cursor(cursor) if cursor else None
+    if decoded is not None and len(decoded[2]) != len(order_by):
+        decoded = None
+
+    if decoded is not None:
+        direction, cursor_page, values = decoded
+        reverse = direction == 'prev'
+        rows = query.filter(_after(order_by, values, reverse=reverse)).order_by(
+            *_order_clauses(order_by, reverse=reverse)
+        ).limit(per_page + 1).all()
+
+        has_more = len(rows) > per_page
+        items = rows[:per_page]
+        if reverse:
+            items.reverse()
+            # 向前翻到头时即为第一页
+            page = cursor_page if has_more else 1
+            has_prev, has_next = has_more, True
+        else:
+            page = cursor_page
+            has_prev, has_next = page > 1, has_more
+
+        # 游标对应的数据已不存在（如被删除）时退回页码分页
+        if items:
+            return KeysetPagination(
+                items=items,
+                page=page,
+                per_page=per_page,
+                total=cached_count(query, count_ttl),
+                has_prev=has_prev,
+                has_next=has_next,
+                prev_cursor=encode_cursor('prev', page - 1, key(items[0])) if has_prev else None,
+                next_cursor=encode_cursor('next', page + 1, key(items[-1])) if has_next else None
+            )
+
+    pagination = query.order_by(*_order_clauses(order_by)).paginate(
+        page=page, per_page=per_page, error_out=False, count=False
+    )
+    pagination.total = cached_count(query, count_ttl)
+    pagination.is_keyset = False
+    items = pagination.items
+    pagination.prev_cursor = encode_cursor('prev', pagination.page - 1, key(items[0])) \
+        if items and pagination.page > 1 else None
+    pagination.next_cursor = encode_cursor('next', pagination.page + 1, key(items[-1])) \
+        if items and pagination.page * per_page < pagination.total else None
+    return pagination
@@ -0,0 +1,84 @@
+"""
+付款序号查询工具
+批量获取多个线索的第 N 笔付款日期（首笔、次笔等），避免列表页逐条查询付款记录
+
+SQLite 3.25+ 使用 ROW_NUMBER() 窗口函数在数据库中取第 N 笔；
+更早的版本退回为一次查出相关付款记录后在 Python 中计数。
+同一天有多笔付款时按付款记录ID排序。
+"""
+from sqlalchemy import func, select
+
+from models import db, Payment
+
+# 单条 SQL 中 IN 列表的最大长度（旧版 SQLite 变量上限为 999）
+BATCH_SIZE = 500
+
+
+def window_functions_supported():
+    """当前数据库是否支持窗口函数"""
+    dialect = db.engine.dialect
+    if dialect.name != 'sqlite':
+        return True
+    return (dialect.server_version_info or (0,)) >= (3, 25, 0)
+
+
+def _nth_with_window(lead_ids, n):
+    ordinal = func.row_number().over(
+        partition_by=Payment.lead_id,
+        order_by=(Payment.payment_date, Payment.id)
+    ).label('ordinal')
+    ranked = select(Payment.lead_id, Payment.payment_date, ordinal).where(
+        Payment.lead_id.in_(lead_ids)
+    ).subquery()
+    rows = db.session.execute(
+        select(ranked.c.lead_id, ranked.c.payment_date).where(ranked.c.ordinal == n)
+    ).all()
+    return dict(rows)
+
+
+def _nth_in_python(lead_ids, n):
+    rows = db.session.execute(
+        select(Payment.lead_id, Payment.payment_date).where(
+            Payment.lead_id.in_(lead_ids)
+        ).order_by(Payment.lead_id, Payment.payment_date, Payment.id)
+    ).all()
+
+    result = {}
+    counts = {}
+    for lead_id, payment_date in rows:
+        counts[lead_id] = counts.get(lead_id, 0) + 1
+        if counts[lead_id] == n:
+            result[lead_id] = payment_date
+    return result
+
+
+def nth_payment_dates(lead_ids, n):
+    """
+    批量获取线索的第 N 笔付款日期
+
+    Args:
+        lead_ids (iterable): 线索ID
+        n (int): 付款序号，从1开始（1为首笔，2为次笔）
+
+    Returns:
+        dict: {线索ID: 付款日期}，付款不足 N 笔的线索不包含在结果中
+    """
+    lead_ids = sorted({lead_id for lead_id in lead_ids if lead_id is not None})
+    if not lead_ids or n < 1:
+        return {}
+
+    lookup = _nth_with_window if window_functions_supported() else _nth_in_python
+    result = {}
+    for start in range(0, len(lead_ids), BATCH_SIZE):
+        result.update(lookup(lead_ids[start:start + BATCH_SIZE], n))
+    return result
+
+
+def first_payment_dates(lead_ids):
+    """批量获取首笔付款日期"""
+    return nth_payment_dates(lead_ids, 1)
+
+
+def second_payment_dates(lead_ids):
+    """批量获取次笔付款日期"""
+    return nth_payment_dates(lead_ids, 2)
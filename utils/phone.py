@@ -0,0 +1,89 @@
+"""
+手机号规范化工具
+从自由填写的 contact_info 中提取纯数字手机号，写入 leads.contact_phone 用于索引查重
+"""
+import re
+
+_NON_DIGIT = re.compile(r'\D')
+_SEPARATORS = re.compile(r'[\s\-()（）+]+')
+_MOBILE = re.compile(r'1[3-9]\d{9}')
+
+# 联系方式中没有号码时 contact_phone 的取值，与尚未回填的 NULL 区分，回填只需处理一次
+NO_PHONE = ''
+
+
+def normalize_phone(value):
+    """
+    提取规范化手机号（仅数字）
+
+    去除空格、横线、括号和 +86 等分隔符后取第一个11位手机号；
+    没有手机号时退回为第一段联系方式中的数字（如座机号）。
+
+    Args:
+        value (str): 联系方式原文，如 "+86 138-0013-8000 妈妈"
+
+    Returns:
+        str: 纯数字手机号，无法提取时返回 None
+    """
+    if not value:
+        return None
+
+    mobile = _MOBILE.search(_SEPARATORS.sub('', value))
+    if mobile:
+        return mobile.group(0)
+
+    parts = value.split()
+    digits = _NON_DIGIT.sub('', parts[0] if parts else value)
+    return digits or None
+
+
+def contact_phone_value(value):
+    """
+    contact_phone 字段的值
+
+    Args:
+        value (str): 联系方式原文
+
+    Returns:
+        str: 规范化手机号；联系方式中没有号码时为 NO_PHONE，联系方式为空时为 None
+    """
+    if value is None:
+        return None
+    return normalize_phone(value) or NO_PHONE
+
+
+def backfill_contact_phone(batch_size=1000):
+    """
+    分批回填 leads.contact_phone（只处理尚未回填的记录，没有号码的记录写入 NO_PHONE，不会被重复处理）
+
+    Args:
+        batch_size (int): 每批处理的线索数，每批单独提交，避免长时间占用写锁
+
+    Returns:
+        int: 回填的线索数
+    """
+    from sqlalchemy import text
+    from models import db
+
+    last_id = 0
+    updated = 0
+    while True:
+        rows = db.session.execute(text("""
+            SELECT id, contact_info FROM leads
+            WHERE id > :last_id AND contact_phone IS NULL AND contact_info IS NOT NULL
+            ORDER BY id LIMIT :batch_size
+        """), {'last_id': last_id, 'batch_size': batch_size}).all()
+        if not rows:
+            break
+
+        params = [
+            {'id': lead_id, 'phone': contact_phone_value(contact_info)}
+            for lead_id, contact_info in rows
+        ]
+        db.session.execute(text("UPDATE leads SET contact_phone = :phone WHERE id = :id"), params)
+        db.session.commit()
+
+        updated += len(params)
+        last_id = rows[-1][0]
+
+    return updated
@@ -0,0 +1,215 @@
+"""
+付款对账查询工具
+在数据库中完成对账页面的月份筛选、已付款/剩余付款/时间段付款计算，
+只返回当前页的客户，并在同一次查询中用窗口函数得到全部筛选结果的合计。
+
+用法：
+    result = query_reconciliation(teacher_user_id=3, start_month=date(2024, 1, 1), page=2)
+    result.items   # 当前页的行数据（dict）
+    result.totals  # ReconciliationTotals
+"""
+import math
+from dataclasses import dataclass, field
+
+from sqlalchemy import case, func, literal, or_, select
+
+from models import db, Customer, CustomerPayment, Lead, User
+from utils.date_filters import month_range
+from utils.payment_ordinals import window_functions_supported
+
+RECONCILIATION_PER_PAGE = 50
+
+# 三笔付款的 (金额字段, 日期字段)
+INSTALLMENTS = (
+    (CustomerPayment.first_payment, CustomerPayment.first_payment_date),
+    (CustomerPayment.second_payment, CustomerPayment.second_payment_date),
+    (CustomerPayment.third_payment, CustomerPayment.third_payment_date),
+)
+
+
+@dataclass
+class ReconciliationTotals:
+    """对账合计（全部筛选结果，不限于当前页）"""
+    customer_count: int = 0
+    total_amount: float = 0.0
+    total_paid: float = 0.0
+    period_paid: float = 0.0
+
+
+@dataclass
+class ReconciliationResult:
+    """对账查询结果（分页属性与 Flask-SQLAlchemy Pagination 一致）"""
+    items: list
+    page: int
+    per_page: int
+    totals: ReconciliationTotals = field(default_factory=ReconciliationTotals)
+
+    @property
+    def total(self):
+        return self.totals.customer_count
+
+    @property
+    def pages(self):
+        return max(math.ceil(self.total / self.per_page), 1) if self.per_page else 1
+
+    @property
+    def has_prev(self):
+        return self.page > 1
+
+    @property
+    def has_next(self):
+        return self.page < self.pages
+
+    @property
+    def prev_num(self):
+        return self.page - 1 if self.has_prev else None
+
+    @property
+    def next_num(self):
+        return self.page + 1 if self.has_next else None
+
+
+def _amount(column):
+    return func.coalesce(column, 0)
+
+
+def _payment_expressions(start_month, end_month, remaining_from_customer):
+    """已付款、剩余付款、时间段付款及是否命中月份筛选的SQL表达式"""
+    total_amount = _amount(CustomerPayment.total_amount)
+    total_paid = sum((_amount(amount) for amount, _ in INSTALLMENTS), literal(0))
+
+    # 与 CustomerPayment.get_remaining() 一致：未设置总金额时剩余为0
+    remaining = case((total_amount != 0, total_amount - total_paid), else_=0)
+    if remaining_from_customer:
+        # 尚未建立付款记录的客户，剩余付款为客户合同金额
+        remaining = case(
+            (CustomerPayment.id.is_(None), _amount(Customer.payment_amount)),
+            else_=remaining
+        )
+
+    in_period = [month_range(payment_date, start_month, end_month) for _, payment_date in INSTALLMENTS]
+    if in_period[0] is None:
+        return total_amount, total_paid, remaining, literal(0), None
+
+    period_paid = sum(
+        (case((condition, _amount(amount)), else_=0) for (amount, _), condition in zip(INSTALLMENTS, in_period)),
+        literal(0)
+    )
+    return total_amount, total_paid, remaining, period_paid, or_(*in_period)
+
+
+def _month_str(value):
+    return value.strftime('%Y-%m') if value else ''
+
+
+def _build_row(customer, payment, lead, teacher_user, total_amount, total_paid, remaining, period_paid):
+    service_types = lead.get_service_types_list() if lead else []
+    return {
+        'customer_id': customer.id,
+        'payment_id': payment.id if payment else None,
+        'student_name': lead.student_name if lead else '',
+        'parent_wechat_name': lead.parent_wechat_display_name if lead else '',
+        'has_tutoring': '是' if 'tutoring' in service_types else '否',
+        'has_competition': '是' if 'competition' in service_types else '否',
+        'award_level': customer.competition_award_level or '无',
+        'total_amount': float(total_amount or 0),
+        'first_payment': float(payment.first_payment) if payment and payment.first_payment else 0,
+        'first_payment_date': _month_str(payment.first_payment_date) if payment else '',
+        'second_payment': float(payment.second_payment) if payment and payment.second_payment else 0,
+        'second_payment_date': _month_str(payment.second_payment_date) if payment else '',
+        'third_payment': float(payment.third_payment) if payment and payment.third_payment else 0,
+        'third_payment_date': _month_str(payment.third_payment_date) if payment else '',
+        'total_paid': float(total_paid or 0),
+        'remaining': float(remaining or 0),
+        'period_paid': float(period_paid or 0),
+        'teacher_user_name': teacher_user.username if teacher_user else '未分配'
+    }
+
+
+def query_reconciliation(teacher_user_id=None, start_month=None, end_month=None,
+                         page=1, per_page=RECONCILIATION_PER_PAGE, remaining_from_customer=True):
+    """
+    查询对账数据（当前页 + 全部筛选结果合计）
+
+    指定月份时只返回至少有一笔付款落在该月份范围内的客户，
+    period_paid 为落在范围内的付款金额之和。
+
+    Args:
+        teacher_user_id (int): 责任班主任ID，为None时不限
+        start_month (date): 开始月份，为None时不限
+        end_month (date): 结束月份（包含整月），为None时不限
+        page (int): 页码
+        per_page (int): 每页客户数
+        remaining_from_customer (bool): 没有付款记录的客户，剩余付款是否取客户合同金额（否则为0）
+
+    Returns:
+        ReconciliationResult: 查询结果
+    """
+    page = max(page or 1, 1)
+    total_amount, total_paid, remaining, period_paid, in_period = _payment_expressions(
+        start_month, end_month, remaining_from_customer
+    )
+    values = (
+        total_amount.label('total_amount'),
+        total_paid.label('total_paid'),
+        remaining.label('remaining'),
+        period_paid.label('period_paid'),
+    )
+
+    filters = []
+    if teacher_user_id:
+        filters.append(Customer.teacher_user_id == teacher_user_id)
+    if in_period is not None:
+        filters.append(in_period)
+
+    def with_joins(stmt):
+        return stmt.select_from(Customer).join(
+            Lead, Customer.lead_id == Lead.id
+        ).outerjoin(
+            CustomerPayment, Customer.id == CustomerPayment.customer_id
+        ).outerjoin(
+            User, Customer.teacher_user_id == User.id
+        ).where(*filters)
+
+    use_window = window_functions_supported()
+    columns = [Customer, CustomerPayment, Lead, User, *values]
+    if use_window:
+        # 窗口函数在 LIMIT 之前计算，每行都带有全部筛选结果的合计
+        columns += [
+            func.count().over().label('customer_count'),
+            func.sum(total_amount).over().label('sum_total_amount'),
+            func.sum(total_paid).over().label('sum_total_paid'),
+            func.sum(period_paid).over().label('sum_period_paid'),
+        ]
+
+    rows = db.session.execute(
+        with_joins(select(*columns)).order_by(Customer.id).limit(per_page).offset((page - 1) * per_page)
+    ).all()
+
+    if rows and use_window:
+        first = rows[0]
+        totals = ReconciliationTotals(
+            customer_count=first.customer_count,
+            total_amount=float(first.sum_total_amount or 0),
+            total_paid=float(first.sum_total_paid or 0),
+            period_paid=float(first.sum_period_paid or 0),
+        )
+    elif rows or page > 1 or not use_window:
+        # 不支持窗口函数或页码超出范围时，单独统计合计
+        aggregate = db.session.execute(with_joins(select(
+            func.count(),
+            func.sum(total_amount),
+            func.sum(total_paid),
+            func.sum(period_paid),
+        ))).one()
+        totals = ReconciliationTotals(
+            customer_count=aggregate[0],
+            total_amount=float(aggregate[1] or 0),
+            total_paid=float(aggregate[2] or 0),
+            period_paid=float(aggregate[3] or 0),
+        )
+    else:
+        totals = ReconciliationTotals()
+
+    items = [_build_row(*row[:8]) for row in rows]
+    return ReconciliationResult(items=items, page=page, per_page=per_page, totals=totals)
@@ -0,0 +1,248 @@
+"""
+参考数据缓存（下拉选项等低频变更数据）
+
+缓存内容：启用的用户（按角色筛选）、线索来源、赛事名称、系统配置值。
+每类数据在 cache_versions 表中有一个版本号：
+- 修改相关表时，在同一事务中递增版本号（after_flush），提交后清除本进程缓存（after_commit）；
+- 读取缓存时比对数据库中的版本号（每个请求只查询一次），其他 gunicorn 进程的修改也能及时生效；
+- 另设 TTL 兜底，绕过 ORM 直接改库时最多延迟 CACHE_TTL 秒。
+
+用法：
+    from utils.reference_cache import get_sales_users, get_lead_sources
+    sales_users = get_sales_users()
+"""
+import threading
+import time
+from collections import namedtuple
+from datetime import datetime
+
+from flask import g, has_app_context
+from sqlalchemy import event, inspect, select
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+from models import db, User, Lead, CompetitionName, SystemConfig, CacheVersion
+
+CACHE_TTL = 300
+# 版本表不存在（未执行 init-db）时，隔多久重新检查一次
+VERSION_TABLE_RECHECK = 60
+
+USERS = 'users'
+LEAD_SOURCES = 'lead_sources'
+COMPETITION_NAMES = 'competition_names'
+SYSTEM_CONFIG = 'system_config'
+
+# 模型 -> 缓存名称（线索只在线索来源变化时失效，单独处理）
+WATCHED_MODELS = {
+    User: USERS,
+    CompetitionName: COMPETITION_NAMES,
+    SystemConfig: SYSTEM_CONFIG,
+}
+
+SALES_ROLES = ('sales_manager', 'salesperson')
+
+# 缓存的是脱离会话的只读快照，避免跨请求复用 ORM 对象
+UserRef = namedtuple('UserRef', ['id', 'username', 'phone', 'role', 'group_name'])
+CompetitionNameRef = namedtuple('CompetitionNameRef', ['id', 'name'])
+
+_entries = {}  # {缓存名称: (版本号, 过期时间, 数据)}
+_lock = threading.Lock()
+_version_table = {'exists': False, 'checked_at': None}
+_events_registered = False
+
+
+def version_table_exists(session=None):
+    """检查版本表是否存在（存在后不再检查）"""
+    now = time.monotonic()
+    checked_at = _version_table['checked_at']
+    if _version_table['exists'] or (checked_at is not None and now - checked_at < VERSION_TABLE_RECHECK):
+        return _version_table['exists']
+
+    _version_table['exists'] = inspect((session or db.session).connection()).has_table(CacheVersion.__tablename__)
+    _version_table['checked_at'] = now
+    return _version_table['exists']
+
+
+def _current_versions():
+    """读取数据库中的版本号（请求内只查询一次）"""
+    if has_app_context() and '_reference_cache_versions' in g:
+        return g._reference_cache_versions
+
+    versions = {}
+    if version_table_exists():
+        versions = dict(db.session.execute(select(CacheVersion.name, CacheVersion.version)).all())
+
+    if has_app_context():
+        g._reference_cache_versions = versions
+    return versions
+
+
+def _cached(name, loader):
+    """版本号一致且未过期时返回缓存，否则重新加载"""
+    version = _current_versions().get(name, 0)
+    now = time.monotonic()
+
+    with _lock:
+        entry = _entries.get(name)
+        if entry and entry[0] == version and entry[1] > now:
+            return entry[2]
+
+    value = loader()
+    with _lock:
+        _entries[name] = (version, now + CACHE_TTL, value)
+    return value
+
+
+def invalidate(*names):
+    """
+    清除本进程缓存
+
+    Args:
+        names: 缓存名称，不传则全部清除
+    """
+    with _lock:
+        for name in names or list(_entries):
+            _entries.pop(name, None)
+    if has_app_context():
+        g.pop('_reference_cache_versions', None)
+
+
+def _load_active_users():
+    users = User.query.filter(User.status == True).order_by(User.id).all()
+    return tuple(UserRef(u.id, u.username, u.phone, u.role, u.group_name) for u in users)
+
+
+def get_active_users(roles=None, order_by_name=False):
+    """
+    获取启用的用户
+
+    Args:
+        roles (tuple): 角色筛选，不传则返回全部启用用户
+        order_by_name (bool): 是否按用户名排序（默认按ID）
+
+    Returns:
+        list: UserRef 列表（包含 id/username/phone/role/group_name）
+    """
+    users = [u for u in _cached(USERS, _load_active_users) if roles is None or u.role in roles]
+    if order_by_name:
+        users.sort(key=lambda u: u.username)
+    return users
+
+
+def get_sales_users(order_by_name=False):
+    """获取启用的销售人员（包括销售管理和销售）"""
+    return get_active_users(SALES_ROLES, order_by_name=order_by_name)
+
+
+def get_teacher_supervisors(order_by_name=False):
+    """获取启用的班主任"""
+    return get_active_users(('teacher_supervisor',), order_by_name=order_by_name)
+
+
+def _load_lead_sources():
+    rows = db.session.query(Lead.lead_source).filter(
+        Lead.lead_source.isnot(None)
+    ).distinct().order_by(Lead.lead_source).all()
+    return tuple(row[0] for row in rows)
+
+
+def get_lead_sources():
+    """获取所有线索来源（去重、排序）"""
+    return list(_cached(LEAD_SOURCES, _load_lead_sources))
+
+
+def _load_competition_names():
+    rows = CompetitionName.query.order_by(CompetitionName.name).all()
+    return tuple(CompetitionNameRef(cn.id, cn.name) for cn in rows)
+
+
+def get_competition_names():
+    """获取所有赛事名称（按名称排序）"""
+    return list(_cached(COMPETITION_NAMES, _load_competition_names))
+
+
+def _load_system_config():
+    return dict(db.session.query(SystemConfig.config_key, SystemConfig.config_value).all())
+
+
+def get_config_value(config_key, default=None):
+    """
+    获取系统配置值
+
+    Args:
+        config_key (str): 配置键
+        default: 配置不存在时的返回值
+
+    Returns:
+        str: 配置值
+    """
+    return _cached(SYSTEM_CONFIG, _load_system_config).get(config_key, default)
+
+
+def _lead_source_changed(lead, state):
+    """线索的变更是否会改变线索来源列表"""
+    if state == 'new':
+        if lead.lead_source is None:
+            return False
+        entry = _entries.get(LEAD_SOURCES)
+        # 已知来源的新线索不会改变去重后的来源列表
+        return not (entry and lead.lead_source in entry[2])
+    if state == 'deleted':
+        return lead.lead_source is not None
+    return inspect(lead).attrs.lead_source.history.has_changes()
+
+
+def _changed_names(session):
+    names = set()
+    for state, objects in (('new', session.new), ('dirty', session.dirty), ('deleted', session.deleted)):
+        for obj in objects:
+            if isinstance(obj, Lead):
+                if _lead_source_changed(obj, state):
+                    names.add(LEAD_SOURCES)
+                continue
+            name = WATCHED_MODELS.get(type(obj))
+            if name and (state != 'dirty' or session.is_modified(obj)):
+                names.add(name)
+    return names
+
+
+def bump_versions(session, names):
+    """在当前事务中递增版本号"""
+    now = datetime.utcnow()
+    table = CacheVersion.__table__
+    for name in sorted(names):
+        stmt = sqlite_insert(table).values(name=name, version=1, updated_at=now)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=['name'],
+            set_={'version': table.c.version + 1, 'updated_at': now}
+        )
+        session.connection().execute(stmt)
+
+
+def _after_flush(session, flush_context):
+    names = _changed_names(session)
+    if not names:
+        return
+    if version_table_exists(session):
+        bump_versions(session, names)
+    session.info.setdefault('reference_cache_changed', set()).update(names)
+
+
+def _after_commit(session):
+    names = session.info.pop('reference_cache_changed', None)
+    if names:
+        invalidate(*names)
+
+
+def _after_rollback(session):
+    session.info.pop('reference_cache_changed', None)
+
+
+def init_reference_cache():
+    """注册会话事件（在应用工厂中调用一次）"""
+    global _events_registered
+    if _events_registered:
+        return
+    event.listen(db.session, 'after_flush', _after_flush)
+    event.listen(db.session, 'after_commit', _after_commit)
+    event.listen(db.session, 'after_rollback', _after_rollback)
+    _events_registered = True
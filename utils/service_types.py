@@ -0,0 +1,105 @@
+"""
+服务类型工具
+leads.service_types 保存服务类型 JSON 文本（历史数据也有逗号分隔格式），
+同时按位写入 leads.service_type_mask（带索引），服务类型筛选使用掩码的等值查询，不再对 JSON 文本做 LIKE。
+"""
+import json
+
+# 服务类型 -> 掩码位
+SERVICE_TYPE_BITS = {
+    'tutoring': 1,
+    'competition': 2,
+    'upgrade_guidance': 4,
+}
+
+_ALL_MASKS = range(1 << len(SERVICE_TYPE_BITS))
+
+
+def parse_service_types(value):
+    """
+    解析服务类型文本
+
+    Args:
+        value (str): JSON 文本，如 '["tutoring", "competition"]'，或逗号分隔文本
+
+    Returns:
+        list: 服务类型列表
+    """
+    if not value:
+        return []
+    try:
+        service_types = json.loads(value)
+    except ValueError:
+        return [s.strip() for s in value.split(',') if s.strip()]
+    if isinstance(service_types, str):
+        return [service_types]
+    return list(service_types) if isinstance(service_types, list) else []
+
+
+def service_type_mask(service_types):
+    """
+    计算服务类型掩码
+
+    Args:
+        service_types (list): 服务类型列表（未知类型忽略）
+
+    Returns:
+        int: 掩码
+    """
+    mask = 0
+    for service_type in service_types or []:
+        mask |= SERVICE_TYPE_BITS.get(service_type, 0)
+    return mask
+
+
+def masks_with(service_type):
+    """
+    包含指定服务类型的全部掩码值（用于 IN 查询，可以利用索引）
+
+    Args:
+        service_type (str): 服务类型
+
+    Returns:
+        list: 掩码值列表，未知类型返回空列表
+    """
+    bit = SERVICE_TYPE_BITS.get(service_type)
+    if not bit:
+        return []
+    return [mask for mask in _ALL_MASKS if mask & bit]
+
+
+def backfill_service_type_mask(batch_size=1000):
+    """
+    分批回填 leads.service_type_mask（只处理尚未回填的记录）
+
+    Args:
+        batch_size (int): 每批处理的线索数，每批单独提交，避免长时间占用写锁
+
+    Returns:
+        int: 回填的线索数
+    """
+    from sqlalchemy import text
+    from models import db
+
+    last_id = 0
+    updated = 0
+    while True:
+        rows = db.session.execute(text("""
+            SELECT id, service_types FROM leads
+            WHERE id > :last_id AND service_type_mask IS NULL
+            ORDER BY id LIMIT :batch_size
+        """), {'last_id': last_id, 'batch_size': batch_size}).all()
+        if not rows:
+            break
+
+        params = [
+            {'id': lead_id, 'mask': service_type_mask(parse_service_types(service_types))}
+            for lead_id, service_types in rows
+        ]
+        db.session.execute(text("UPDATE leads SET service_type_mask = :mask WHERE id = :id"), params)
+        db.session.commit()
+
+        updated += len(params)
+        last_id = rows[-1][0]
+
+    return updated
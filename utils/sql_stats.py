@@ -0,0 +1,184 @@
+"""
+请求 SQL 统计
+通过 SQLAlchemy 的 before_cursor_execute / after_cursor_execute 事件记录每个请求执行的语句数、
+数据库总耗时和最慢的语句：
+
+- 响应头 Server-Timing 给出数据库耗时和语句数（浏览器开发者工具中可见）；
+- 请求总耗时超过 SLOW_REQUEST_MS 时记录日志，附带执行过的 SQL 及耗时；
+- 单条语句超过 SLOW_QUERY_MS 时（SQLite），同时记录该语句的 EXPLAIN QUERY PLAN；
+- 配置了 MAX_QUERIES_PER_REQUEST 时（测试环境），超出上限的请求直接失败并列出执行过的语句，
+  列表页出现 N+1 查询时能在测试中立即发现。单个视图需要更高上限时使用 @query_limit(n)。
+
+SQL_STATS_ENABLED 为 False 且未设置查询上限时不注册任何事件，没有额外开销。
+
+用法：
+    init_sql_stats(app)   # 在应用工厂中调用
+"""
+import heapq
+import time
+from functools import wraps
+
+from flask import g, has_request_context, request, request_started
+from sqlalchemy import event
+
+from models import db
+
+# 每个请求最多记录的语句数（计数和总耗时不受限制）
+MAX_RECORDED_STATEMENTS = 200
+# Server-Timing 和慢请求日志中列出的最慢语句数
+SLOWEST_STATEMENTS = 5
+# 日志中每条语句的最大长度
+REPORT_STATEMENT_LENGTH = 300
+
+
+class QueryLimitExceeded(AssertionError):
+    """请求执行的 SQL 语句数超过上限"""
+
+
+class RequestSqlStats:
+    """一个请求的 SQL 统计"""
+
+    def __init__(self):
+        self.started_at = time.perf_counter()
+        self.count = 0
+        self.total_time = 0.0
+        self.statements = []  # [(耗时秒, 语句, 查询计划)]
+
+    def record(self, statement, duration, plan=None):
+        self.count += 1
+        self.total_time += duration
+        if len(self.statements) < MAX_RECORDED_STATEMENTS:
+            self.statements.append((duration, statement, plan))
+
+    def slowest(self, n=SLOWEST_STATEMENTS):
+        return heapq.nlargest(n, self.statements, key=lambda item: item[0])
+
+    def server_timing(self):
+        """Server-Timing 响应头"""
+        elapsed = (time.perf_counter() - self.started_at) * 1000
+        return (f'db;dur={self.total_time * 1000:.1f};desc="{self.count} queries", '
+                f'app;dur={elapsed:.1f}')
+
+
+def query_limit(limit):
+    """
+    为单个视图设置查询数上限（覆盖 MAX_QUERIES_PER_REQUEST）
+
+    Args:
+        limit (int): 查询数上限，None 表示不限制
+    """
+    def decorator(f):
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            g._query_limit = limit
+            return f(*args, **kwargs)
+        return decorated_function
+    return decorator
+
+
+def current_sql_stats():
+    """当前请求的 SQL 统计（未启用或不在请求中时返回 None）"""
+    if not has_request_context():
+        return None
+    return g.get('_sql_stats')
+
+
+def request_query_count():
+    """当前请求已执行的 SQL 语句数"""
+    stats = current_sql_stats()
+    return stats.count if stats else 0
+
+
+def _compact(statement):
+    return ' '.join(statement.split())[:REPORT_STATEMENT_LENGTH]
+
+
+def _explain(cursor, statement, parameters):
+    """在同一 SQLite 连接上获取查询计划（直接使用 DBAPI 连接，不触发事件）"""
+    try:
+        rows = cursor.connection.execute(f'EXPLAIN QUERY PLAN {statement}', parameters or ()).fetchall()
+    except Exception as e:
+        return f'(无法获取查询计划: {e})'
+    return '; '.join(str(row[-1]) for row in rows)
+
+
+def _format_report(statements):
+    lines = []
+    for duration, statement, plan in statements:
+        lines.append(f'  [{duration * 1000:.1f}ms] {_compact(statement)}')
+        if plan:
+            lines.append(f'      QUERY PLAN: {plan}')
+    return '\n'.join(lines)
+
+
+def init_sql_stats(app):
+    """注册数据库事件和请求钩子（在应用工厂中调用）"""
+    enabled = app.config.get('SQL_STATS_ENABLED', False)
+    max_queries = app.config.get('MAX_QUERIES_PER_REQUEST')
+    if not enabled and not max_queries:
+        return
+
+    slow_request = app.config.get('SLOW_REQUEST_MS', 500) / 1000
+    slow_query = app.config.get('SLOW_QUERY_MS', 100) / 1000
+
+    with app.app_context():
+        engine = db.engine
+        is_sqlite = engine.dialect.name == 'sqlite'
+
+    @event.listens_for(engine, 'before_cursor_execute')
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        # 开始时间记在本条语句的执行上下文上：conn.info 属于连接池中的连接，语句出错时不会触发
+        # after_cursor_execute，残留的时间会被之后的语句（包括后台线程）取到
+        if context is not None and has_request_context() and '_sql_stats' in g:
+            context._crm_query_start = time.perf_counter()
+
+    @event.listens_for(engine, 'after_cursor_execute')
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        started = getattr(context, '_crm_query_start', None)
+        if started is None:
+            return
+        duration = time.perf_counter() - started
+        stats = current_sql_stats()
+        if stats is None:
+            return
+        plan = None
+        if enabled and is_sqlite and duration >= slow_query and not executemany \
+                and statement.lstrip().upper().startswith(('SELECT', 'WITH')):
+            plan = _explain(cursor, statement, parameters)
+        stats.record(statement, duration, plan)
+
+    # request_started 在所有 before_request 钩子之前触发，登录状态检查等查询也计入统计
+    def start_sql_stats(sender, **extra):
+        g._sql_stats = RequestSqlStats()
+    request_started.connect(start_sql_stats, app, weak=False)
+
+    @app.after_request
+    def finish_sql_stats(response):
+        stats = current_sql_stats()
+        if stats is None:
+            return response
+
+        limit = g.get('_query_limit', max_queries)
+        if limit and stats.count > limit:
+            raise QueryLimitExceeded(
+                f'{request.method} {request.path} 执行了 {stats.count} 条SQL，超过上限 {limit}：\n'
+                f'{_format_report(stats.statements)}'
+            )
+
+        if enabled:
+            response.headers['Server-Timing'] = stats.server_timing()
+            elapsed = time.perf_counter() - stats.started_at
+            if elapsed >= slow_request:
+                app.logger.warning(
+                    '慢请求 %s %s：耗时 %.1fms，SQL %d 条共 %.1fms，最慢的语句：\n%s',
+                    request.method, request.full_path.rstrip('?'), elapsed * 1000,
+                    stats.count, stats.total_time * 1000, _format_report(stats.slowest())
+                )
+            else:
+                slow_statements = [item for item in stats.statements if item[2]]
+                if slow_statements:
+                    app.logger.warning(
+                        '慢查询 %s %s：\n%s',
+                        request.method, request.full_path.rstrip('?'), _format_report(slow_statements)
+                    )
+        return response
@@ -0,0 +1,132 @@
+"""
+流式导出工具
+将分批读取的数据行编码为 CSV 或 NDJSON 字节块（可选即时 gzip 压缩），
+配合分块传输的 Response 边查询边输出，不在内存中生成完整文件。
+
+用法：
+    batches = iter_table_batches('leads')
+    return streaming_response(batches, 'csv', column_names, '线索表', compress=True)
+"""
+import csv
+import io
+import json
+import zlib
+from datetime import date, datetime
+from decimal import Decimal
+from urllib.parse import quote
+
+from flask import Response, stream_with_context
+
+STREAM_FORMATS = {
+    'csv': {'mimetype': 'text/csv; charset=utf-8', 'extension': '.csv'},
+    'ndjson': {'mimetype': 'application/x-ndjson; charset=utf-8', 'extension': '.ndjson'},
+}
+
+# gzip 压缩级别（兼顾压缩率与CPU占用）
+GZIP_LEVEL = 6
+
+
+def json_value(value):
+    """转换为可写入 JSON 的值（日期为 ISO 格式，金额保留字符串精度）"""
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return str(value)
+    return value
+
+
+def csv_chunks(batches, header):
+    """
+    CSV 字节块（UTF-8 带 BOM，Excel 可直接打开中文表头）
+
+    Args:
+        batches: 可迭代的数据批，每批为行列表
+        header (list): 表头
+
+    Yields:
+        bytes: 表头及每批数据编码后的内容
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(header)
+    yield ('\ufeff' + buffer.getvalue()).encode('utf-8')
+
+    for batch in batches:
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerows(batch)
+        yield buffer.getvalue().encode('utf-8')
+
+
+def ndjson_chunks(batches, keys):
+    """
+    NDJSON 字节块（每行一个 JSON 对象）
+
+    Args:
+        batches: 可迭代的数据批，每批为行列表
+        keys (list): 每行各列对应的键名
+
+    Yields:
+        bytes: 每批数据编码后的内容
+    """
+    for batch in batches:
+        yield ''.join(
+            json.dumps({key: json_value(value) for key, value in zip(keys, row)}, ensure_ascii=False) + '\n'
+            for row in batch
+        ).encode('utf-8')
+
+
+def gzip_chunks(chunks, level=GZIP_LEVEL):
+    """对字节块做即时 gzip 压缩"""
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def encode_batches(batches, fmt, fields, compress=False):
+    """
+    按格式编码数据批
+
+    Args:
+        batches: 可迭代的数据批
+        fmt (str): csv 或 ndjson
+        fields (list): CSV 为表头，NDJSON 为键名
+        compress (bool): 是否 gzip 压缩
+
+    Returns:
+        生成字节块的迭代器
+    """
+    chunks = csv_chunks(batches, fields) if fmt == 'csv' else ndjson_chunks(batches, fields)
+    return gzip_chunks(chunks) if compress else chunks
+
+
+def streaming_response(batches, fmt, fields, filename, compress=False):
+    """
+    分块传输的下载响应
+
+    生成器在请求上下文中逐批执行查询，每批编码后立即发送给客户端。
+
+    Args:
+        batches: 可迭代的数据批（惰性执行查询）
+        fmt (str): csv 或 ndjson
+        fields (list): CSV 为表头，NDJSON 为键名
+        filename (str): 不含扩展名的下载文件名
+        compress (bool): 是否 gzip 压缩（文件名追加 .gz）
+
+    Returns:
+        Response: 流式响应
+    """
+    filename += STREAM_FORMATS[fmt]['extension']
+    mimetype = STREAM_FORMATS[fmt]['mimetype']
+    if compress:
+        filename += '.gz'
+        mimetype = 'application/gzip'
+
+    response = Response(stream_with_context(encode_batches(batches, fmt, fields, compress)), mimetype=mimetype)
+    response.headers['Content-Disposition'] = f"attachment; filename*=UTF-8''{quote(filename)}"
+    # 禁止反向代理缓冲，数据到达即转发
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
@@ -0,0 +1,236 @@
+"""
+数据表导出工具
+按列投影、按主键分批读取数据，并以 openpyxl write_only 模式写入 Excel，
+导出大表时内存占用不随行数增长。
+
+用法：
+    with tempfile.SpooledTemporaryFile() as output:
+        write_workbook(['leads', 'payments'], output)
+"""
+from datetime import datetime
+
+from openpyxl import Workbook
+from sqlalchemy import func, literal, select
+
+from models import db, User, Lead, Customer, Payment, Teacher, TutoringDelivery, CompetitionDelivery, CommunicationRecord, LoginLog, CompetitionName
+
+# 每批从数据库读取的行数
+EXPORT_BATCH_SIZE = 1000
+
+# 定义所有可导出的表及其中文名称
+EXPORTABLE_TABLES = {
+    'users': {
+        'name': '用户表',
+        'model': User,
+        'columns': ['id', 'username', 'phone', 'role', 'status', 'created_at', 'updated_at'],
+        'column_names': ['ID', '用户名', '手机号', '角色', '状态', '创建时间', '更新时间']
+    },
+    'leads': {
+        'name': '线索表',
+        'model': Lead,
+        'columns': ['id', 'student_name', 'parent_wechat_display_name', 'parent_wechat_name',
+                   'contact_info', 'lead_source', 'grade', 'stage', 'sales_user_id',
+                   'contact_obtained_at', 'meeting_at', 'meeting_location', 'follow_up_notes',
+                   'created_at', 'updated_at'],
+        'column_names': ['ID', '学员姓名', '家长微信昵称', '家长微信号', '联系方式', '线索来源',
+                        '年级', '阶段', '销售负责人ID', '获取联系方式时间', '约见时间', '约见地点',
+                        '跟进备注', '创建时间', '更新时间']
+    },
+    'customers': {
+        'name': '客户表',
+        'model': Customer,
+        'columns': ['id', 'lead_id', 'sales_user_id', 'teacher_user_id', 'teacher_id',
+                   'service_type', 'payment_amount', 'is_priority', 'customer_notes',
+                   'converted_at', 'created_at', 'updated_at'],
+        'column_names': ['ID', '线索ID', '销售负责人ID', '班主任ID', '辅导老师ID', '服务类型',
+                        '支付金额', '是否优先', '客户备注', '转化时间', '创建时间', '更新时间']
+    },
+    'payments': {
+        'name': '付款记录表',
+        'model': Payment,
+        'columns': ['id', 'lead_id', 'amount', 'payment_date', 'payment_method', 'notes',
+                   'created_at', 'updated_at'],
+        'column_names': ['ID', '线索ID', '金额', '付款日期', '付款方式', '备注', '创建时间', '更新时间']
+    },
+    'teachers': {
+        'name': '老师表',
+        'model': Teacher,
+        'columns': ['id', 'chinese_name', 'english_name', 'current_institution', 'major',
+                   'highest_degree', 'education_background', 'research_achievements',
+                   'innovation_achievements', 'social_roles', 'status', 'created_at', 'updated_at'],
+        'column_names': ['ID', '中文名', '英文名', '现单位', '专业方向', '最高学历', '教育背景',
+                        '科研成果', '科创辅导成果', '社会角色', '状态', '创建时间', '更新时间']
+    },
+    'tutoring_deliveries': {
+        'name': '课题辅导交付表',
+        'model': TutoringDelivery,
+        'columns': ['id', 'customer_id', 'project_topic', 'project_description',
+                   'start_date', 'expected_completion_date', 'actual_completion_date',
+                   'status', 'progress_notes', 'created_at', 'updated_at'],
+        'column_names': ['ID', '客户ID', '课题名称', '课题描述', '开始日期', '预计完成日期',
+                        '实际完成日期', '状态', '进度备注', '创建时间', '更新时间']
+    },
+    'competition_deliveries': {
+        'name': '竞赛交付表',
+        'model': CompetitionDelivery,
+        'columns': ['id', 'customer_id', 'competition_name', 'target_award_level',
+                   'registration_date', 'competition_date', 'result_date', 'actual_award_level',
+                   'status', 'notes', 'created_at', 'updated_at'],
+        'column_names': ['ID', '客户ID', '竞赛名称', '目标奖项', '报名日期', '比赛日期',
+                        '结果公布日期', '实际奖项', '状态', '备注', '创建时间', '更新时间']
+    },
+    'communication_records': {
+        'name': '沟通记录表',
+        'model': CommunicationRecord,
+        'columns': ['id', 'lead_id', 'customer_id', 'content', 'created_at'],
+        'column_names': ['ID', '线索ID', '客户ID', '沟通内容', '创建时间']
+    },
+    'login_logs': {
+        'name': '登录日志表',
+        'model': LoginLog,
+        'columns': ['id', 'user_id', 'login_time', 'ip_address', 'user_agent'],
+        'column_names': ['ID', '用户ID', '登录时间', 'IP地址', '用户代理']
+    },
+    'competition_names': {
+        'name': '竞赛名称配置表',
+        'model': CompetitionName,
+        'columns': ['id', 'name', 'category', 'description', 'is_active', 'created_at', 'updated_at'],
+        'column_names': ['ID', '竞赛名称', '类别', '描述', '是否启用', '创建时间', '更新时间']
+    }
+}
+
+ROLE_NAMES = {
+    'admin': '管理员',
+    'sales_manager': '销售管理',
+    'salesperson': '销售专员',
+    'teacher_supervisor': '班主任',
+    'teacher': '老师'
+}
+
+
+def _column(model, name):
+    """模型字段（模型中不存在的列导出为空）"""
+    column = model.__table__.columns.get(name)
+    return column if column is not None else literal(None).label(name)
+
+
+def export_columns(table_key):
+    """导出表需要查询的列表达式，顺序与 columns 一致"""
+    table_info = EXPORTABLE_TABLES[table_key]
+    return [_column(table_info['model'], name) for name in table_info['columns']]
+
+
+def format_value(table_key, column, value):
+    """格式化导出的单元格值"""
+    # 特殊处理：用户表的角色和状态显示中文
+    if table_key == 'users':
+        if column == 'role':
+            return ROLE_NAMES.get(value, value)
+        if column == 'status':
+            return '启用' if value else '禁用'
+    if isinstance(value, datetime):
+        return value.strftime('%Y-%m-%d %H:%M:%S')
+    if isinstance(value, bool):
+        return '是' if value else '否'
+    return value
+
+
+def count_table_rows(table_key):
+    """导出表的总行数"""
+    model = EXPORTABLE_TABLES[table_key]['model']
+    return db.session.execute(select(func.count()).select_from(model.__table__)).scalar()
+
+
+def iter_table_batches(table_key, batch_size=EXPORT_BATCH_SIZE, limit=None, raw=False):
+    """
+    按主键分批读取导出表的数据（只查询需要导出的列）
+
+    每批是一次独立的 WHERE id > 上一批最大ID 的查询，批与批之间不占用读事务，
+    导出大表时不会长时间阻塞其他请求的写入。
+
+    Args:
+        table_key (str): EXPORTABLE_TABLES 中的表名
+        batch_size (int): 每批行数
+        limit (int): 最多读取的行数，为None时读取全部
+        raw (bool): 返回数据库原始值，不做 format_value 格式化
+
+    Yields:
+        list: 一批数据行，每行顺序与 columns 一致
+    """
+    table_info = EXPORTABLE_TABLES[table_key]
+    model = table_info['model']
+    columns = table_info['columns']
+    primary_key = model.__table__.c.id
+
+    stmt = select(primary_key, *export_columns(table_key)).order_by(primary_key)
+    last_id = None
+    remaining = limit
+    while remaining is None or remaining > 0:
+        size = batch_size if remaining is None else min(batch_size, remaining)
+        batch_stmt = stmt if last_id is None else stmt.where(primary_key > last_id)
+        rows = db.session.execute(batch_stmt.limit(size)).all()
+        if not rows:
+            break
+
+        last_id = rows[-1][0]
+        if remaining is not None:
+            remaining -= len(rows)
+        if raw:
+            yield [list(row[1:]) for row in rows]
+        else:
+            yield [
+                [format_value(table_key, name, value) for name, value in zip(columns, row[1:])]
+                for row in rows
+            ]
+        if len(rows) < size:
+            break
+
+
+def iter_table_rows(table_key, limit=None):
+    """
+    逐行读取导出表的数据
+
+    Yields:
+        list: 已格式化的一行数据，顺序与 columns 一致
+    """
+    for batch in iter_table_batches(table_key, limit=limit):
+        yield from batch
+
+
+def write_workbook(table_keys, output, progress=None):
+    """
+    将选中的表写入 Excel 文件（每个表一个工作表）
+
+    Args:
+        table_keys (list): 表名列表，不在 EXPORTABLE_TABLES 中的表会被忽略
+        output: 可写入的二进制文件对象
+        progress (callable): 每写完一批后调用 progress(已写入行数)
+
+    Returns:
+        int: 写入的数据行数（不含表头）
+    """
+    workbook = Workbook(write_only=True)
+    total_rows = 0
+
+    for table_key in table_keys:
+        if table_key not in EXPORTABLE_TABLES:
+            continue
+
+        table_info = EXPORTABLE_TABLES[table_key]
+        # Excel sheet名称最多31字符
+        sheet = workbook.create_sheet(title=table_info['name'][:31])
+        sheet.append(table_info['column_names'])
+
+        for batch in iter_table_batches(table_key):
+            for row in batch:
+                sheet.append(row)
+            total_rows += len(batch)
+            if progress:
+                progress(total_rows)
+
+    # 没有任何可导出的表时保留一个空工作表，保证文件可以打开
+    if not workbook.worksheets:
+        workbook.create_sheet()
+
+    workbook.save(output)
+    return total_rows
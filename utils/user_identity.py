@@ -0,0 +1,165 @@
+"""
+登录用户身份缓存
+Flask-Login 的 user_loader 每个请求都会按ID查询 users 表。这里在每个进程内缓存用户身份快照（LRU），
+正常请求不访问 users 表：
+
+- 缓存条目在 USER_CHECK_INTERVAL 秒内直接使用；
+- 超过后只查询 cache_versions 中该用户的版本号（user:<ID>），版本未变则继续使用；
+- 用户的用户名、角色、状态等字段变更或用户被删除时，在同一事务中递增其版本号，
+  本进程提交后立即清除缓存，其他 gunicorn 进程最迟 USER_CHECK_INTERVAL 秒后重新加载，
+  被禁用的账号几秒内即会被 check_user_status 登出；
+- 另设 USER_CACHE_TTL 兜底，绕过 ORM 直接改库时最多延迟该时长。
+
+用法：
+    @login_manager.user_loader
+    def load_user(user_id):
+        return load_user_identity(int(user_id))
+"""
+import threading
+import time
+from collections import OrderedDict
+
+from flask_login import UserMixin
+from sqlalchemy import event, inspect, select
+
+from models import db, User, CacheVersion
+from utils.reference_cache import bump_versions, version_table_exists
+
+# 不查询版本号、直接使用缓存的时长（秒）
+USER_CHECK_INTERVAL = 5
+# 缓存条目最长有效期（秒），到期后重新查询 users 表
+USER_CACHE_TTL = 300
+# 每个进程最多缓存的用户数
+USER_CACHE_SIZE = 1024
+
+# 缓存的用户字段，变更时需要刷新缓存
+IDENTITY_FIELDS = ('username', 'phone', 'role', 'group_name', 'status')
+
+_entries = OrderedDict()  # {用户ID: [版本号, 下次检查时间, 过期时间, CachedUser]}
+_lock = threading.Lock()
+_events_registered = False
+
+
+class CachedUser(UserMixin):
+    """脱离数据库会话的用户身份快照（只读），角色判断方法与 User 一致"""
+
+    def __init__(self, user):
+        self.id = user.id
+        for field in IDENTITY_FIELDS:
+            setattr(self, field, getattr(user, field))
+
+    is_admin = User.is_admin
+    is_sales_manager = User.is_sales_manager
+    is_salesperson = User.is_salesperson
+    is_sales = User.is_sales
+    is_teacher_supervisor = User.is_teacher_supervisor
+    is_teacher = User.is_teacher
+
+    def __repr__(self):
+        return f'<User {self.username}>'
+
+
+def version_name(user_id):
+    """用户在 cache_versions 中的版本号名称"""
+    return f'user:{user_id}'
+
+
+def _current_version(user_id):
+    """读取用户的版本号，版本表不存在时返回 None"""
+    if not version_table_exists():
+        return None
+    version = db.session.execute(
+        select(CacheVersion.version).where(CacheVersion.name == version_name(user_id))
+    ).scalar()
+    return version or 0
+
+
+def load_user_identity(user_id):
+    """
+    获取登录用户身份（优先使用进程内缓存）
+
+    Args:
+        user_id (int): 用户ID
+
+    Returns:
+        CachedUser: 用户身份快照，用户不存在时返回 None
+    """
+    now = time.monotonic()
+    with _lock:
+        entry = _entries.get(user_id)
+        if entry:
+            _entries.move_to_end(user_id)
+            if entry[1] > now:
+                return entry[3]
+
+    version = _current_version(user_id)
+    if entry and version is not None and entry[0] == version and entry[2] > now:
+        # 版本未变，延长检查时间
+        with _lock:
+            entry[1] = now + USER_CHECK_INTERVAL
+        return entry[3]
+
+    user = db.session.get(User, user_id)
+    if user is None:
+        invalidate(user_id)
+        return None
+
+    identity = CachedUser(user)
+    with _lock:
+        _entries[user_id] = [version, now + USER_CHECK_INTERVAL, now + USER_CACHE_TTL, identity]
+        _entries.move_to_end(user_id)
+        while len(_entries) > USER_CACHE_SIZE:
+            _entries.popitem(last=False)
+    return identity
+
+
+def invalidate(*user_ids):
+    """
+    清除本进程缓存
+
+    Args:
+        user_ids: 用户ID，不传则全部清除
+    """
+    with _lock:
+        for user_id in user_ids or list(_entries):
+            _entries.pop(user_id, None)
+
+
+def _identity_changed(session, user):
+    if user in session.deleted:
+        return True
+    attrs = inspect(user).attrs
+    return any(attrs[field].history.has_changes() for field in IDENTITY_FIELDS)
+
+
+def _after_flush(session, flush_context):
+    user_ids = {
+        user.id for user in list(session.dirty) + list(session.deleted)
+        if isinstance(user, User) and user.id is not None and _identity_changed(session, user)
+    }
+    if not user_ids:
+        return
+    if version_table_exists(session):
+        bump_versions(session, [version_name(user_id) for user_id in user_ids])
+    session.info.setdefault('user_identity_changed', set()).update(user_ids)
+
+
+def _after_commit(session):
+    user_ids = session.info.pop('user_identity_changed', None)
+    if user_ids:
+        invalidate(*user_ids)
+
+
+def _after_rollback(session):
+    session.info.pop('user_identity_changed', None)
+
+
+def init_user_identity_cache():
+    """注册会话事件（在应用工厂中调用一次）"""
+    global _events_registered
+    if _events_registered:
+        return
+    event.listen(db.session, 'after_flush', _after_flush)
+    event.listen(db.session, 'after_commit', _after_commit)
+    event.listen(db.session, 'after_rollback', _after_rollback)
+    _events_registered = True